@@ -0,0 +1,676 @@
+#!/bin/python3
+
+# resident analysis server: the input files are loaded once and kept in the memory, so the requests do not parse
+# or read them again
+#  - the values of a loaded input file are copied into a shared memory block (multiprocessing.shared_memory,
+#    a float64 array), the sampling parameters are estimated once at loading
+#  - the operations (statistics, peaks at a depth, filters, spectrum, Welch PSD, histogram) run in a pool of worker
+#    processes, the workers attach the shared memory block of the data set and use it as a numpy array without copying
+#  - the resident data sets are kept in least recently used order, the least recently used ones are released if there
+#    are more than max_datasets data sets or they are greater than max_bytes together (the data sets used by a running
+#    request are not released)
+#  - the latency of every request is measured (total, loading of the data set, waiting for a worker, computation)
+#    and the statistics of the latencies of the operations are reported by the metrics request
+# the protocol is JSON lines over a local TCP socket: a request is a JSON object in one line, ex.:
+#   {"op": "peaks", "infile": "/data/capture.csv", "depth": 3}
+# the answer is one line too: {"ok": true, "result": {...}, "latency": {...}} or {"ok": false, "error": "..."}
+# the input files are paths of the server, so they should be absolute paths (the query mode converts them)
+# the numeric results are written to a csv file (outfile) only if the server is started with an output directory, the
+# outfile must be a relative path in this directory (the clients cannot write anywhere else)
+# usage: python analysis_server.py [--host address] [--port number] [-j workers] [--max-datasets number] [--max-memory MiB] [--no-cache] [--outdir directory]
+#        python analysis_server.py -q request [-i infile] [--host address] [--port number]
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict, deque
+from multiprocessing import get_context, shared_memory
+import asyncio
+import signal
+import socket
+import json
+import time
+import os
+import numpy as np
+import getopt
+import sys
+
+from data_cache import cache_key, read_csv_cached
+from sample_rate import estimate_sample_rate
+from data_statistics import statistics_of_array
+from peak_index import MAX_LEVELS, get_peak_index, memory_indexes
+from peaks import select_peaks
+from spectrum import DEFAULT_SEGMENT, amplitude_spectrum, strongest_peaks, welch_psd
+from moving_average import KINDS, moving_average
+from fir_engine import METHODS
+from digital_filtering import apply_filter, select_filter
+from histogram import DEFAULT_BINS, histogram_of_array
+from headless import FILTERS, json_value
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 9760
+DEFAULT_MAX_DATASETS = 8
+DEFAULT_MAX_MEMORY = 2048
+# the operations which run in the worker processes
+WORKER_OPERATIONS = ('stats', 'peaks', 'filter', 'spectrum', 'welch', 'histogram')
+OPERATIONS = ('load', 'sampling', 'evict', 'datasets', 'metrics', 'shutdown') + WORKER_OPERATIONS
+# the metrics are computed from the latencies of this many last requests of an operation
+METRIC_WINDOW = 1024
+# a worker process keeps at most this many data sets attached
+WORKER_ATTACHED = 8
+# the names of the released shared memory blocks are sent to the workers with the requests (this many last names),
+# so the workers detach them
+RELEASED_NAMES = 64
+# the longest request line (bytes)
+LINE_LIMIT = 1 << 20
+# the number of the reported dominant frequencies by default
+DEFAULT_FREQUENCIES = 5
+
+def usage() :
+    print(
+        '-h --help for help\r\n'
+        '--host address --port number (address of the server, default: 127.0.0.1:9760)\r\n'
+        '-j --jobs number (number of worker processes, default: number of CPUs)\r\n'
+        '--max-datasets number (the most resident data sets, default: 8)\r\n'
+        '--max-memory MiB (the most memory of the resident data sets, default: 2048)\r\n'
+        '--no-cache (the parsed input files and the peak indexes are not cached on the disk)\r\n'
+        '--outdir directory (the outfile of the requests is written to this directory, without it there is no outfile)\r\n'
+        '-q --query request (query mode: the JSON request is sent to the server and the answer is printed)\r\n'
+        '-i --infile filename (input file of the request in query mode)\r\n'
+    )
+
+# handling of input arguments, it returns with a dictionary of the settings
+def opt_walk(opts) :
+    args = {
+        'host' : DEFAULT_HOST, 'port' : str(DEFAULT_PORT), 'jobs' : None, 'max_datasets' : str(DEFAULT_MAX_DATASETS),
+        'max_memory' : str(DEFAULT_MAX_MEMORY), 'use_cache' : True, 'query' : None, 'infile' : None,
+        'outdir' : None
+    }
+    names = {
+        "--host" : 'host', "--port" : 'port', "-j" : 'jobs', "--jobs" : 'jobs', "--max-datasets" : 'max_datasets',
+        "--max-memory" : 'max_memory', "-q" : 'query', "--query" : 'query', "-i" : 'infile', "--infile" : 'infile',
+        "--outdir" : 'outdir'
+    }
+    for o, a in opts :
+        if o in ("-h", "--help") :
+            usage()
+        elif o == "--no-cache" :
+            args['use_cache'] = False
+        elif o in names :
+            args[names[o]] = a
+        else :
+            print("unhandled option")
+            usage()
+    return args
+
+# a resident data set: the values of an input file in a shared memory block and its sampling parameters
+class ResidentDataset :
+    def __init__(self, infile, key, values, sampling) :
+        self.infile = infile
+        self.key = key
+        self.samples = len(values)
+        self.sampling = sampling
+        # a block cannot be empty
+        self.block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray((self.samples,), dtype=np.float64, buffer=self.block.buf)[:] = values
+        self.nbytes = self.block.size
+
+    # loading of the input file (it runs in a thread of the server)
+    @classmethod
+    def load(cls, infile, key, use_cache=True) :
+        ts_list, value_list = read_csv_cached(infile, use_cache)
+        if len(value_list) < 2 :
+            raise ValueError('there is not enough data in the input file: ' + infile)
+        sampling = estimate_sample_rate(ts_list)
+        sampling = {name : sampling[name] for name in ('sampling_frequency', 'sample_time', 'jitter', 'dropped_samples', 'confidence')}
+        return cls(infile, key, value_list, sampling)
+
+    # what a worker needs to attach the data set
+    def descriptor(self) :
+        return {'name' : self.block.name, 'key' : self.key, 'infile' : self.infile, 'samples' : self.samples, 'sampling' : self.sampling}
+
+    def info(self) :
+        return {'infile' : self.infile, 'samples' : self.samples, 'bytes' : self.nbytes, 'sampling' : self.sampling}
+
+    # releasing the shared memory block (the workers which attached it keep their mapping until they detach it)
+    def close(self) :
+        self.block.close()
+        self.block.unlink()
+
+# the resident data sets in least recently used order
+class DatasetStore :
+    def __init__(self, max_datasets=DEFAULT_MAX_DATASETS, max_bytes=DEFAULT_MAX_MEMORY << 20, use_cache=True) :
+        self.max_datasets = max_datasets
+        self.max_bytes = max_bytes
+        self.use_cache = use_cache
+        self.datasets = OrderedDict()
+        # the loads in progress (a data set is loaded only once if more requests need it at the same time)
+        self.loading = {}
+        # the number of the running requests of the data sets
+        self.active = {}
+        self.released = deque(maxlen=RELEASED_NAMES)
+        self.counters = {'hits' : 0, 'loads' : 0, 'evictions' : 0}
+
+    def resident_bytes(self) :
+        return sum(dataset.nbytes for dataset in self.datasets.values())
+
+    # the key of the data set of the input file (see data_cache.cache_key)
+    # if the input file is deleted or moved, then it is the key of its most recently used resident data set
+    def key_of(self, infile) :
+        try :
+            return cache_key(infile)
+        except OSError :
+            for key in reversed(self.datasets) :
+                if os.path.abspath(self.datasets[key].infile) == os.path.abspath(infile) :
+                    return key
+            raise
+
+    # the data set of the input file for a request (it is loaded if it is not resident)
+    # it returns with the data set and the time of the loading (0 if it was resident), the data set must be released
+    async def acquire(self, infile) :
+        start = time.perf_counter()
+        key = self.key_of(infile)
+        loaded = False
+        while key not in self.datasets :
+            task = self.loading.get(key)
+            if task is None :
+                task = self.loading[key] = asyncio.create_task(self.load(infile, key))
+            await asyncio.shield(task)
+            loaded = True
+        dataset = self.datasets[key]
+        self.datasets.move_to_end(key)
+        self.active[key] = self.active.get(key, 0) + 1
+        if not loaded :
+            self.counters['hits'] += 1
+        self.enforce_limits()
+        return dataset, time.perf_counter() - start if loaded else 0.0
+
+    async def load(self, infile, key) :
+        try :
+            dataset = await asyncio.to_thread(ResidentDataset.load, infile, key, self.use_cache)
+        finally :
+            del self.loading[key]
+        self.datasets[key] = dataset
+        self.counters['loads'] += 1
+        return dataset
+
+    # the end of a request of the data set
+    def release(self, dataset) :
+        self.active[dataset.key] -= 1
+        if self.active[dataset.key] == 0 :
+            del self.active[dataset.key]
+        self.enforce_limits()
+
+    # releasing the least recently used data sets which are not in use while the limits are exceeded
+    # (the most recently used data set is kept even if it is greater than the memory limit)
+    def enforce_limits(self) :
+        for key in list(self.datasets)[:-1] :
+            if len(self.datasets) <= self.max_datasets and self.resident_bytes() <= self.max_bytes :
+                break
+            if key not in self.active :
+                self.evict(key)
+
+    def evict(self, key) :
+        if key in self.active :
+            raise ValueError('the data set is in use')
+        dataset = self.datasets.pop(key)
+        self.released.append(dataset.block.name)
+        dataset.close()
+        self.counters['evictions'] += 1
+        return dataset
+
+    def info(self) :
+        return {
+            'datasets' : [dict(dataset.info(), active=self.active.get(key, 0)) for key, dataset in self.datasets.items()],
+            'resident_bytes' : self.resident_bytes(), 'max_datasets' : self.max_datasets, 'max_bytes' : self.max_bytes,
+            'counters' : dict(self.counters)
+        }
+
+    def close(self) :
+        for dataset in self.datasets.values() :
+            dataset.close()
+        self.datasets.clear()
+
+# latencies of the requests of the operations
+class LatencyMetrics :
+    def __init__(self, window=METRIC_WINDOW) :
+        self.window = window
+        self.operations = {}
+
+    # adding the latencies (sec) of a request
+    def record(self, op, latency, failed=False) :
+        measured = self.operations.get(op)
+        if measured is None :
+            measured = self.operations[op] = {'count' : 0, 'errors' : 0, 'total' : deque(maxlen=self.window), 'parts' : {}}
+        measured['count'] += 1
+        measured['errors'] += int(failed)
+        measured['total'].append(latency['total'])
+        for part, seconds in latency.items() :
+            measured['parts'][part] = measured['parts'].get(part, 0.0) + seconds
+
+    # the statistics of the latencies in ms (the percentiles of the last requests, the mean parts of every request)
+    def report(self) :
+        report = {}
+        for op, measured in self.operations.items() :
+            total = np.array(measured['total']) * 1000
+            report[op] = {
+                'count' : measured['count'], 'errors' : measured['errors'],
+                'p50_ms' : float(np.percentile(total, 50)), 'p95_ms' : float(np.percentile(total, 95)),
+                'p99_ms' : float(np.percentile(total, 99)), 'max_ms' : float(np.max(total)),
+                'mean_ms' : {part : seconds * 1000 / measured['count'] for part, seconds in measured['parts'].items()}
+            }
+        return report
+
+# the shared memory blocks attached by a worker process in least recently used order (name -> (block, values, key))
+attached = OrderedDict()
+
+# attaching a shared memory block without registering it at the resource tracker, because the block belongs to the server
+def open_shared_memory(name) :
+    try :
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError :
+        # python < 3.13 has no track parameter, the workers share the resource tracker of the server
+        return shared_memory.SharedMemory(name)
+
+def detach(name) :
+    block, values, key = attached.pop(name)
+    # the peak index of the data set is not needed any more in this worker
+    memory_indexes.pop(key, None)
+    del values
+    try :
+        block.close()
+    except BufferError :
+        # a result still uses the block, it is unmapped when it is freed
+        pass
+
+# the values of a data set in a worker process (the shared memory block is used without copying)
+def attach_dataset(descriptor, released) :
+    for name in released :
+        if name in attached :
+            detach(name)
+    entry = attached.get(descriptor['name'])
+    if entry is None :
+        block = open_shared_memory(descriptor['name'])
+        values = np.ndarray((descriptor['samples'],), dtype=np.float64, buffer=block.buf)
+        values.flags.writeable = False
+        entry = attached[descriptor['name']] = (block, values, descriptor['key'])
+    attached.move_to_end(descriptor['name'])
+    while len(attached) > WORKER_ATTACHED :
+        detach(next(iter(attached)))
+    return entry[1]
+
+# an integer parameter of a request
+def int_parameter(request, name, default, low=1, high=None) :
+    value = request.get(name, default)
+    if not isinstance(value, int) or isinstance(value, bool) or value < low or (high is not None and value > high) :
+        raise ValueError('the ' + name + ' must be an integer between ' + str(low) + ' and ' + (str(high) if high is not None else 'inf'))
+    return value
+
+def is_number(value) :
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+# a limit of the peaks (height, prominence): a number or a [min, max] pair (None means no limit)
+def limit_parameter(request, name) :
+    value = request.get(name)
+    bounds = value if isinstance(value, list) and len(value) == 2 else [value]
+    if any(bound is not None and not is_number(bound) for bound in bounds) :
+        raise ValueError('the ' + name + ' must be a number or a [min, max] pair')
+    return value
+
+# checking the parameters of a worker operation in the server, before its data set is loaded, so an invalid request
+# does not load an input file (and does not release a resident data set)
+# it returns with the request completed by the default values of the parameters (the worker uses these values)
+def check_request(request) :
+    op = request['op']
+    checked = dict(request)
+    if op == 'peaks' :
+        checked['depth'] = int_parameter(request, 'depth', 1, 1, MAX_LEVELS)
+        checked['height'] = limit_parameter(request, 'height')
+        checked['prominence'] = limit_parameter(request, 'prominence')
+        distance = request.get('distance')
+        if distance is not None and (not is_number(distance) or distance < 1) :
+            raise ValueError('the distance must be a number of samples (at least 1)')
+    elif op == 'filter' :
+        name = request.get('filter', 'lowpass')
+        if not isinstance(name, str) or name not in FILTERS :
+            raise ValueError('unknown filter (' + ', '.join(FILTERS) + '): ' + str(name))
+        checked['filter'] = name
+        if FILTERS[name] == '4' :
+            kind = request.get('ma_kind', 'simple')
+            if not isinstance(kind, str) or kind not in KINDS :
+                raise ValueError('unknown moving average kind (' + ', '.join(KINDS) + '): ' + str(kind))
+            checked['ma_kind'] = kind
+            checked['window'] = int_parameter(request, 'window', 50)
+        else :
+            type = request.get('type', 'fir')
+            form = request.get('form', 'ba')
+            fir_method = request.get('fir_method', 'auto')
+            if type not in ('fir', 'iir') or form not in ('ba', 'sos') or not isinstance(fir_method, str) or fir_method not in METHODS :
+                raise ValueError('the type must be fir or iir, the form must be ba or sos, the FIR method must be one of ' + ', '.join(METHODS))
+            checked['type'], checked['form'], checked['fir_method'] = type, form, fir_method
+            checked['order'] = int_parameter(request, 'order', 50)
+    elif op == 'spectrum' :
+        # the nfft is compared with the number of samples in the worker
+        checked['nfft'] = int_parameter(request, 'nfft', None) if request.get('nfft') is not None else None
+        checked['count'] = int_parameter(request, 'count', DEFAULT_FREQUENCIES)
+    elif op == 'welch' :
+        checked['nperseg'] = int_parameter(request, 'nperseg', DEFAULT_SEGMENT, 2)
+        checked['count'] = int_parameter(request, 'count', DEFAULT_FREQUENCIES)
+    elif op == 'histogram' :
+        checked['bins'] = int_parameter(request, 'bins', DEFAULT_BINS)
+    return checked
+
+# true if the input file of the data set is the same as at its loading (it is not changed or deleted)
+def file_unchanged(descriptor) :
+    try :
+        return cache_key(descriptor['infile']) == descriptor['key']
+    except OSError :
+        return False
+
+# the dominant frequencies of a spectrum (frequency, value pairs)
+def dominant_frequencies(freq_line, spectrum, count) :
+    return [[float(freq_line[i]), float(spectrum[i])] for i in strongest_peaks(spectrum, count)]
+
+# running an operation in a worker process (the parameters of the request are checked by check_request)
+# it returns with the result, the time of the attaching and the time of the computation (sec)
+def run_analysis(descriptor, released, request) :
+    start = time.perf_counter()
+    values = attach_dataset(descriptor, released)
+    attached_time = time.perf_counter()
+    result = analyse(values, descriptor, request)
+    return result, attached_time - start, time.perf_counter() - attached_time
+
+def analyse(values, descriptor, request) :
+    op = request['op']
+    n = len(values)
+    sampling_time_sec = descriptor['sampling']['sample_time']
+    sampling_frequency_hz = descriptor['sampling']['sampling_frequency']
+    outfile = request.get('outfile')
+    if op == 'stats' :
+        return statistics_of_array(values)
+    elif op == 'peaks' :
+        depth = request['depth']
+        # the persisted index of the input file is used only if the file has not changed since the loading of the data set
+        use_file = request.get('use_cache', True) and file_unchanged(descriptor)
+        peak_index = get_peak_index(descriptor['infile'], values, use_file, key=descriptor['key'])
+        positions = select_peaks(values, peak_index.level(depth), request.get('height'), request.get('distance'), request.get('prominence'))
+        result = {'depth' : depth, 'count' : len(positions)}
+        if len(positions) > 0 :
+            highest = positions[np.argmax(values[positions])]
+            result['highest'] = {'time' : highest * sampling_time_sec, 'value' : float(values[highest])}
+        if outfile is not None :
+            np.savetxt(outfile, np.column_stack((positions * sampling_time_sec, values[positions])), fmt='%.10g', delimiter=',')
+        return result
+    elif op == 'filter' :
+        name = request['filter']
+        option = FILTERS[name]
+        if option == '4' :
+            filtered = moving_average(values, request['window'], request['ma_kind'])
+        else :
+            design = select_filter(option, request['type'], request['order'], request['form'])
+            filtered = apply_filter(design, values, fir_method=request['fir_method'])
+        if outfile is not None :
+            np.savetxt(outfile, np.column_stack((np.arange(n) * sampling_time_sec, values, filtered)), fmt='%.10g', delimiter=',')
+        return {
+            'filter' : name, 'samples' : n, 'min' : float(np.min(filtered)), 'max' : float(np.max(filtered)),
+            'mean' : float(np.mean(filtered)), 'rms' : float(np.sqrt(np.mean(np.square(filtered))))
+        }
+    elif op == 'spectrum' :
+        nfft = int_parameter(request, 'nfft', None, n) if request['nfft'] is not None else None
+        freq_line, fft_data_set = amplitude_spectrum(values, sampling_frequency_hz, nfft)
+        amplitudes = np.abs(fft_data_set)
+        if outfile is not None :
+            np.savetxt(outfile, np.column_stack((freq_line, amplitudes)), fmt='%.10g', delimiter=',')
+        return {
+            'resolution' : float(freq_line[1]),
+            'dominant' : dominant_frequencies(freq_line, amplitudes, request['count'])
+        }
+    elif op == 'welch' :
+        nperseg = min(request['nperseg'], n)
+        freq_line, psd = welch_psd([values], sampling_frequency_hz, nperseg)
+        if outfile is not None :
+            np.savetxt(outfile, np.column_stack((freq_line, psd)), fmt='%.10g', delimiter=',')
+        return {
+            'resolution' : float(freq_line[1]),
+            'dominant' : dominant_frequencies(freq_line, psd, request['count'])
+        }
+    elif op == 'histogram' :
+        histogram = histogram_of_array(values, request['bins'])
+        return {
+            'edges' : histogram.edges(), 'counts' : histogram.counts, 'durations' : histogram.durations(sampling_time_sec)
+        }
+    raise ValueError('unknown operation: ' + str(op))
+
+# the path of the outfile of a request in the output directory (None if the request has no outfile)
+# the outfile must be a relative path without .., and it must stay in the output directory after resolving the
+# symbolic links too
+def output_path(outdir, outfile) :
+    if outfile is None :
+        return None
+    if outdir is None :
+        raise ValueError('the server writes no output files (it is started without --outdir)')
+    if not isinstance(outfile, str) or outfile == '' or os.path.isabs(outfile) or '..' in outfile.replace('\\', '/').split('/') :
+        raise ValueError('the outfile must be a relative path in the output directory without ..: ' + str(outfile))
+    path = os.path.realpath(os.path.join(outdir, outfile))
+    if os.path.commonpath([outdir, path]) != outdir :
+        raise ValueError('the outfile is not in the output directory: ' + outfile)
+    return path
+
+# the server: the resident data sets, the worker pool and the metrics
+# outdir is the output directory of the outfile of the requests (None if the requests cannot write files)
+class AnalysisServer :
+    def __init__(self, jobs, store, outdir=None) :
+        self.jobs = jobs
+        self.outdir = os.path.realpath(outdir) if outdir is not None else None
+        self.executor = None
+        self.restarting = asyncio.Lock()
+        self.restarts = 0
+        self.store = store
+        self.metrics = LatencyMetrics()
+        self.stopped = asyncio.Event()
+
+    # starting the worker processes before the first request, so the first request does not wait for them
+    # the workers are started by spawn, so they do not inherit the threads and the event loop of the server
+    async def start_workers(self) :
+        executor = ProcessPoolExecutor(max_workers=self.jobs, mp_context=get_context('spawn'))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(executor, warm_up) for i in range(self.jobs)])
+        self.executor = executor
+
+    # replacing the pool if a worker process died (ex.: it was killed because of the lack of memory)
+    # the requests which found the same broken pool replace it only once
+    async def restart_workers(self, broken) :
+        async with self.restarting :
+            if self.executor is not broken :
+                return
+            broken.shutdown(wait=False, cancel_futures=True)
+            await self.start_workers()
+            self.restarts += 1
+
+    def stop_workers(self) :
+        if self.executor is not None :
+            self.executor.shutdown(cancel_futures=True)
+
+    # answering a request, it returns with the answer (a dictionary)
+    async def answer(self, request) :
+        start = time.perf_counter()
+        latency = {}
+        op = request.get('op') if isinstance(request, dict) else None
+        try :
+            if op not in OPERATIONS :
+                raise ValueError('unknown operation (' + ', '.join(OPERATIONS) + '): ' + str(op))
+            result = await self.run(op, request, latency)
+            answer = {'ok' : True, 'result' : result}
+        except (ValueError, OSError) as err :
+            answer = {'ok' : False, 'error' : str(err)}
+        except Exception as err :
+            # an unexpected error of an operation (in a worker process too) fails only its request
+            answer = {'ok' : False, 'error' : type(err).__name__ + ': ' + str(err)}
+        latency['total'] = time.perf_counter() - start
+        if op in OPERATIONS :
+            self.metrics.record(op, latency, not answer['ok'])
+        answer['latency'] = {part + '_ms' : seconds * 1000 for part, seconds in latency.items()}
+        return answer
+
+    async def run(self, op, request, latency) :
+        if op == 'datasets' :
+            return self.store.info()
+        elif op == 'metrics' :
+            return {'operations' : self.metrics.report(), 'store' : self.store.info(), 'worker_restarts' : self.restarts}
+        elif op == 'shutdown' :
+            self.stopped.set()
+            return {}
+        if not isinstance(request.get('infile'), str) :
+            raise ValueError('there is no input file in the request')
+        if op == 'evict' :
+            key = self.store.key_of(request['infile'])
+            if key not in self.store.datasets :
+                raise ValueError('the input file is not resident: ' + request['infile'])
+            return self.store.evict(key).info()
+        if op in WORKER_OPERATIONS :
+            request = dict(check_request(request), outfile=output_path(self.outdir, request.get('outfile')))
+        dataset, latency['load'] = await self.store.acquire(request['infile'])
+        try :
+            if op == 'load' :
+                return dataset.info()
+            elif op == 'sampling' :
+                return dataset.sampling
+            submitted = time.perf_counter()
+            request = dict(request, use_cache=self.store.use_cache)
+            result, latency['attach'], latency['compute'] = await self.submit(dataset, request)
+            latency['queue'] = time.perf_counter() - submitted - latency['attach'] - latency['compute']
+            return result
+        finally :
+            self.store.release(dataset)
+
+    # running a request in the worker pool
+    # if the pool is broken (a worker process died), then it is replaced and the request is sent to the new pool
+    # (the running and the waiting requests of the broken pool fail together), a request is sent again only once,
+    # so a request which kills its worker fails
+    async def submit(self, dataset, request) :
+        loop = asyncio.get_running_loop()
+        for attempt in range(0, 2) :
+            executor = self.executor
+            try :
+                return await loop.run_in_executor(executor, run_analysis, dataset.descriptor(), list(self.store.released), request)
+            except BrokenProcessPool :
+                await self.restart_workers(executor)
+                if attempt > 0 :
+                    raise
+
+    # the requests of a client connection (one JSON request per line, they are answered in order)
+    async def serve_client(self, reader, writer) :
+        try :
+            while True :
+                line = await reader.readline()
+                if line == b'' :
+                    break
+                try :
+                    request = json.loads(line)
+                except ValueError as err :
+                    answer = {'ok' : False, 'error' : 'invalid request: ' + str(err)}
+                else :
+                    answer = await self.answer(request)
+                writer.write(json.dumps(answer, default=json_value).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.CancelledError) :
+            # the connection is lost, the line is too long or the server is stopped
+            pass
+        finally :
+            writer.close()
+
+# the task of the starting worker processes
+def warm_up() :
+    return os.getpid()
+
+async def run_server(host, port, jobs, store, outdir=None) :
+    server = AnalysisServer(jobs, store, outdir)
+    await server.start_workers()
+    try :
+        loop = asyncio.get_running_loop()
+        try :
+            loop.add_signal_handler(signal.SIGTERM, server.stopped.set)
+        except NotImplementedError :
+            # there are no signal handlers of the event loop on Windows
+            pass
+        listener = await asyncio.start_server(server.serve_client, host, port, limit=LINE_LIMIT)
+        print('Analysis server on tcp:' + host + ':' + str(port) + ' (' + str(jobs) + ' workers)', flush=True)
+        async with listener :
+            await server.stopped.wait()
+    finally :
+        server.stop_workers()
+
+# sending a request to the server, it returns with the answer
+def query(request, host=DEFAULT_HOST, port=DEFAULT_PORT) :
+    with socket.create_connection((host, port)) as connection :
+        connection.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with connection.makefile('rb') as answer :
+            line = answer.readline()
+    if line == b'' :
+        raise ConnectionError('the server closed the connection')
+    return json.loads(line)
+
+# query mode: the request of the command line is sent to the server
+def run_query(args) :
+    try :
+        request = json.loads(args['query'])
+    except ValueError as err :
+        print('invalid request: ' + str(err))
+        sys.exit(1)
+    if not isinstance(request, dict) :
+        print('the request must be a JSON object')
+        sys.exit(1)
+    if args['infile'] != None :
+        request['infile'] = args['infile']
+    # the input file is resolved here, because the working directory of the server can be different
+    # (the outfile is relative to the output directory of the server)
+    if isinstance(request.get('infile'), str) :
+        request['infile'] = os.path.abspath(request['infile'])
+    try :
+        answer = query(request, args['host'], int(args['port']))
+    except (OSError, ValueError) as err :
+        print('the server cannot be reached: ' + str(err))
+        sys.exit(1)
+    print(json.dumps(answer, indent=2))
+    if not answer['ok'] :
+        sys.exit(2)
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "hj:q:i:", [
+            "help", "host=", "port=", "jobs=", "max-datasets=", "max-memory=", "no-cache", "query=", "infile=", "outdir="
+        ])
+    except getopt.GetoptError as err :
+        print(err)
+        usage()
+        sys.exit(1)
+    args = opt_walk(opts)
+    if args['query'] != None :
+        run_query(args)
+        return
+    try :
+        port = int(args['port'])
+        jobs = int(args['jobs']) if args['jobs'] != None else os.cpu_count()
+        max_datasets = int(args['max_datasets'])
+        max_bytes = int(float(args['max_memory']) * (1 << 20))
+    except ValueError as err :
+        print('invalid setting: ' + str(err))
+        sys.exit(1)
+    if jobs < 1 or max_datasets < 1 or max_bytes < 1 :
+        print('The number of workers, the number of data sets and the memory limit must be positive.')
+        sys.exit(1)
+    if args['outdir'] != None and not os.path.isdir(args['outdir']) :
+        print('The output directory does not exist: ' + args['outdir'])
+        sys.exit(1)
+    store = DatasetStore(max_datasets, max_bytes, args['use_cache'])
+    try :
+        asyncio.run(run_server(args['host'], port, jobs, store, args['outdir']))
+    except KeyboardInterrupt :
+        pass
+    except OSError as err :
+        print(err)
+        sys.exit(1)
+    finally :
+        store.close()
+
+if __name__ == '__main__' :
+    main()
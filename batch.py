@@ -0,0 +1,328 @@
+#!/bin/python3
+
+# headless batch mode of data_visualizations.py and digital_filtering.py
+# the selected operations run on every input file without user interaction, the files are processed in parallel
+# by a pool of processes (one file per process at a time), the figures are saved as PNG files (Agg backend)
+# and the numeric results are written to csv and json files:
+#   <outdir>/<name of the input file>/<operation>.png, .csv or .json
+#   <outdir>/summary.json (sampling parameters, written files, errors and filter design cache counters of every input file,
+#   with --profile the run times of the stages too, see profiling.py)
+# usage: python batch.py -i "captures/*.csv" -p stats,peaks:3,welch,filter:lowpass -o results [-j processes]
+
+import matplotlib
+# the figures are never shown, so the non-interactive backend is used (in the worker processes too)
+matplotlib.use('Agg')
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import glob
+import json
+import os
+import numpy as np
+import getopt
+import sys
+
+from sample_rate import estimate_sample_rate
+from data_cache import read_csv_cached
+from data_statistics import statistics_of_array
+from peak_index import MAX_LEVELS, get_peak_index
+from spectrum import DEFAULT_SEGMENT, SPECTROGRAM_COLUMNS, segment_count, spectrogram, welch_psd
+from moving_average import KINDS, moving_average
+from fir_engine import METHODS
+from data_visualizations import (
+    calculate_fft_with_freq_line, get_time_points, show_fft_figure, show_histogram, show_peak_values,
+    show_psd_figure, show_scatter, show_spectrogram_figure, show_time_diagram
+)
+from digital_filtering import apply_filter, select_filter, show_filtered_figure
+from design_cache import design_cache_info, set_disk_cache
+from histogram import DEFAULT_BINS, histogram_of_array
+from profiling import enable_profiling, profile_report, reset_profiling
+from headless import FILTERS, json_value
+
+OPERATIONS = ('time', 'stats', 'peaks', 'spectrum', 'welch', 'spectrogram', 'histogram', 'scatter', 'filter')
+
+def usage() :
+    print(
+        '-h --help for help\r\n'
+        '-i --infile pattern (input file or glob pattern, it can be given more times)\r\n'
+        '-p --operations list (comma separated list of operations, it can be given more times):\r\n'
+        '    time, stats, peaks[:depth 1-9], spectrum, welch, spectrogram, histogram, scatter,\r\n'
+        '    filter:[lowpass highpass bandpass movingaverage]\r\n'
+        '-o --outdir directory (default: batch_results)\r\n'
+        '-j --jobs number (number of processes, default: number of CPUs)\r\n'
+        '-t --type [fir iir] -f --form [ba sos] --order number --fir-method method (see digital_filtering.py)\r\n'
+        '-w --window number --ma-kind kind (moving average, see digital_filtering.py)\r\n'
+        '--nperseg samples --nfft number (spectral analysis, see data_visualizations.py)\r\n'
+        '--bins number (number of the bins of the histogram, default: 10)\r\n'
+        '--no-cache (the parsed input files and the filter designs are not cached on the disk)\r\n'
+        '--profile (the run times of the stages of every input file are written to the summary)\r\n'
+    )
+
+# handling of input arguments
+# it returns with a dictionary of the input patterns, the operations and the settings of the operations
+def opt_walk(opts) :
+    args = {
+        'patterns' : [], 'operations' : [], 'outdir' : 'batch_results', 'jobs' : None,
+        'type' : 'fir', 'form' : 'ba', 'order' : '50', 'fir_method' : 'auto', 'window' : '50', 'ma_kind' : 'simple',
+        'nperseg' : str(DEFAULT_SEGMENT), 'nfft' : None, 'bins' : str(DEFAULT_BINS), 'use_cache' : True, 'profile' : False
+    }
+    for o, a in opts :
+        if o in ("-h", "--help") :
+            usage()
+        elif o in ("-i", "--infile") :
+            args['patterns'].append(a)
+        elif o in ("-p", "--operations") :
+            args['operations'] += [operation for operation in a.split(',') if operation != '']
+        elif o in ("-o", "--outdir") :
+            args['outdir'] = a
+        elif o in ("-j", "--jobs") :
+            args['jobs'] = a
+        elif o in ("-t", "--type") :
+            args['type'] = a
+        elif o in ("-f", "--form") :
+            args['form'] = a
+        elif o == "--order" :
+            args['order'] = a
+        elif o == "--fir-method" :
+            args['fir_method'] = a
+        elif o in ("-w", "--window") :
+            args['window'] = a
+        elif o == "--ma-kind" :
+            args['ma_kind'] = a
+        elif o == "--nperseg" :
+            args['nperseg'] = a
+        elif o == "--nfft" :
+            args['nfft'] = a
+        elif o == "--bins" :
+            args['bins'] = a
+        elif o == "--no-cache" :
+            args['use_cache'] = False
+        elif o == "--profile" :
+            args['profile'] = True
+        else :
+            print("unhandled option")
+            usage()
+    return args
+
+# checking an operation (ex.: peaks:3), it returns with the name and the parameter of the operation
+# (the parameter is None if it is not needed) or raises ValueError
+def parse_operation(operation) :
+    name, separator, parameter = operation.partition(':')
+    if name not in OPERATIONS :
+        raise ValueError('unknown operation: ' + operation)
+    if name == 'peaks' :
+        depth = int(parameter) if parameter != '' else 1
+        if depth < 1 or depth > MAX_LEVELS :
+            raise ValueError('the depth of the peak finding must be between 1 and ' + str(MAX_LEVELS) + ': ' + operation)
+        return name, depth
+    if name == 'filter' :
+        if parameter not in FILTERS :
+            raise ValueError('unknown filter (' + ', '.join(FILTERS) + '): ' + operation)
+        return name, parameter
+    if parameter != '' :
+        raise ValueError('the ' + name + ' operation has no parameter: ' + operation)
+    return name, None
+
+# the input files of the glob patterns (in sorted order, every file only once)
+def expand_patterns(patterns) :
+    files = []
+    for pattern in patterns :
+        matches = sorted(glob.glob(pattern))
+        if len(matches) == 0 and os.path.isfile(pattern) :
+            matches = [pattern]
+        files += [path for path in matches if os.path.isfile(path) and path not in files]
+    return files
+
+# the names of the output directories of the input files (the name of the input file without its extension,
+# the same names are numbered)
+def output_names(files) :
+    names = []
+    for path in files :
+        name = os.path.splitext(os.path.basename(path))[0]
+        candidate = name
+        number = 2
+        while candidate in names :
+            candidate = name + '_' + str(number)
+            number += 1
+        names.append(candidate)
+    return names
+
+# running one operation on the data set, the results are written to the directory
+# it returns with the list of the written files
+def run_operation(name, parameter, directory, value_list, sampling, infile, settings) :
+    sampling_time_sec = sampling['sample_time']
+    sampling_frequency_hz = sampling['sampling_frequency']
+    n = len(value_list)
+    time_line = np.arange(n) * sampling_time_sec
+    path = lambda filename : os.path.join(directory, filename)
+    if name == 'time' :
+        show_time_diagram(time_line, value_list, path('time.png'))
+        return ['time.png']
+    elif name == 'stats' :
+        with open(path('stats.json'), 'w') as out :
+            json.dump(statistics_of_array(value_list), out, indent=2, default=json_value)
+        return ['stats.json']
+    elif name == 'peaks' :
+        peak_index = get_peak_index(infile, value_list, settings['use_cache'])
+        positions = peak_index.level(parameter)
+        time_points = get_time_points(sampling_time_sec, positions)
+        prefix = 'peaks_' + str(parameter)
+        np.savetxt(path(prefix + '.csv'), np.column_stack((time_points, value_list[positions])), fmt='%.10g', delimiter=',')
+        show_peak_values(time_line, value_list, time_points, value_list[positions], path(prefix + '.png'))
+        return [prefix + '.csv', prefix + '.png']
+    elif name == 'spectrum' :
+        nfft = settings['nfft'] if settings['nfft'] != None and settings['nfft'] >= n else None
+        freq_line, fft_data_set = calculate_fft_with_freq_line(value_list, sampling_frequency_hz, nfft)
+        np.savetxt(path('spectrum.csv'), np.column_stack((freq_line, np.abs(fft_data_set))), fmt='%.10g', delimiter=',')
+        show_fft_figure(freq_line, fft_data_set, path('spectrum.png'))
+        return ['spectrum.csv', 'spectrum.png']
+    elif name in ('welch', 'spectrogram') :
+        nperseg = min(settings['nperseg'], n)
+        nfft = max(settings['nfft'], nperseg) if settings['nfft'] != None else None
+        if name == 'welch' :
+            freq_line, psd = welch_psd([value_list], sampling_frequency_hz, nperseg, nfft=nfft)
+            np.savetxt(path('welch.csv'), np.column_stack((freq_line, psd)), fmt='%.10g', delimiter=',')
+            show_psd_figure(freq_line, psd, path('welch.png'))
+            return ['welch.csv', 'welch.png']
+        group = -(-segment_count(n, nperseg) // SPECTROGRAM_COLUMNS)
+        freq_line, spectrogram_time, powers = spectrogram([value_list], sampling_frequency_hz, nperseg, nfft=nfft, group=group)
+        show_spectrogram_figure(freq_line, spectrogram_time, powers, path('spectrogram.png'))
+        return ['spectrogram.png']
+    elif name == 'histogram' :
+        histogram = histogram_of_array(value_list, settings['bins'])
+        edges = histogram.edges()
+        np.savetxt(
+            path('histogram.csv'), np.column_stack((edges[:-1], edges[1:], histogram.counts, histogram.durations(sampling_time_sec))),
+            fmt='%.10g', delimiter=','
+        )
+        show_histogram(histogram, sampling_time_sec, path('histogram.png'))
+        return ['histogram.csv', 'histogram.png']
+    elif name == 'scatter' :
+        show_scatter(value_list, path('scatter.png'))
+        return ['scatter.png']
+    elif name == 'filter' :
+        option = FILTERS[parameter]
+        if option == '4' :
+            filtered = moving_average(value_list, settings['window'], settings['ma_kind'])
+        else :
+            design = select_filter(option, settings['type'], settings['order'], settings['form'])
+            filtered = apply_filter(design, value_list, fir_method=settings['fir_method'])
+        prefix = 'filter_' + parameter
+        np.savetxt(path(prefix + '.csv'), np.column_stack((time_line, value_list, filtered)), fmt='%.10g', delimiter=',')
+        show_filtered_figure(time_line, value_list, filtered, path(prefix + '.png'))
+        return [prefix + '.csv', prefix + '.png']
+    raise ValueError('unknown operation: ' + name)
+
+# processing of one input file in a worker process
+# the errors of the operations are collected, so an operation can fail without stopping the others
+# it returns with the summary of the input file (sampling parameters, written files and errors)
+def process_file(infile, name, operations, outdir, settings) :
+    summary = {'infile' : infile, 'outputs' : [], 'errors' : {}}
+    set_disk_cache(settings['use_cache'])
+    # the stages are measured separately for every input file of the process
+    enable_profiling(settings['profile'])
+    reset_profiling()
+    ts_list, value_list = read_csv_cached(infile, settings['use_cache'])
+    summary['samples'] = len(value_list)
+    sampling = estimate_sample_rate(ts_list)
+    summary['sampling'] = {key : sampling[key] for key in ('sampling_frequency', 'sample_time', 'jitter', 'dropped_samples', 'confidence')}
+    directory = os.path.join(outdir, name)
+    os.makedirs(directory, exist_ok=True)
+    for operation in operations :
+        try :
+            written = run_operation(*parse_operation(operation), directory, value_list, sampling, infile, settings)
+            summary['outputs'] += [os.path.join(directory, filename) for filename in written]
+        except (ValueError, OSError, IndexError) as err :
+            summary['errors'][operation] = str(err)
+    # the counters belong to the worker process, so they show the reuse of the designs by the files of the process
+    summary['design_cache'] = design_cache_info()
+    if settings['profile'] :
+        report = profile_report()
+        summary['profile'] = {key : report[key] for key in ('wall_time', 'cpu_time', 'peak_rss_bytes', 'stages')}
+    return summary
+
+# checking the settings of the operations, it returns with the converted settings or exits with an error message
+def check_settings(args) :
+    if args['type'] not in ('fir', 'iir') or args['form'] not in ('ba', 'sos') :
+        print('The filter type must be fir or iir and the form must be ba or sos.')
+        sys.exit(1)
+    if args['fir_method'] not in METHODS :
+        print('There is no valid FIR filtering method. User can only enter ' + ', '.join(METHODS) + ' method.')
+        sys.exit(1)
+    if args['ma_kind'] not in KINDS :
+        print('There is no valid moving average kind. User can only enter ' + ', '.join(KINDS) + ' kind.')
+        sys.exit(1)
+    try :
+        settings = {
+            'type' : args['type'], 'form' : args['form'], 'order' : int(args['order']), 'fir_method' : args['fir_method'],
+            'window' : int(args['window']), 'ma_kind' : args['ma_kind'],
+            'nperseg' : int(args['nperseg']), 'nfft' : None if args['nfft'] == None else int(args['nfft']), 'bins' : int(args['bins']),
+            'use_cache' : args['use_cache'], 'profile' : args['profile']
+        }
+    except ValueError :
+        print('The order, the window, the segment length, the FFT length and the number of bins must be integers.')
+        sys.exit(1)
+    if settings['order'] < 1 or settings['window'] < 1 or settings['bins'] < 1 or settings['nperseg'] < 2 :
+        print('The order, the window and the number of bins must be positive, the segment length must be at least 2.')
+        sys.exit(1)
+    return settings
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "hi:p:o:j:t:f:w:", [
+            "help", "infile=", "operations=", "outdir=", "jobs=", "type=", "form=", "order=", "fir-method=",
+            "window=", "ma-kind=", "nperseg=", "nfft=", "bins=", "no-cache", "profile"
+        ])
+    except getopt.GetoptError as err :
+        print(err)
+        usage()
+        sys.exit(1)
+    args = opt_walk(opts)
+    files = expand_patterns(args['patterns'])
+    if len(files) == 0 :
+        print('there is no existing input file\r\nhint: -i, --infile pattern')
+        sys.exit(1)
+    if len(args['operations']) == 0 :
+        print('there is no operation\r\nhint: -p, --operations list')
+        sys.exit(1)
+    for operation in args['operations'] :
+        try :
+            parse_operation(operation)
+        except ValueError as err :
+            print(err)
+            sys.exit(1)
+    settings = check_settings(args)
+    try :
+        jobs = int(args['jobs']) if args['jobs'] != None else os.cpu_count()
+    except ValueError :
+        jobs = 0
+    if jobs < 1 :
+        print('The number of processes must be a positive integer.')
+        sys.exit(1)
+    outdir = args['outdir']
+    os.makedirs(outdir, exist_ok=True)
+    summaries = []
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor :
+        futures = {
+            executor.submit(process_file, infile, name, args['operations'], outdir, settings) : infile
+            for infile, name in zip(files, output_names(files))
+        }
+        for done, future in enumerate(as_completed(futures), 1) :
+            infile = futures[future]
+            try :
+                summary = future.result()
+            except Exception as err :
+                summary = {'infile' : infile, 'outputs' : [], 'errors' : {'file' : type(err).__name__ + ': ' + str(err)}}
+            if len(summary['errors']) > 0 :
+                failed += 1
+            summaries.append(summary)
+            print('[' + str(done) + '/' + str(len(files)) + '] ' + infile + (' (errors: ' + ', '.join(summary['errors']) + ')' if len(summary['errors']) > 0 else ''))
+    summaries.sort(key=lambda summary : summary['infile'])
+    with open(os.path.join(outdir, 'summary.json'), 'w') as out :
+        json.dump(summaries, out, indent=2, default=json_value)
+    print(str(len(files) - failed) + ' of ' + str(len(files)) + ' input files are processed without errors, the results are in ' + outdir)
+    if failed > 0 :
+        sys.exit(2)
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,2 @@
+# benchmarks of the DSP tasks
+# run them from the root of the repository, ex.: python -m benchmarks.bench_timestamps
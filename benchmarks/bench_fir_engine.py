@@ -0,0 +1,59 @@
+#!/bin/python3
+
+# comparison of the direct form and the FFT based (overlap-add, overlap-save) FIR filtering
+# for every signal length it shows the run times for filters with different length, the method chosen by the engine
+# and the measured crossover (the shortest filter from which the FFT based filtering is faster)
+# usage: python -m benchmarks.bench_fir_engine [-n samples,samples,...] [-r repeat]
+
+import numpy as np
+import getopt
+import time
+import sys
+
+from fir_engine import choose_fir_method, fast_fir_filtering
+
+TAPS = [8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192]
+LENGTHS = [10000, 100000, 1000000]
+
+# it returns with the best of the measured run times in seconds
+def best_time(function, repeat) :
+    best = None
+    for i in range(0, repeat) :
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best :
+            best = elapsed
+    return best
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "n:r:", ["samples=", "repeat="])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(1)
+    lengths = LENGTHS
+    repeat = 3
+    for o, a in opts :
+        if o in ("-n", "--samples") :
+            lengths = [int(i) for i in a.split(',')]
+        elif o in ("-r", "--repeat") :
+            repeat = int(a)
+    rng = np.random.default_rng(0)
+    for n in lengths :
+        x = rng.normal(size=n)
+        print(str(n) + ' samples (run times in ms)')
+        print('  {:>6s} {:>10s} {:>12s} {:>13s}   {}'.format('taps', 'direct', 'overlap-add', 'overlap-save', 'auto'))
+        crossover = None
+        for taps in TAPS :
+            if taps > n :
+                break
+            b = rng.normal(size=taps)
+            times = [best_time(lambda : fast_fir_filtering(b, x, method), repeat) for method in ('direct', 'overlap-add', 'overlap-save')]
+            if crossover is None and min(times[1:]) < times[0] :
+                crossover = taps
+            print('  {:6d} {:10.2f} {:12.2f} {:13.2f}   {}'.format(taps, *[t * 1000 for t in times], choose_fir_method(taps, n)))
+        print('  measured crossover: ' + (str(crossover) + ' taps' if crossover is not None else 'none') + '\r\n')
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,74 @@
+#!/bin/python3
+
+# comparison of the b, a (lfilter) and the second-order sections (sosfilt) forms of the IIR filters of the menu
+# throughput (samples/s) and numerical error are measured for each filter
+# the reference is the float64 second-order sections filtering, the error is the maximal absolute difference from it
+# relative to the maximal absolute value of the reference
+# usage: python -m benchmarks.bench_iir_forms [-n samples] [-r repeat]
+
+import numpy as np
+import getopt
+import time
+import sys
+
+from digital_filtering import (
+    lowhigh_pass_iir, lowhigh_pass_iir_sos, band_pass_iir, band_pass_iir_sos, iir_filtering, sos_filtering
+)
+
+# the IIR filters of the menu of digital_filtering.py (name, b a design, sos design)
+FILTERS = [
+    ('low pass', lambda : lowhigh_pass_iir(0.0005, 0.005), lambda : lowhigh_pass_iir_sos(0.0005, 0.005)),
+    ('high pass', lambda : lowhigh_pass_iir(0.01, 0.005), lambda : lowhigh_pass_iir_sos(0.01, 0.005)),
+    ('band pass', lambda : band_pass_iir(0.001, 0.02, 0.0005, 0.05), lambda : band_pass_iir_sos(0.001, 0.02, 0.0005, 0.05)),
+]
+
+# it returns with the result of the last run and the best of the measured run times in seconds
+def measure(function, repeat) :
+    best = None
+    for i in range(0, repeat) :
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best :
+            best = elapsed
+    return result, best
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "n:r:", ["samples=", "repeat="])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(1)
+    n = 1000000
+    repeat = 3
+    for o, a in opts :
+        if o in ("-n", "--samples") :
+            n = int(a)
+        elif o in ("-r", "--repeat") :
+            repeat = int(a)
+    rng = np.random.default_rng(0)
+    x = np.cumsum(rng.normal(size=n)) * 0.01 + rng.normal(size=n)
+    for name, ba_design, sos_design in FILTERS :
+        b, a = ba_design()
+        sos = sos_design()
+        reference = sos_filtering(sos, x)
+        scale = np.max(np.abs(reference))
+        print(name + ' filter (order ' + str(len(a) - 1) + ', ' + str(len(sos)) + ' sections), ' + str(n) + ' samples')
+        runs = [
+            ('ba lfilter float64', lambda : iir_filtering(b, a, x)),
+            ('sos float64', lambda : sos_filtering(sos, x)),
+            ('sos float32', lambda : sos_filtering(sos, x, dtype=np.float32)),
+            ('sos zero-phase', lambda : sos_filtering(sos, x, zero_phase=True)),
+        ]
+        for label, function in runs :
+            result, elapsed = measure(function, repeat)
+            # the zero-phase filtering gives a different signal, so its error is not comparable
+            if label == 'sos zero-phase' :
+                error = '-'
+            else :
+                with np.errstate(all='ignore') :
+                    error = '{:.3g}'.format(np.max(np.abs(result.astype(np.float64) - reference)) / scale)
+            print('  {:20s} {:14.0f} samples/s   rel. error: {}'.format(label, n / elapsed, error))
+
+if __name__ == '__main__' :
+    main()
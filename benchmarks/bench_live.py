@@ -0,0 +1,92 @@
+#!/bin/python3
+
+# batching of the live mode (live.read_batches) on the lines of the replay server split between the writes
+# the replay server (live.start_replay with split) holds back the end of the last line of every write, so the batches
+# end in the middle of a line like TCP segments
+#  - slow pass: the lines are sent less often than the batch delay, so a batch window expires with only a partial line
+#  - fast pass: many lines per write, the throughput and the latency of the batches are measured
+# the received batches must be complete lines and they must give back the input file, the benchmark stops with
+# an error if they do not or the reading does not finish in time
+# usage: python -m benchmarks.bench_live [-n rows] [--rate Hz] [--speed factor] [--slow-rows rows]
+
+import tempfile
+import asyncio
+import time
+import os
+import getopt
+import sys
+
+from benchmarks.synthetic import DEFAULT_RATE, write_synthetic_csv
+from live import BATCH_DELAY, DEFAULT_HOST, read_batches, start_replay
+
+# rate of the slow pass (Hz), its lines are sent in every 1 / SLOW_RATE sec (more than BATCH_DELAY)
+SLOW_RATE = 1 / (4 * BATCH_DELAY)
+
+# reading the lines of the replay server with read_batches
+# it returns with the batches, the arrival times of the batches and the time when they were given back
+async def collect_batches(infile, speed, timeout) :
+    server, count = await start_replay(infile, DEFAULT_HOST, 0, speed, split=True)
+    port = server.sockets[0].getsockname()[1]
+    batches = []
+    async with server :
+        reader, writer = await asyncio.open_connection(DEFAULT_HOST, port)
+
+        async def read() :
+            async for data, arrived in read_batches(reader) :
+                batches.append((data, arrived, time.perf_counter()))
+
+        try :
+            await asyncio.wait_for(read(), timeout)
+        finally :
+            writer.close()
+    return batches
+
+# one pass: the batches must be complete lines which give back the input file
+def run_pass(name, rows, rate, speed) :
+    with tempfile.TemporaryDirectory() as directory :
+        infile = os.path.join(directory, 'live.csv')
+        write_synthetic_csv(infile, rows, rate)
+        with open(infile, 'rb') as data :
+            expected = data.read()
+        duration = rows / rate / speed
+        start = time.perf_counter()
+        try :
+            batches = asyncio.run(collect_batches(infile, speed, 2 * duration + 5))
+        except asyncio.TimeoutError :
+            print(name + ': the batches are not read in time (' + str(2 * duration + 5) + ' s)')
+            sys.exit(1)
+        elapsed = time.perf_counter() - start
+    if any(not data.endswith(b'\n') for data, arrived, done in batches) or b''.join(data for data, arrived, done in batches) != expected :
+        print(name + ': the batches are not the complete lines of the input file')
+        sys.exit(1)
+    latencies = [done - arrived for data, arrived, done in batches]
+    print('  {:5s} {:8d} lines {:8.1f} lines/s {:6d} batches, latency {:.1f} ms (max {:.1f} ms)'.format(
+        name, rows, rows / elapsed, len(batches), 1000 * sum(latencies) / len(latencies), 1000 * max(latencies)
+    ))
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "n:", ["rows=", "rate=", "speed=", "slow-rows="])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(1)
+    rows = 100000
+    rate = DEFAULT_RATE
+    speed = 100.0
+    slow_rows = 20
+    for o, a in opts :
+        if o in ("-n", "--rows") :
+            rows = int(float(a))
+        elif o == "--rate" :
+            rate = float(a)
+        elif o == "--speed" :
+            speed = float(a)
+        elif o == "--slow-rows" :
+            slow_rows = int(a)
+    print('batches of the lines split between the writes of the replay server')
+    run_pass('slow', slow_rows, SLOW_RATE, 1.0)
+    run_pass('fast', rows, rate, speed)
+    print('  the batches are the complete lines of the input file')
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,71 @@
+#!/bin/python3
+
+# comparison of the full rate and the multirate filtering of the low pass and band pass filters of the menu
+# throughput (samples/s) is measured for both, the error is the RMS difference of the outputs relative to the RMS
+# of the full rate output (the first and the last 5 % of the signal are skipped because of the start-up of the filters)
+# usage: python -m benchmarks.bench_multirate [-n samples] [-r repeat] [--order number]
+
+import numpy as np
+import getopt
+import time
+import sys
+
+from digital_filtering import apply_filter, select_filter, select_multirate_filter
+from multirate import multirate_filtering
+
+# the filters of the comparison (name, menu option, type, form)
+FILTERS = [
+    ('low pass FIR', '1', 'fir', 'ba'),
+    ('band pass FIR', '3', 'fir', 'ba'),
+    ('low pass IIR sos', '1', 'iir', 'sos'),
+    ('band pass IIR sos', '3', 'iir', 'sos'),
+    ('low pass IIR ba', '1', 'iir', 'ba'),
+]
+
+# it returns with the result of the last run and the best of the measured run times in seconds
+def measure(function, repeat) :
+    best = None
+    for i in range(0, repeat) :
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best :
+            best = elapsed
+    return result, best
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "n:r:", ["samples=", "repeat=", "order="])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(1)
+    n = 2000000
+    repeat = 3
+    order = 50
+    for o, a in opts :
+        if o in ("-n", "--samples") :
+            n = int(a)
+        elif o in ("-r", "--repeat") :
+            repeat = int(a)
+        elif o == "--order" :
+            order = int(a)
+    rng = np.random.default_rng(0)
+    x = np.cumsum(rng.normal(size=n)) * 0.01 + rng.normal(size=n)
+    skip = n // 20
+    for name, option, type, form in FILTERS :
+        design = select_filter(option, type, order, form)
+        factor, reduced = select_multirate_filter(option, type, order, form)
+        full, full_time = measure(lambda : apply_filter(design, x), repeat)
+        multirate, multirate_time = measure(lambda : multirate_filtering(x, factor, lambda y : apply_filter(reduced, y)), repeat)
+        reference = full[skip:n - skip]
+        with np.errstate(all='ignore') :
+            error = np.sqrt(np.mean((multirate[skip:n - skip] - reference) ** 2) / np.mean(reference ** 2))
+        print(
+            name + ' (decimation by ' + str(factor) + '), ' + str(n) + ' samples\r\n'
+            '  full rate: {:14.0f} samples/s\r\n'
+            '  multirate: {:14.0f} samples/s ({:.1f}x)\r\n'
+            '  rel. RMS error: {:.3g}'.format(n / full_time, n / multirate_time, full_time / multirate_time, error)
+        )
+
+if __name__ == '__main__' :
+    main()
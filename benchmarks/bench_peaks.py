@@ -0,0 +1,119 @@
+#!/bin/python3
+
+# comparison of the original peak finding loops and the vectorized peak finding (peaks.py)
+# the positions of the peaks must be the same at every level, the benchmark stops with an error if they are not
+# usage: python -m benchmarks.bench_peaks [-n samples] [-l levels] [-r repeat]
+
+import numpy as np
+import getopt
+import time
+import sys
+
+from peaks import peak_levels
+
+# the original implementation of find_peak_values_with_postitions of data_visualizations.py
+def find_peak_values_with_postitions_loop(data_set) :
+    peak_values = [[], []]
+    positions = []
+    if data_set[0, 1] > data_set[1, 1] :
+        peak_values[0].append(data_set[0, 0])
+        peak_values[1].append(data_set[0, 1])
+        positions.append(0)
+    i = 1
+    size = len(data_set[:,0])
+    while i < (size - 1) :
+        if (data_set[i, 1] > data_set[i - 1, 1]) and (data_set[i, 1] > data_set[i + 1, 1]) :
+            peak_values[0].append(data_set[i, 0])
+            peak_values[1].append(data_set[i, 1])
+            positions.append(i)
+            i += 2
+        else :
+            i += 1
+    if data_set[-1, 1] > data_set[-2, 1] :
+        peak_values[0].append(data_set[size - 1, 0])
+        peak_values[1].append(data_set[size - 1, 1])
+        positions.append(size - 1)
+    return peak_values, positions
+
+# the original implementation of reduce_peak_values of data_visualizations.py
+def reduce_peak_values_loop(peak_values, positions) :
+    new_positions = []
+    new_peak_values = [[], []]
+    if peak_values[1][0] > peak_values[1][1] :
+        new_peak_values[0].append(peak_values[0][0])
+        new_peak_values[1].append(peak_values[1][0])
+        new_positions.append(positions[0])
+    i = 1
+    size = len(peak_values[0])
+    while i < (size - 1) :
+        if (peak_values[1][i] > peak_values[1][i - 1]) and (peak_values[1][i] > peak_values[1][i + 1]) :
+            new_peak_values[0].append(peak_values[0][i])
+            new_peak_values[1].append(peak_values[1][i])
+            new_positions.append(positions[i])
+            i += 2
+        else :
+            i += 1
+    if peak_values[1][-1] > peak_values[1][-2] :
+        new_peak_values[0].append(peak_values[0][size - 1])
+        new_peak_values[1].append(peak_values[1][size - 1])
+        new_positions.append(positions[size - 1])
+    return new_peak_values, new_positions
+
+# the peak positions of every level with the original loops
+# (the original reduction needs at least two peaks, so the levels stop there)
+def peak_levels_loop(data_set, levels) :
+    peak_values, positions = find_peak_values_with_postitions_loop(data_set)
+    result = [positions]
+    for i in range(1, levels) :
+        if len(positions) < 2 :
+            break
+        peak_values, positions = reduce_peak_values_loop(peak_values, positions)
+        result.append(positions)
+    return result
+
+# it returns with the result of the last run and the best of the measured run times in seconds
+def measure(function, repeat) :
+    best = None
+    for i in range(0, repeat) :
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best :
+            best = elapsed
+    return result, best
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "n:l:r:", ["samples=", "levels=", "repeat="])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(1)
+    n = 1000000
+    levels = 9
+    repeat = 3
+    for o, a in opts :
+        if o in ("-n", "--samples") :
+            n = int(a)
+        elif o in ("-l", "--levels") :
+            levels = int(a)
+        elif o in ("-r", "--repeat") :
+            repeat = int(a)
+    rng = np.random.default_rng(0)
+    # quantized values like the sensor data, so there are equal neighbors (plateaus) too
+    values = np.round(np.cumsum(rng.normal(size=n)) * 0.01 + rng.normal(size=n), 2)
+    data_set = np.column_stack((np.arange(n) * 1.25, values))
+    reference, loop_time = measure(lambda : peak_levels_loop(data_set, levels), 1)
+    result, vectorized_time = measure(lambda : peak_levels(values, levels), repeat)
+    for level, positions in enumerate(reference) :
+        if not np.array_equal(np.asarray(positions, dtype=np.int64), result[level]) :
+            print('the peak positions are different at level ' + str(level + 1))
+            sys.exit(1)
+    print(
+        str(n) + ' samples, ' + str(levels) + ' levels (' + ', '.join(str(len(p)) for p in result) + ' peaks)\r\n'
+        '  loops:      {:.3f} s\r\n'
+        '  vectorized: {:.3f} s ({:.1f}x)\r\n'
+        '  the peak positions are the same at every level'.format(loop_time, vectorized_time, loop_time / vectorized_time)
+    )
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,238 @@
+#!/bin/python3
+
+# benchmark suite of the DSP paths of the programs on synthetic input files (see synthetic.py)
+# for every number of rows a synthetic csv file is generated (or reused from the data directory) and every stage runs on it:
+# reading, time stamp conversion, sampling time estimation, peak finding, statistics, histogram, spectral analysis,
+# the filters of the menu of digital_filtering.py (FIR, IIR b a and IIR sos forms), moving average, filter bank,
+# multirate filtering and the rendering of the time figure
+# the run time of a stage is the best of repeat runs, the memory is the peak of the traced (numpy and python)
+# allocations of an additional first run (tracemalloc), the peak resident memory of the process is reported too
+# the results are written to a JSON file in the results directory, and they can be compared with an earlier result
+# usage: python -m benchmarks.bench_suite [-n rows,rows...] [-r repeat] [-s stage,stage...] [--rate Hz] [--jitter sec]
+#        [--gaps number] [--noise value] [--seed number] [--order number] [--label name] [--results directory]
+#        [--data-dir directory] [--compare result.json]
+
+import matplotlib
+# the figures are rendered without a window
+matplotlib.use('Agg')
+
+from io import BytesIO
+import tracemalloc
+import platform
+import tempfile
+import json
+import time
+import os
+import pandas as ps
+import numpy as np
+import scipy
+import getopt
+import sys
+
+from benchmarks.synthetic import DEFAULT_RATE, write_synthetic_csv
+from csv_stream import DEFAULT_CHUNK_SIZE, read_csv_arrays
+from timestamps import convert_timestamps_to_ms
+from sample_rate import calculate_sample_time, estimate_sample_rate
+from peaks import find_peak_positions
+from peak_index import PeakIndex
+from data_statistics import statistics_of_array
+from histogram import histogram_of_array
+from spectrum import DEFAULT_SEGMENT, SPECTROGRAM_COLUMNS, segment_count, spectrogram, welch_psd
+from data_visualizations import calculate_fft_with_freq_line, show_time_diagram
+from digital_filtering import apply_filter, select_filter, select_multirate_filter
+from moving_average import moving_average
+from filter_bank import FilterBank
+from multirate import multirate_filtering
+from design_cache import set_disk_cache
+from profiling import peak_rss_bytes
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'dsp_tasks_benchmarks')
+# the filters of the menu options 1 - 3 (name, option) and their types and forms
+FILTER_OPTIONS = [('lowpass', '1'), ('highpass', '2'), ('bandpass', '3')]
+FILTER_FORMS = [('fir', 'ba'), ('iir', 'ba'), ('iir', 'sos')]
+# the stages which measure only a part of their work
+SELF_TIMED = {'convert_timestamps'}
+
+# time stamp conversion of the time stamp column of the file (read chunk by chunk, only the conversion is measured)
+# it returns with the run time of the conversion in seconds
+def convert_timestamp_chunks(infile) :
+    elapsed = 0.0
+    reader = ps.read_csv(infile, sep=',', header=None, usecols=[0], dtype=str, chunksize=DEFAULT_CHUNK_SIZE)
+    with reader :
+        for chunk in reader :
+            timestamps = chunk[0].to_numpy()
+            start = time.perf_counter()
+            convert_timestamps_to_ms(timestamps)
+            elapsed += time.perf_counter() - start
+    return elapsed
+
+# the stages of the suite, every stage is a (name, function) pair, the function gets the data of the input file
+# (see load_data), the functions of the SELF_TIMED stages return with their own run time in seconds
+def suite_stages(order) :
+    stages = [
+        ('read_csv', lambda data : read_csv_arrays(data['infile'])),
+        ('convert_timestamps', lambda data : convert_timestamp_chunks(data['infile'])),
+        ('calculate_sample_time', lambda data : calculate_sample_time(data['ts'])),
+        ('peak_index', lambda data : PeakIndex.build(data['values'])),
+        ('find_peaks', lambda data : find_peak_positions(data['values'], 3)),
+        ('statistics', lambda data : statistics_of_array(data['values'])),
+        ('histogram', lambda data : histogram_of_array(data['values'])),
+        ('fft', lambda data : calculate_fft_with_freq_line(data['values'], data['fs'])),
+        ('welch', lambda data : welch_psd([data['values']], data['fs'], data['nperseg'])),
+        ('spectrogram', lambda data : spectrogram([data['values']], data['fs'], data['nperseg'], group=data['group'])),
+    ]
+    for type, form in FILTER_FORMS :
+        for name, option in FILTER_OPTIONS :
+            stages.append((
+                name + '_' + type + '_' + form,
+                lambda data, option=option, type=type, form=form : apply_filter(select_filter(option, type, order, form), data['values'])
+            ))
+    stages += [
+        ('moving_average', lambda data : moving_average(data['values'], 50)),
+        ('filter_bank', lambda data : FilterBank([select_filter(option, 'fir', order) for name, option in FILTER_OPTIONS]).filter(data['values'])),
+        ('multirate_lowpass_fir', lambda data : multirate_lowpass(data['values'], order)),
+        ('time_figure', lambda data : show_time_diagram(data['time_line'], data['values'], BytesIO())),
+    ]
+    return stages
+
+def multirate_lowpass(values, order) :
+    factor, design = select_multirate_filter('1', 'fir', order)
+    return multirate_filtering(values, factor, lambda decimated : apply_filter(design, decimated))
+
+# the data of the input file which are used by the stages
+def load_data(infile) :
+    ts, values = read_csv_arrays(infile)
+    sampling = estimate_sample_rate(ts)
+    nperseg = min(DEFAULT_SEGMENT, len(values))
+    return {
+        'infile' : infile, 'ts' : ts, 'values' : values, 'fs' : sampling['sampling_frequency'],
+        'time_line' : np.arange(len(values)) * sampling['sample_time'],
+        'nperseg' : nperseg, 'group' : -(-segment_count(len(values), nperseg) // SPECTROGRAM_COLUMNS)
+    }
+
+# measurement of a stage: one traced run for the memory, then the best of repeat runs
+# it returns with the run time in seconds and the peak of the traced allocations in bytes
+def measure_stage(name, function, data, repeat) :
+    tracemalloc.start()
+    function(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = None
+    for i in range(0, repeat) :
+        start = time.perf_counter()
+        measured = function(data)
+        elapsed = measured if name in SELF_TIMED else time.perf_counter() - start
+        if best is None or elapsed < best :
+            best = elapsed
+    return best, peak
+
+# the synthetic input file of the given parameters in the data directory (it is generated if it does not exist yet)
+# it returns with the path of the file and the run time of the generation (0 if the file already existed)
+def synthetic_file(data_dir, rows, parameters) :
+    name = 'synthetic_' + '_'.join([str(rows)] + [str(parameters[key]) for key in ('rate', 'jitter', 'gaps', 'noise', 'seed')]) + '.csv'
+    path = os.path.join(data_dir, name)
+    if os.path.exists(path) :
+        return path, 0.0
+    os.makedirs(data_dir, exist_ok=True)
+    start = time.perf_counter()
+    # the file is written under a temporary name, so an interrupted generation is not reused
+    write_synthetic_csv(path + '.tmp', rows, **parameters)
+    os.replace(path + '.tmp', path)
+    return path, time.perf_counter() - start
+
+# running the stages on a file of the given number of rows
+def run_size(rows, stages, repeat, parameters, data_dir) :
+    infile, generate_time = synthetic_file(data_dir, rows, parameters)
+    data = load_data(infile)
+    result = {'rows' : rows, 'file_bytes' : os.path.getsize(infile), 'generate_time' : generate_time, 'stages' : {}}
+    print(str(rows) + ' rows (' + infile + ')')
+    for name, function in stages :
+        seconds, peak = measure_stage(name, function, data, repeat)
+        result['stages'][name] = {'seconds' : seconds, 'samples_per_sec' : rows / seconds if seconds > 0 else None, 'peak_bytes' : peak}
+        print('  {:24s} {:10.4f} s {:14.0f} samples/s {:10.1f} MiB'.format(name, seconds, rows / seconds if seconds > 0 else 0, peak / (1 << 20)))
+    result['peak_rss_bytes'] = peak_rss_bytes()
+    return result
+
+# printing the speedups of the stages compared with an earlier result (the same numbers of rows are compared)
+def compare_results(previous, current) :
+    name = previous['date'] if previous.get('label', '') == '' else previous['label'] + ' (' + previous['date'] + ')'
+    print('comparison with ' + name + ', speedup = previous / current run time')
+    previous_runs = {run['rows'] : run for run in previous['runs']}
+    for run in current['runs'] :
+        if run['rows'] not in previous_runs :
+            continue
+        print(str(run['rows']) + ' rows')
+        for name, measured in run['stages'].items() :
+            earlier = previous_runs[run['rows']]['stages'].get(name)
+            if earlier is None or not measured['seconds'] > 0 :
+                continue
+            print('  {:24s} {:10.4f} s -> {:10.4f} s ({:.2f}x)'.format(name, earlier['seconds'], measured['seconds'], earlier['seconds'] / measured['seconds']))
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "n:r:s:", [
+            "rows=", "repeat=", "stages=", "rate=", "jitter=", "gaps=", "noise=", "seed=", "order=", "label=", "results=", "data-dir=", "compare="
+        ])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(1)
+    sizes = [10000, 100000, 1000000]
+    repeat = 3
+    selected = None
+    order = 50
+    label = ''
+    results_dir = RESULTS_DIR
+    data_dir = DATA_DIR
+    compare = None
+    parameters = {'rate' : DEFAULT_RATE, 'jitter' : 1e-5, 'gaps' : 10, 'noise' : 0.05, 'seed' : 0}
+    for o, a in opts :
+        if o in ("-n", "--rows") :
+            sizes = [int(float(size)) for size in a.split(',')]
+        elif o in ("-r", "--repeat") :
+            repeat = int(a)
+        elif o in ("-s", "--stages") :
+            selected = a.split(',')
+        elif o in ("--rate", "--jitter", "--noise") :
+            parameters[o[2:]] = float(a)
+        elif o in ("--gaps", "--seed") :
+            parameters[o[2:]] = int(a)
+        elif o == "--order" :
+            order = int(a)
+        elif o == "--label" :
+            label = a
+        elif o == "--results" :
+            results_dir = a
+        elif o == "--data-dir" :
+            data_dir = a
+        elif o == "--compare" :
+            compare = a
+    stages = suite_stages(order)
+    if selected is not None :
+        unknown = [name for name in selected if name not in dict(stages)]
+        if len(unknown) > 0 :
+            print('unknown stages: ' + ', '.join(unknown) + '\r\nthe stages: ' + ', '.join(name for name, function in stages))
+            sys.exit(1)
+        stages = [(name, function) for name, function in stages if name in selected]
+    # the filter designs are cached only in the memory, so the suite does not change the cache directory
+    set_disk_cache(False)
+    result = {
+        'label' : label, 'date' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment' : {
+            'python' : platform.python_version(), 'numpy' : np.__version__, 'scipy' : scipy.__version__, 'pandas' : ps.__version__,
+            'matplotlib' : matplotlib.__version__, 'platform' : platform.platform(), 'cpus' : os.cpu_count()
+        },
+        'parameters' : dict(parameters, repeat=repeat, order=order),
+        'runs' : [run_size(rows, stages, repeat, parameters, data_dir) for rows in sizes]
+    }
+    os.makedirs(results_dir, exist_ok=True)
+    outfile = os.path.join(results_dir, time.strftime('%Y%m%d-%H%M%S') + ('-' + label if label != '' else '') + '.json')
+    with open(outfile, 'w') as out :
+        json.dump(result, out, indent=2)
+    print('the results are written to ' + outfile)
+    if compare is not None :
+        with open(compare) as previous :
+            compare_results(json.load(previous), result)
+
+if __name__ == '__main__' :
+    main()
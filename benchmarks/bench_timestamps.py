@@ -0,0 +1,71 @@
+#!/bin/python3
+
+# comparison of the original strptime loop and the vectorized time stamp parsing
+# usage: python -m benchmarks.bench_timestamps [-n rows]
+
+from datetime import datetime
+import numpy as np
+import getopt
+import time
+import sys
+
+from timestamps import TIMESTAMP_FORMAT, convert_timestamps_to_ms
+
+# the original implementation of convert_timestamps_to_ms (one strptime call per row)
+def convert_timestamps_to_ms_loop(timestamps) :
+    ts_list = []
+    for ts in timestamps:
+        ts_list.append(datetime.strptime(ts, TIMESTAMP_FORMAT).timestamp() * 1000)
+    return ts_list
+
+# generating n time stamps with the given sampling period in the format of the input files
+# if irregular is true, then the trailing zeros of the fractions are removed, so the rows have different lengths
+def generate_timestamps(n, period_ms=1.25, irregular=False) :
+    start = np.datetime64('2022-05-17T08:00:00', 'us')
+    us = start + (np.arange(n) * period_ms * 1000).astype('timedelta64[us]')
+    strings = np.datetime_as_string(us, unit='us').astype(object)
+    strings = np.array([s.replace('T', ' ') for s in strings], dtype=object)
+    if irregular :
+        strings = np.array([s.rstrip('0') if not s.endswith('.000000') else s[:-5] for s in strings], dtype=object)
+    return strings
+
+# it returns with the best of the measured run times in seconds
+def best_time(function, argument, repeat) :
+    best = None
+    for i in range(0, repeat) :
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best :
+            best = elapsed
+    return best
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "n:r:", ["rows=", "repeat="])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(1)
+    n = 200000
+    repeat = 3
+    for o, a in opts :
+        if o in ("-n", "--rows") :
+            n = int(a)
+        elif o in ("-r", "--repeat") :
+            repeat = int(a)
+    for irregular in (False, True) :
+        timestamps = generate_timestamps(n, irregular=irregular)
+        reference = np.asarray(convert_timestamps_to_ms_loop(timestamps))
+        result = convert_timestamps_to_ms(timestamps)
+        error = np.max(np.abs(result - reference))
+        loop_time = best_time(convert_timestamps_to_ms_loop, timestamps, repeat)
+        vectorized_time = best_time(convert_timestamps_to_ms, timestamps, repeat)
+        print(
+            ('irregular' if irregular else 'fixed width') + ' time stamps, ' + str(n) + ' rows\r\n'
+            '  strptime loop: {:14.0f} rows/s\r\n'
+            '  vectorized:    {:14.0f} rows/s ({:.1f}x)\r\n'
+            '  max. error:    {:g} ms'.format(n / loop_time, n / vectorized_time, loop_time / vectorized_time, error)
+        )
+
+if __name__ == '__main__' :
+    main()
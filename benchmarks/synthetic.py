@@ -0,0 +1,93 @@
+#!/bin/python3
+
+# generator of synthetic accelerometer csv files in the format of the input files of the programs
+# (time stamp in %Y-%m-%d %H:%M:%S.%f format, acceleration), so the benchmarks do not need recorded data
+# the signal is the sum of a slow drift, three sine components and white noise, the time stamps have
+#  - a nominal sampling rate
+#  - gaussian jitter (clipped to 0.4 period, so the time stamps are always increasing)
+#  - gaps: at a given number of random positions 1 - MAX_GAP samples are missing
+# the file is written in chunks, so very long files (1e8 rows) can be generated with bounded memory
+# the same parameters and seed always give the same file
+# usage: python -m benchmarks.synthetic -o outfile [-n rows] [--rate Hz] [--jitter sec] [--gaps number] [--noise value] [--seed number]
+
+import numpy as np
+import getopt
+import sys
+
+START = np.datetime64('2022-05-17T08:00:00', 'us')
+DEFAULT_RATE = 800.0
+# frequencies (Hz) and amplitudes of the sine components
+COMPONENTS = [(0.8, 0.5), (12.5, 0.2), (55.0, 0.05)]
+DRIFT_AMPLITUDE = 0.3
+DRIFT_PERIOD = 600.0
+MAX_GAP = 20
+CHUNK_ROWS = 1 << 20
+
+# time stamp strings of the microsecond offsets from START
+def format_timestamps(offsets_us) :
+    strings = np.datetime_as_string(START + offsets_us.astype('timedelta64[us]'), unit='us')
+    return np.char.replace(strings, 'T', ' ')
+
+# the signal at the given times (sec)
+def signal_values(t, noise, rng) :
+    values = 1.0 + DRIFT_AMPLITUDE * np.sin(2 * np.pi * t / DRIFT_PERIOD)
+    for frequency, amplitude in COMPONENTS :
+        values += amplitude * np.sin(2 * np.pi * frequency * t)
+    if noise > 0 :
+        values += rng.normal(scale=noise, size=len(t))
+    return values
+
+# writing a synthetic csv file with the given number of rows
+# jitter is the deviation of the time stamps (sec), gaps is the number of the gaps (missing sample groups)
+# it returns with the true parameters of the file (sampling period, number of the missing samples)
+def write_synthetic_csv(outfile, rows, rate=DEFAULT_RATE, jitter=0.0, gaps=0, noise=0.05, seed=0, chunk_rows=CHUNK_ROWS) :
+    rng = np.random.default_rng(seed)
+    period = 1.0 / rate
+    # the rows which follow a gap and the number of the missing samples before them
+    gap_rows = np.sort(rng.choice(rows - 1, size=min(gaps, rows - 1), replace=False) + 1) if rows > 1 else np.empty(0, dtype=np.int64)
+    gap_lengths = rng.integers(1, MAX_GAP + 1, size=len(gap_rows))
+    dropped = 0
+    with open(outfile, 'w') as out :
+        for start in range(0, rows, chunk_rows) :
+            stop = min(start + chunk_rows, rows)
+            # sample numbers of the rows (the missing samples are skipped)
+            chunk_gaps = (gap_rows >= start) & (gap_rows < stop)
+            skips = np.zeros(stop - start, dtype=np.int64)
+            np.add.at(skips, gap_rows[chunk_gaps] - start, gap_lengths[chunk_gaps])
+            samples = np.arange(start, stop) + dropped + np.cumsum(skips)
+            dropped += int(np.sum(skips))
+            t = samples * period
+            values = signal_values(t, noise, rng)
+            if jitter > 0 :
+                t = t + np.clip(rng.normal(scale=jitter, size=len(t)), -0.4 * period, 0.4 * period)
+            timestamps = format_timestamps(np.round(t * 1e6).astype(np.int64))
+            lines = np.char.add(np.char.add(timestamps, ','), np.char.mod('%.6f', values))
+            out.write('\n'.join(lines.tolist()))
+            out.write('\n')
+    return {'rows' : rows, 'sample_time' : period, 'sampling_frequency' : rate, 'dropped_samples' : dropped}
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "o:n:", ["outfile=", "rows=", "rate=", "jitter=", "gaps=", "noise=", "seed="])
+    except getopt.GetoptError as err :
+        print(err)
+        sys.exit(1)
+    outfile = None
+    settings = {'rows' : 100000, 'rate' : DEFAULT_RATE, 'jitter' : 0.0, 'gaps' : 0, 'noise' : 0.05, 'seed' : 0}
+    for o, a in opts :
+        if o in ("-o", "--outfile") :
+            outfile = a
+        elif o in ("-n", "--rows") :
+            settings['rows'] = int(float(a))
+        elif o in ("--rate", "--jitter", "--noise") :
+            settings[o[2:]] = float(a)
+        elif o in ("--gaps", "--seed") :
+            settings[o[2:]] = int(a)
+    if outfile is None :
+        print('there is no output file\r\nhint: -o, --outfile filename')
+        sys.exit(1)
+    truth = write_synthetic_csv(outfile, **settings)
+    print(str(truth['rows']) + ' rows are written to ' + outfile + ' (' + str(truth['dropped_samples']) + ' missing samples)')
+
+if __name__ == '__main__' :
+    main()
@@ -0,0 +1,64 @@
+#!/bin/python3
+
+# chunk-aware versions of the statistics and the peak finding
+# (the chunks are filtered by the process method of streaming_filter.StreamingFilter)
+# the chunks parameter of these functions is an iterable of numpy arrays (ex.: csv_stream.read_value_chunks),
+# the chunks are processed one by one, so the used memory depends on the size of the chunks, not on the size of the data set
+
+import numpy as np
+
+from data_statistics import statistics_of_chunks
+from profiling import counted_chunks, stage
+
+# statistical informations of the chunks (the same values as show_statistics of data_visualizations.py)
+# it returns with a dictionary (see data_statistics.RunningStatistics.result)
+def chunk_statistics(chunks) :
+    with stage('chunk_statistics') as measured :
+        return statistics_of_chunks(counted_chunks(chunks, measured))
+
+# peak finding in chunks with the same rules as local_maxima of peaks.py:
+#  - the first value is a peak if it is greater than the second one
+#  - a value is a peak if it is greater than both of its neighbors
+#  - the last value is a peak if it is greater than the penultimate one
+# the last two values of a chunk are carried over to the next chunk, because their neighbors are still unknown
+# it yields (positions, values) pairs of the peaks found in the chunks (the positions are global in the data set)
+def chunk_peaks(chunks) :
+    pending = np.empty(0, dtype=np.float64)
+    # global position of the first pending value
+    start = 0
+    started = False
+    for chunk in chunks :
+        data = np.concatenate((pending, chunk))
+        if len(data) < 2 :
+            pending = data
+            continue
+        inner = np.flatnonzero((data[1:-1] > data[:-2]) & (data[1:-1] > data[2:])) + 1
+        if not started :
+            if data[0] > data[1] :
+                inner = np.concatenate(([0], inner))
+            started = True
+        yield inner + start, data[inner]
+        pending = data[-2:]
+        start += len(data) - 2
+    if started and pending[-1] > pending[-2] :
+        yield np.array([start + 1]), pending[-1:]
+
+# all the peaks of the chunks in two arrays (positions and values)
+def collect_chunk_peaks(chunks) :
+    positions = []
+    values = []
+    with stage('chunk_peaks') as measured :
+        for chunk_positions, chunk_values in chunk_peaks(counted_chunks(chunks, measured)) :
+            positions.append(chunk_positions)
+            values.append(chunk_values)
+    if len(positions) == 0 :
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    return np.concatenate(positions).astype(np.int64), np.concatenate(values)
+
+# reducing the number of peak values like peak_levels of peaks.py
+# the peak finding runs on the peak values (times - 1) more times
+def reduce_chunk_peaks(positions, values, times) :
+    for i in range(0, times - 1) :
+        reduced, values = collect_chunk_peaks([values])
+        positions = positions[reduced]
+    return positions, values
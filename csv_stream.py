@@ -0,0 +1,45 @@
+#!/bin/python3
+
+# streaming reading of the input files
+# the input files are csv files with two columns: time stamp (%Y-%m-%d %H:%M:%S.%f in format) and acceleration
+# the files are read in fixed size chunks, so the whole file never has to be in the memory as python objects
+
+import pandas as ps
+import numpy as np
+
+from timestamps import convert_timestamps_to_ms
+
+# default number of rows in a chunk
+DEFAULT_CHUNK_SIZE = 1 << 20
+COLUMNS = ['time_stamp', 'acceleration']
+
+# reading the csv file chunk by chunk
+# it yields (time stamps in ms, values) pairs of float64 numpy arrays
+# every chunk contains chunk_size rows except the last one
+def read_csv_chunks(infile, chunk_size=DEFAULT_CHUNK_SIZE) :
+    reader = ps.read_csv(
+        infile, sep=',', header=None, names=COLUMNS,
+        dtype={'time_stamp' : str, 'acceleration' : np.float64}, chunksize=chunk_size
+    )
+    with reader :
+        for chunk in reader :
+            ts_ms = convert_timestamps_to_ms(chunk['time_stamp'].to_numpy())
+            values = chunk['acceleration'].to_numpy(dtype=np.float64)
+            yield ts_ms, values
+
+# only the values of the chunks (ex.: for the filtering and the statistics)
+def read_value_chunks(infile, chunk_size=DEFAULT_CHUNK_SIZE) :
+    for ts_ms, values in read_csv_chunks(infile, chunk_size) :
+        yield values
+
+# reading the whole csv file into two float64 arrays (time stamps in ms and values)
+# the file is read in chunks, so only the typed arrays are kept in the memory
+def read_csv_arrays(infile, chunk_size=DEFAULT_CHUNK_SIZE) :
+    ts_chunks = []
+    value_chunks = []
+    for ts_ms, values in read_csv_chunks(infile, chunk_size) :
+        ts_chunks.append(ts_ms)
+        value_chunks.append(values)
+    if len(ts_chunks) == 0 :
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+    return np.concatenate(ts_chunks), np.concatenate(value_chunks)
@@ -0,0 +1,161 @@
+#!/bin/python3
+
+# binary cache of the parsed input files
+# the time stamps (in ms) and the values of an input file are written to a .npy file in the cache directory,
+# the name of the cache file is derived from the path, the size and the modification time of the input file,
+# so the cache file becomes invalid if the input file is changed
+# the cache files are memory-mapped, so loading a cached input file does not copy or parse anything
+# the cache directory can be given by the DSP_TASKS_CACHE_DIR environment variable
+# and its maximal size in bytes by the DSP_TASKS_CACHE_SIZE environment variable
+# if the cache directory is greater than this size, then the least recently used cache files are deleted
+
+import hashlib
+import time
+import os
+import numpy as np
+
+from csv_stream import DEFAULT_CHUNK_SIZE, read_csv_arrays, read_csv_chunks
+from profiling import stage
+
+CACHE_DIR_ENV = 'DSP_TASKS_CACHE_DIR'
+CACHE_SIZE_ENV = 'DSP_TASKS_CACHE_SIZE'
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'dsp_tasks')
+DEFAULT_CACHE_SIZE = 4 << 30
+CACHE_SUFFIX = '.npy'
+TEMPORARY_SUFFIX = '.tmp'
+# the temporary files which are older than this (sec) are left by interrupted writes, they are deleted by evict_cache
+STALE_TEMPORARY_AGE = 3600
+
+# path of the cache directory
+def cache_dir() :
+    return os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+
+# maximal size of the cache directory in bytes
+def cache_size_limit() :
+    try :
+        return int(os.environ.get(CACHE_SIZE_ENV, DEFAULT_CACHE_SIZE))
+    except ValueError :
+        return DEFAULT_CACHE_SIZE
+
+# the key of the input file is computed from its absolute path, size and modification time
+def cache_key(infile) :
+    info = os.stat(infile)
+    key = os.path.abspath(infile) + '|' + str(info.st_size) + '|' + str(info.st_mtime_ns)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+# path of the cache file of the input file
+def cache_path(infile) :
+    return os.path.join(cache_dir(), cache_key(infile) + CACHE_SUFFIX)
+
+# memory-mapping of the cache file of the input file
+# it returns with the time stamps in ms and the values (read-only float64 arrays) or None if there is no cache file
+def load_cached_arrays(infile) :
+    path = cache_path(infile)
+    if not os.path.exists(path) :
+        return None
+    try :
+        data = np.load(path, mmap_mode='r')
+    except (OSError, ValueError) :
+        return None
+    if data.ndim != 2 or data.shape[0] != 2 or data.dtype != np.float64 :
+        return None
+    # the modification time of the cache file shows when it was used last time (for the eviction)
+    os.utime(path)
+    return data[0], data[1]
+
+# writing the time stamps and the values of the input file to its cache file
+# the cache file is written under a temporary name and renamed at the end, so other processes never see a partial file
+# the temporary file is deleted if the writing fails or it is interrupted
+def store_cached_arrays(infile, ts_ms, values) :
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = cache_path(infile)
+    temporary = path + '.' + str(os.getpid()) + TEMPORARY_SUFFIX
+    try :
+        data = np.lib.format.open_memmap(temporary, mode='w+', dtype=np.float64, shape=(2, len(ts_ms)))
+        data[0] = ts_ms
+        data[1] = values
+        data.flush()
+        del data
+        os.replace(temporary, path)
+    except BaseException :
+        try :
+            os.remove(temporary)
+        except OSError :
+            pass
+        raise
+    evict_cache(keep=path)
+
+# deleting the least recently used cache files while the size of the cache directory is greater than the limit
+# the file given by the keep parameter is never deleted, the stale temporary files are deleted in any case
+def evict_cache(keep=None, limit=None) :
+    if limit is None :
+        limit = cache_size_limit()
+    directory = cache_dir()
+    if not os.path.isdir(directory) :
+        return
+    entries = []
+    now = time.time()
+    for name in os.listdir(directory) :
+        if not name.endswith(CACHE_SUFFIX) and not name.endswith(TEMPORARY_SUFFIX) :
+            continue
+        path = os.path.join(directory, name)
+        try :
+            info = os.stat(path)
+            if name.endswith(TEMPORARY_SUFFIX) :
+                if now - info.st_mtime > STALE_TEMPORARY_AGE :
+                    os.remove(path)
+                continue
+        except OSError :
+            continue
+        entries.append((info.st_mtime, info.st_size, path))
+    total = sum(entry[1] for entry in entries)
+    for mtime, size, path in sorted(entries) :
+        if total <= limit :
+            break
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep) :
+            continue
+        try :
+            os.remove(path)
+            total -= size
+        except OSError :
+            pass
+
+# reading the input file with the cache
+# if use_cache is false, then the cache is not used at all
+# if rebuild is true, then the input file is parsed again and its cache file is rewritten
+# it returns with the time stamps in ms and the values
+def read_csv_cached(infile, use_cache=True, rebuild=False, chunk_size=DEFAULT_CHUNK_SIZE) :
+    if use_cache and not rebuild :
+        with stage('load_cache') as measured :
+            cached = load_cached_arrays(infile)
+            measured['samples'] = 0 if cached is None else len(cached[0])
+        if cached is not None :
+            return cached
+    with stage('read_csv') as measured :
+        ts_ms, values = read_csv_arrays(infile, chunk_size)
+        measured['samples'] = len(ts_ms)
+    if use_cache :
+        try :
+            with stage('store_cache', len(ts_ms)) :
+                store_cached_arrays(infile, ts_ms, values)
+        except OSError as err :
+            print('the cache file cannot be written: ' + str(err))
+    return ts_ms, values
+
+# reading the input file chunk by chunk with the cache (like csv_stream.read_csv_chunks)
+# if there is a cache file of the input file, then the chunks are slices of the memory-mapped cache file,
+# otherwise the csv file is read (the cache file is not created in this case, because the whole file would be needed)
+def read_csv_chunks_cached(infile, chunk_size=DEFAULT_CHUNK_SIZE, use_cache=True) :
+    cached = load_cached_arrays(infile) if use_cache else None
+    if cached is None :
+        yield from read_csv_chunks(infile, chunk_size)
+        return
+    ts_ms, values = cached
+    for start in range(0, len(ts_ms), chunk_size) :
+        yield ts_ms[start:start + chunk_size], values[start:start + chunk_size]
+
+# only the values of the chunks (like csv_stream.read_value_chunks)
+def read_value_chunks_cached(infile, chunk_size=DEFAULT_CHUNK_SIZE, use_cache=True) :
+    for ts_ms, values in read_csv_chunks_cached(infile, chunk_size, use_cache) :
+        yield values
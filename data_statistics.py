@@ -0,0 +1,208 @@
+#!/bin/python3
+
+# statistics of the data sets in one pass (mean, median, mode, variance and deviation)
+# the data set can be given as a whole array or chunk by chunk (ex.: csv_stream.read_value_chunks),
+# so the statistics of the input files which do not fit in the memory can be computed in one read
+#  - mean and variance: the moments of a chunk are computed with numpy and merged to the moments of the previous chunks
+#    (Chan et al. parallel version of the Welford algorithm)
+#  - median and mode: the counts of the distinct values are collected (the sensor values are quantized, so there are few of them)
+#    if there are more than MAX_DISTINCT distinct values, then a histogram of HISTOGRAM_BINS bins is used instead,
+#    in this case the median and the mode are approximations (the error is at most the width of a bin)
+# in case of a whole array the median is exact in any case (it is selected with np.partition, without sorting the array),
+# the mode is the same as in case of the chunks (exact if there are at most MAX_DISTINCT distinct values)
+# if more values are equally frequent, then the mode is the smallest one (statistics.mode gives the first one in the data set)
+# the histogram cannot hold infinite or nan values, so the statistics raise ValueError if such a value has to be binned
+# the name of this file is not statistics.py, because it would hide the statistics module of the standard library
+
+import numpy as np
+
+from profiling import profiled
+
+# the maximal number of distinct values which are counted exactly
+MAX_DISTINCT = 1 << 16
+# the number of bins of the histogram which replaces the counts of the distinct values
+HISTOGRAM_BINS = 1 << 16
+# the number of values which are processed at once by statistics_of_array
+CHUNK_SIZE = 1 << 20
+
+# merging the distinct values and their counts of two sets of values
+# values parameters must be sorted arrays of distinct values (ex.: result of np.unique)
+def merge_value_counts(values_1, counts_1, values_2, counts_2) :
+    values, inverse = np.unique(np.concatenate((values_1, values_2)), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate((counts_1, counts_2)), minlength=len(values)).astype(np.int64)
+    return values, counts
+
+# the median of the values which are given by their distinct values and counts
+# (if the number of values is even, then the median is the mean of the two middle values)
+def median_of_value_counts(values, counts) :
+    cumulative = np.cumsum(counts)
+    n = cumulative[-1]
+    low = values[np.searchsorted(cumulative, (n - 1) // 2, side='right')]
+    high = values[np.searchsorted(cumulative, n // 2, side='right')]
+    return (low + high) / 2
+
+# the exact median of an array (the same as statistics.median) with selection instead of sorting
+def median_of_array(values) :
+    n = len(values)
+    middle = n // 2
+    partitioned = np.partition(values, middle)
+    if n % 2 == 1 :
+        return partitioned[middle]
+    # the lower middle value is the greatest value before the middle (one partition is faster than two)
+    return (partitioned[:middle].max() + partitioned[middle]) / 2
+
+class RunningStatistics :
+    def __init__(self) :
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        # counts of the distinct values (exact mode)
+        self.values = np.empty(0, dtype=np.float64)
+        self.counts = np.empty(0, dtype=np.int64)
+        # histogram (approximate mode): the first bin starts at low, every bin is width wide
+        self.histogram = None
+        self.low = 0.0
+        self.width = 0.0
+
+    # true if the median and the mode are exact (the distinct values are counted)
+    def exact(self) :
+        return self.histogram is None
+
+    # adding the next chunk of the data set
+    def update(self, chunk) :
+        chunk = np.asarray(chunk, dtype=np.float64)
+        n = len(chunk)
+        if n == 0 :
+            return
+        chunk_mean = chunk.mean()
+        deviations = chunk - chunk_mean
+        self.merge_moments(n, chunk_mean, np.dot(deviations, deviations))
+        if self.histogram is None :
+            values, counts = np.unique(chunk, return_counts=True)
+            self.merge_counts(values, counts)
+        else :
+            self.add_to_histogram(chunk, None)
+
+    # merging the statistics of another part of the data set (ex.: computed by another process)
+    def merge(self, other) :
+        if other.count == 0 :
+            return
+        self.merge_moments(other.count, other.mean, other.m2)
+        if other.histogram is None :
+            if self.histogram is None :
+                self.merge_counts(other.values, other.counts)
+            else :
+                self.add_to_histogram(other.values, other.counts)
+        elif self.histogram is None and len(self.values) == 0 :
+            # there is nothing to rebin here, so the histogram of the other part is copied
+            self.histogram = other.histogram.copy()
+            self.low = other.low
+            self.width = other.width
+        else :
+            if self.histogram is None :
+                self.to_histogram()
+            centers = other.low + (np.arange(len(other.histogram)) + 0.5) * other.width
+            used = other.histogram > 0
+            self.add_to_histogram(centers[used], other.histogram[used])
+
+    # merging the count, the mean and the sum of the squared deviations of a part of the data set
+    def merge_moments(self, count, mean, m2) :
+        delta = mean - self.mean
+        total = self.count + count
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    # merging counts of distinct values, if there are too many distinct values, then the histogram is used instead
+    def merge_counts(self, values, counts) :
+        self.values, self.counts = merge_value_counts(self.values, self.counts, values, counts)
+        if len(self.values) > MAX_DISTINCT :
+            self.to_histogram()
+
+    # replacing the counts of the distinct values with a histogram
+    def to_histogram(self) :
+        values, counts = self.values, self.counts
+        self.low = values[0]
+        # the greatest value is in the last bin
+        self.width = (values[-1] - values[0]) / (HISTOGRAM_BINS - 1) if len(values) > 1 else 1.0
+        self.histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.add_to_histogram(values, counts)
+
+    # adding values (with the given counts or 1 if counts is None) to the histogram
+    # if the values are out of the range of the histogram, then the width of the bins is doubled
+    # (the pairs of bins are merged), so the earlier counts remain in the right bins
+    def add_to_histogram(self, values, counts) :
+        if len(values) == 0 :
+            return
+        minimum = values.min()
+        maximum = values.max()
+        if not np.isfinite(minimum) or not np.isfinite(maximum) :
+            raise ValueError('the data set contains infinite or nan values')
+        half = HISTOGRAM_BINS // 2
+        while minimum < self.low :
+            merged = self.histogram.reshape(-1, 2).sum(axis=1)
+            self.low -= HISTOGRAM_BINS * self.width
+            self.width *= 2
+            self.histogram = np.concatenate((np.zeros(half, dtype=np.int64), merged))
+        while maximum >= self.low + HISTOGRAM_BINS * self.width :
+            merged = self.histogram.reshape(-1, 2).sum(axis=1)
+            self.width *= 2
+            self.histogram = np.concatenate((merged, np.zeros(half, dtype=np.int64)))
+        bins = np.clip(((values - self.low) / self.width).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+        self.histogram += np.bincount(bins, weights=counts, minlength=HISTOGRAM_BINS).astype(np.int64)
+
+    # the median of the added values (interpolated in the bin of the median in case of the histogram)
+    def median(self) :
+        if self.histogram is None :
+            return median_of_value_counts(self.values, self.counts)
+        cumulative = np.cumsum(self.histogram)
+        half = self.count / 2
+        index = np.searchsorted(cumulative, half)
+        before = cumulative[index - 1] if index > 0 else 0
+        return self.low + (index + (half - before) / self.histogram[index]) * self.width
+
+    # the most frequent value (if there are more than one, then the smallest one, not the first one like statistics.mode)
+    # in case of the histogram it is the center of the most frequent bin
+    def mode(self) :
+        if self.histogram is None :
+            return self.values[np.argmax(self.counts)]
+        return self.low + (np.argmax(self.histogram) + 0.5) * self.width
+
+    # the population variance of the added values
+    def variance(self) :
+        return self.m2 / self.count
+
+    # it returns with a dictionary (mean, median, mode, variance, deviation, count, exact)
+    def result(self) :
+        if self.count == 0 :
+            raise ValueError('there is no data in the data set')
+        variance = self.variance()
+        return {
+            'mean' : self.mean,
+            'median' : self.median(),
+            'mode' : self.mode(),
+            'variance' : variance,
+            'deviation' : np.sqrt(variance),
+            'count' : self.count,
+            'exact' : self.exact()
+        }
+
+# statistics of the chunks of a data set (see RunningStatistics.result)
+def statistics_of_chunks(chunks) :
+    statistics = RunningStatistics()
+    for chunk in chunks :
+        statistics.update(chunk)
+    return statistics.result()
+
+# statistics of a whole array (see RunningStatistics.result)
+# the array is processed in chunks, but the median is selected from the whole array, so it is always exact
+# (median_exact is true, exact shows whether the mode is exact)
+@profiled('statistics')
+def statistics_of_array(values) :
+    values = np.asarray(values, dtype=np.float64)
+    result = statistics_of_chunks(values[start:start + CHUNK_SIZE] for start in range(0, len(values), CHUNK_SIZE))
+    result['median'] = median_of_array(values)
+    result['median_exact'] = True
+    return result
@@ -1,33 +1,90 @@
 #!/bin/python3
 
 from genericpath import exists
-from datetime import datetime
-import pandas as ps
-import statistics as stat
 import matplotlib.pyplot as mplot
 import numpy as np
 import getopt
 import sys
 
+from sample_rate import estimate_sample_rate
+from data_cache import read_csv_cached, read_csv_chunks_cached, read_value_chunks_cached
+from chunk_pipelines import chunk_statistics, collect_chunk_peaks, reduce_chunk_peaks
+from peaks import select_peaks
+from data_statistics import statistics_of_array
+from plot_decimation import plot_decimated, show_figure
+from spectrum import DEFAULT_SEGMENT, SPECTROGRAM_COLUMNS, amplitude_spectrum, segment_count, spectrogram, strongest_peaks, welch_psd
+from peak_index import get_peak_index
+from histogram import DEFAULT_BINS, histogram_of_array, histogram_of_chunks, value_range
+from profiling import start_profiling
+
 # this function gives that how to use this program
 def usage() :
     print(
         '-h --help for help\r\n-i --infile filename\r\n'
+        '--height value (peak finding: the minimal value of the peaks)\r\n'
+        '--distance samples (peak finding: the minimal distance of the peaks)\r\n'
+        '--prominence value (peak finding: the minimal prominence of the peaks)\r\n'
+        '--nperseg samples (Welch and spectrogram: length of the segments, default: 4096)\r\n'
+        '--nfft number (FFT length, default: the next fast length of the signal or of the segments)\r\n'
+        '--bins number (number of the bins of the histogram, default: 10)\r\n'
+        '-c --chunk-size rows (streaming mode: the input file is read in chunks of the given size)\r\n'
+        '--no-cache (the parsed input file and its peak index are not cached)\r\n'
+        '--rebuild-cache (the cache and the peak index of the input file are rebuilt)\r\n'
+        '--profile filename (the run times of the stages are written to this JSON file)\r\n'
+        '--cprofile filename (the cProfile statistics of the run are written to this file)\r\n'
     )
 
 # handling of input arguments
-# return with the path of the input file
+# return with the path of the input file, the peak filters (None if not used),
+# the chunk size (None if the streaming mode is not used) and the cache options
 def opt_walk(opts) :
     infile = None
+    height = None
+    distance = None
+    prominence = None
+    nperseg = str(DEFAULT_SEGMENT)
+    nfft = None
+    bins = str(DEFAULT_BINS)
+    chunk_size = None
+    use_cache = True
+    rebuild_cache = False
+    profile = None
+    cprofile = None
     for o, a in opts :
         if o in ("-h", "--help") :
             usage()
         elif o in ("-i", "--infile") :
             infile = a
+        elif o == "--height" :
+            height = a
+        elif o == "--distance" :
+            distance = a
+        elif o == "--prominence" :
+            prominence = a
+        elif o == "--nperseg" :
+            nperseg = a
+        elif o == "--nfft" :
+            nfft = a
+        elif o == "--bins" :
+            bins = a
+        elif o in ("-c", "--chunk-size") :
+            chunk_size = a
+        elif o == "--no-cache" :
+            use_cache = False
+        elif o == "--rebuild-cache" :
+            rebuild_cache = True
+        elif o == "--profile" :
+            profile = a
+        elif o == "--cprofile" :
+            cprofile = a
         else :
             print("unhandled option")
             usage()
-    return infile
+    return {
+        'infile' : infile, 'height' : height, 'distance' : distance, 'prominence' : prominence,
+        'nperseg' : nperseg, 'nfft' : nfft, 'bins' : bins,
+        'chunk_size' : chunk_size, 'use_cache' : use_cache, 'rebuild_cache' : rebuild_cache, 'profile' : profile, 'cprofile' : cprofile
+    }
 
 # this function is showing the menu
 def menu() :
@@ -41,179 +98,110 @@ def menu() :
         '5) - show histogram of data set\r\n'
         '6) - show scatter diagram of data set\r\n'
         '7) - show statistical informations of the data set\r\n'
+        '8) - show the power spectral density of the data set (Welch)\r\n'
+        '9) - show the spectrogram of the data set (STFT)\r\n'
         'x) - exit from this program'
     )
 
-# convert datetime strings to milliseconds
-# timestamps parameter must be iterable and the elements must be %Y-%m-%d %H:%M:%S.%f in format
-def convert_timestamps_to_ms(timestamps) :
-    ts_list = []
-    for ts in timestamps:
-        ts_list.append(datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f').timestamp() * 1000)
-    return ts_list
+# this function is showing the menu of the streaming mode
+# the input file is read again in chunks for each option, so the figures are not available in this mode
+def streaming_menu() :
+    print(
+        'Select an option (streaming mode):\r\n'
+        '0) - show menu\r\n'
+        '2) - show the sampling frequency & time\r\n'
+        '3) - find peak values\r\n'
+        '4) - show the dominant frequencies of the data set (Welch)\r\n'
+        '5) - show histogram of the data set\r\n'
+        '7) - show statistical informations of the data set\r\n'
+        'x) - exit from this program'
+    )
 
 # this function gives the locations of the data set in a list
 def get_positions_of_data_set(data_set) :
     positions = range(0, len(data_set))
     return positions
 
-# this function finds the peak values of the data_set input parameter
-# data_set must be an two dimensional array
-# it gives back locations of the peak values and of course the peak values with timestamps
-def find_peak_values_with_postitions(data_set) :
-    peak_values = [[], []]
-    positions = []
-    # if the first data is greater than second, then it is a peak value
-    if data_set[0, 1] > data_set[1, 1] :
-        peak_values[0].append(data_set[0, 0])
-        peak_values[1].append(data_set[0, 1])
-        positions.append(0)
-    # this peak finding algorithm is really simple and not the fastest one but it works very well
-    # the algorithm examines the neighbors of the data and if they are less then this, then this data is a peak value
-    i = 1
-    size = len(data_set[:,0])
-    while i < (size - 1) :
-        if (data_set[i, 1] > data_set[i - 1, 1]) and (data_set[i, 1] > data_set[i + 1, 1]) :
-            peak_values[0].append(data_set[i, 0])
-            peak_values[1].append(data_set[i, 1])
-            positions.append(i)
-            i += 2
-        else :
-            i += 1
-    # if the last data is greater then penultimate data, then is a peak value
-    if data_set[-1, 1] > data_set[-2, 1] :
-        peak_values[0].append(data_set[size - 1, 0])
-        peak_values[1].append(data_set[size - 1, 1])
-        positions.append(size - 1)
-    return peak_values, positions
-
-# the goal of this function is to reduce the number of peak values by finding the peaks from the peak_values list (input parameter)
-# if this algorithm runs several times, then the targeted small local ranges will be wider and wider
-# the description of the peak finding algorithm can be find at the find_peak_values_with_positions function
-def reduce_peak_values(peak_values, positions) :
-    new_positions = []
-    new_peak_values = [[], []]
-    if peak_values[1][0] > peak_values[1][1] :
-        new_peak_values[0].append(peak_values[0][0])
-        new_peak_values[1].append(peak_values[1][0])
-        new_positions.append(positions[0])
-    i = 1
-    size = len(peak_values[0])
-    while i < (size - 1) :
-        if (peak_values[1][i] > peak_values[1][i - 1]) and (peak_values[1][i] > peak_values[1][i + 1]) :
-            new_peak_values[0].append(peak_values[0][i])
-            new_peak_values[1].append(peak_values[1][i])
-            new_positions.append(positions[i])
-            i += 2
-        else :
-            i += 1
-    if peak_values[1][-1] > peak_values[1][-2] :
-        new_peak_values[0].append(peak_values[0][size - 1])
-        new_peak_values[1].append(peak_values[1][size - 1])
-        new_positions.append(positions[size - 1])
-    return new_peak_values, new_positions
-    
-# estimating of the sampling period time
-# the problem is that the dates in the input files are not accurate enough
-# to solve this problem I created a really simple algorithm in this function
-def calculate_sample_time(ts_list) :
-    step = 1
-    finished = False
-    sample_time = 0
-    n = len(ts_list)
-    ctr = 1
-    # if finished parameter will be true, then the algorithm probably estimated the value of the sampling period time
-    # if the finished parameter becomes true, but the algorithm failed, then the return value will be zero
-    while not finished :
-        # start with step=1 (this step or jump value will be greater and greater during the process)
-        # calculation of the time difference between two pairs of values and counting the operations
-        pre_dif = ts_list[step] - ts_list[0]
-        dif = ts_list[2 * step] - ts_list[step]
-        ctr += 1
-        # if the two time differences are not equal to each other, then the step value will be increased
-        if pre_dif != dif :
-            step += 1
-        # if the count of the operations is greater than length of the input list, then algorithm failed or there is no valid sampling frequency value
-        elif ctr > n :
-            finished = True
-        # if the compared time differences are equal to each other, then this algorithm makes sure that this sampling period value is acceptable
-        else :
-            # the stopped flag will be true, if the calculated time difference is not acceptable as sampling period
-            stopped = False
-            # the algorithm assumes that there is a lot of data in the input file, so it checks only 1% of the data set
-            for i in range(3 * step, int(n * 0.01), step) :
-                dif = ts_list[i] - ts_list[i - step]
-                if dif != pre_dif:
-                    stopped = True
-                    break
-            # if stopped flag is true, then the algorithm try to estimate the sampling period with increased step value
-            if stopped :
-                step += 1
-            # if the stopped flag is false, then the algorithm estimated the value of the period time
-            # (attention! we use only 1% of data, so the success of this algorithm depends on the size of data)
-            else :
-                sample_time = (ts_list[step] - ts_list[0]) / step
-                finished = True
-    # get the sample time in sec (ts_list is in ms)
-    return sample_time / 1000
-
+# statistical informations of the data set (mean, median, mode, variance and deviation)
+# they are computed in one pass with numpy (see data_statistics.py), the median is selected without sorting the data set
 def show_statistics(data_set) :
-    # mean - 1/N * sum(data)
-    mean = stat.fmean(data_set)
-    # median - ex.: [1, 2, 3, 4, 5] -> 3
-    median = stat.median(data_set)
-    # mode - ex.: [1, 1, 2, 3, 3, 4, 4, 4, 4, 5, 5] -> 4
-    mode = stat.mode(data_set)
-    # deviation - sqrt(VAR(data))
-    deviation = stat.pstdev(data_set, mean)
-    # variance - VAR(data) = 1/N * sum([(d - mean)**2 for d in data])
-    variance = deviation**2
+    try :
+        print_statistics(statistics_of_array(data_set))
+    except ValueError as err :
+        print(err)
+
+# printing the statistical informations which are given in a dictionary
+def print_statistics(statistics) :
     print(
         'Statistical informations of the data set.\r\n'
-        'Mean:      ' + str(mean) + '\r\n'
-        'Mode:      ' + str(mode) + '\r\n'
-        'Median:    ' + str(median) + '\r\n'
-        'Variance:  ' + str(variance) + '\r\n'
-        'Deviation: ' + str(deviation) + '\r\n'
+        'Mean:      ' + str(statistics['mean']) + '\r\n'
+        'Mode:      ' + str(statistics['mode']) + '\r\n'
+        'Median:    ' + str(statistics['median']) + '\r\n'
+        'Variance:  ' + str(statistics['variance']) + '\r\n'
+        'Deviation: ' + str(statistics['deviation']) + '\r\n'
+        + ('' if statistics.get('exact', True) else
+            '(the ' + ('mode is' if statistics.get('median_exact', False) else 'median and the mode are')
+            + ' approximated by a histogram, there are too many distinct values)\r\n')
     )
 
 # this function calculates the DFT values of the input data set
-# in addition it calculates the frequency resolution and the N-length frequency scale
+# in addition it calculates the frequency resolution and the frequency scale
 # it returns with the DFT points and the frequency scale
-def calculate_fft_with_freq_line(data_set, sampling_frequency) :
+# the input signal is real, so only the non-negative frequencies are computed (real FFT, see spectrum.py)
+# the signal is padded with zeros to nfft points (to a fast FFT length if nfft is None)
+def calculate_fft_with_freq_line(data_set, sampling_frequency, nfft=None) :
     # Computing of the k-th element of x signal, where N is the number of elements of the discrete signal (DFT algorithm):
     # X[k] = sum([x[n] * np.cos(2*n*np.pi*k/N) - x[n] * 1j * np.sin(2*n*np.pi*k/N) for n in range(0, N-1)])
     # more information: https://en.wikipedia.org/wiki/Discrete_Fourier_transform
-    d_fft = np.fft.fft(data_set)
-    n = len(d_fft)
-    # 1/N multiplier
-    d_fft = d_fft / n
-    # frequency resolution
-    df = sampling_frequency / n
-    stop = n * df
-    # calculating of the frequency axis
-    freq_line = np.arange(0, stop, df)
-    return freq_line, d_fft
+    # the frequency axis is k * Fs / N (it is not accumulated from the frequency resolution, so it has exactly one point per bin)
+    return amplitude_spectrum(data_set, sampling_frequency, nfft)
 
 # plot the DFT of the data set on logarithmic scale
-def show_fft_figure(freq_line, data_set) :
+def show_fft_figure(freq_line, data_set, outfile=None) :
     # calculates dB values of the DFT points
     data_set_db = 20 * np.lib.scimath.log10(np.abs(data_set))
-    mplot.semilogx(freq_line, data_set_db)
+    # the 0 Hz point cannot be shown on the logarithmic scale
+    mplot.semilogx(freq_line[1:], data_set_db[1:].real)
     mplot.title('DFT of the data set on logarithmic scale')
     mplot.xlabel('Frequency [Hz]')
     mplot.ylabel('Amplitude [dB]')
     mplot.grid()
-    mplot.show()
+    show_figure(outfile)
+
+# plot the Welch power spectral density of the data set in dB
+def show_psd_figure(freq_line, psd, outfile=None) :
+    mplot.semilogx(freq_line[1:], 10 * np.log10(psd[1:]))
+    mplot.title('Power spectral density of the data set (Welch)')
+    mplot.xlabel('Frequency [Hz]')
+    mplot.ylabel('PSD [dB/Hz]')
+    mplot.grid()
+    show_figure(outfile)
+
+# plot the spectrogram of the data set in dB
+def show_spectrogram_figure(freq_line, time_line, powers, outfile=None) :
+    mplot.pcolormesh(time_line, freq_line, 10 * np.log10(powers), shading='nearest')
+    mplot.title('Spectrogram of the data set')
+    mplot.xlabel('Time [sec]')
+    mplot.ylabel('Frequency [Hz]')
+    mplot.colorbar(label='PSD [dB/Hz]')
+    show_figure(outfile)
+
+# printing the strongest frequencies of a power spectral density (local maxima of the spectrum)
+def print_dominant_frequencies(freq_line, psd, count=5) :
+    strongest = strongest_peaks(psd, count)
+    print('Dominant frequencies (frequency resolution: ' + '{:.4g}'.format(freq_line[1]) + ' Hz):')
+    for i in strongest :
+        print('  {:12.4f} Hz   {:8.2f} dB/Hz'.format(freq_line[i], 10 * np.log10(psd[i])))
 
 # show a scatter diagram
-def show_scatter(data_set) :
-    x = range(0, len(data_set))
-    mplot.scatter(x, data_set)
+# the points are decimated on long data sets (see plot_decimation.py)
+def show_scatter(data_set, outfile=None) :
+    x = np.arange(len(data_set))
+    plot_decimated(mplot.gca(), x, data_set, 'o', linestyle='none')
     mplot.title('Scatter diagram')
     mplot.xlabel('Locations')
     mplot.ylabel('Values')
-    mplot.show()
+    show_figure(outfile)
 
 # handling of the input that the user enters when searching for peak values in the data set
 def get_user_input():
@@ -232,113 +220,252 @@ def get_user_input():
     return res
 
 # show the time function of the data set
-def show_time_diagram(t, y) :
-    mplot.plot(t, y)
+# the signal is decimated on long data sets (see plot_decimation.py)
+def show_time_diagram(t, y, outfile=None) :
+    plot_decimated(mplot.gca(), t, y)
     mplot.title('Data set in time domain')
     mplot.xlabel('Time [sec]')
     mplot.ylabel('Acceleration amplitude')
     mplot.grid()
     mplot.xlim(t[0], t[-1])
-    mplot.show()
+    show_figure(outfile)
 
 # calculates time points from the data positions
 # ex.: if the given data position is 3, then its time point is 3 * 1/Fs, where Fs is the sampling frequency
 def get_time_points(sampling_period, positions) :
-    time_points = []
-    for i in positions : 
-        time_points.append(i * sampling_period)
-    return time_points
+    return np.asarray(positions) * sampling_period
 
 # showing the peak values of the data set
 # this functions draws two plot on each other
 # the peak values are orange points on the figure
-def show_peak_values(t, y, tp, p) :
-    mplot.plot(t, y, label='Signal')
+# the signal and the peak values are decimated if there are too many of them (see plot_decimation.py)
+def show_peak_values(t, y, tp, p, outfile=None) :
+    plot_decimated(mplot.gca(), t, y, label='Signal')
     mplot.title('Peak values of the data set')
     mplot.xlabel('Time [sec]')
     mplot.ylabel('Acceleration amplitude')
     mplot.xlim(t[0], t[-1])
     mplot.grid()
-    mplot.plot(tp, p, 'o', label='Peak values')
+    plot_decimated(mplot.gca(), tp, p, 'o', linestyle='none', label='Peak values')
     mplot.legend()
-    mplot.show()
+    show_figure(outfile)
 
-# showing histogram of the data set
-# the y axis show the time duration in second
-def show_histogram(data_set, sampling_time) :
-    figure, hist = mplot.subplots()
-    hist.hist(data_set)
-    y_values = hist.get_yticks()
-    hist.set_yticklabels(['{:.2f}'.format(i * sampling_time) for i in y_values])
+# showing histogram of the data set (see histogram.py)
+# the y axis show the time duration in second (the counts of the bins are multiplied by the sampling time)
+def show_histogram(histogram, sampling_time, outfile=None) :
+    figure, axes = mplot.subplots()
+    axes.stairs(histogram.durations(sampling_time), histogram.edges(), fill=True)
     mplot.title('Histogram of the data set')
     mplot.xlabel('Acceleration amplitude')
     mplot.ylabel('Time [sec]')
-    mplot.show()
+    show_figure(outfile)
+
+# printing the bins of the histogram with the time durations
+def print_histogram(histogram, sampling_time) :
+    edges = histogram.edges()
+    print('Histogram of the data set (' + str(histogram.total()) + ' samples).')
+    for low, high, duration in zip(edges[:-1], edges[1:], histogram.durations(sampling_time)) :
+        print('{:12.6g} - {:12.6g}: {:.2f} s'.format(low, high, duration))
+
+# printing the estimated sampling parameters
+def print_sampling(sampling) :
+    print('Sampling frequency: ' + str(sampling['sampling_frequency']) + ' Hz\r\nSampling time period: ' + str(sampling['sample_time']) + ' s\r\n'
+    'Jitter: ' + str(sampling['jitter']) + ' s\r\nGaps: ' + str(len(sampling['gaps'])) + ' (' + str(sampling['dropped_samples']) + ' dropped samples)\r\n'
+    'Confidence: ' + '{:.3f}'.format(sampling['confidence']))
+
+# the streaming mode of the program
+# the input file is never loaded as a whole, the selected options read it in chunks of chunk_size rows,
+# so the used memory depends on the chunk size and not on the size of the input file
+# (if the input file is already in the cache, then the chunks are read from the cache file)
+# spectral is the dictionary of the spectral parameters (nperseg and nfft), bins is the number of the bins of the histogram
+def run_streaming(infile, chunk_size, use_cache, spectral, bins) :
+    # the sampling period is estimated from the first chunk
+    ts_ms, first_values = next(read_csv_chunks_cached(infile, chunk_size, use_cache), (None, None))
+    if ts_ms is None :
+        print('there is no data in the input file')
+        sys.exit(1)
+    try :
+        sampling = estimate_sample_rate(ts_ms)
+    except ValueError as err :
+        print('the sampling period cannot be estimated: ' + str(err))
+        sys.exit(1)
+    streaming_menu()
+    # the histogram is computed at the first use (the limits of the bins in a first pass over the chunks)
+    histogram = None
+    quit = False
+    while not quit :
+        option = input()
+        if option == '0' :
+            streaming_menu()
+        elif option == '2' :
+            print('(estimated from the first ' + str(len(ts_ms)) + ' samples)')
+            print_sampling(sampling)
+        elif option == '3' :
+            print('This program uses a simple peak finding algorithm. The more times the algorithm runs, the wider ranges it covers.\r\n'
+            'How many times should the algorithm runs (1-10)?')
+            res = get_user_input()
+            positions, peak_values = collect_chunk_peaks(read_value_chunks_cached(infile, chunk_size, use_cache))
+            positions, peak_values = reduce_chunk_peaks(positions, peak_values, res)
+            print('Number of peak values: ' + str(len(positions)))
+            if len(positions) > 0 :
+                highest = np.argmax(peak_values)
+                print('Highest peak value: ' + str(peak_values[highest]) + ' at ' + str(positions[highest] * sampling['sample_time']) + ' s')
+        elif option == '4' :
+            try :
+                freq_line, psd = welch_psd(
+                    read_value_chunks_cached(infile, chunk_size, use_cache), sampling['sampling_frequency'], spectral['nperseg'], nfft=spectral['nfft']
+                )
+                print_dominant_frequencies(freq_line, psd)
+            except ValueError as err :
+                print(err)
+        elif option == '5' :
+            try :
+                if histogram is None :
+                    low, high = value_range(read_value_chunks_cached(infile, chunk_size, use_cache))
+                    histogram = histogram_of_chunks(read_value_chunks_cached(infile, chunk_size, use_cache), low, high, bins)
+                print_histogram(histogram, sampling['sample_time'])
+            except ValueError as err :
+                print(err)
+        elif option == '7' :
+            try :
+                print_statistics(chunk_statistics(read_value_chunks_cached(infile, chunk_size, use_cache)))
+            except ValueError as err :
+                print(err)
+        elif option == 'x' :
+            quit = True
+        else :
+            print('Invalid input parameter. Try again!\r\n')
 
 # the main function describes the main functionality of this program
 # it is showing a menu in console and the user can select from the menu options
 # it works really simple, but this program can handle only one input file, 
 # so to read another input file, the user must start another program
+# (analysis_server.py keeps more input files in the memory and answers the requests of their operations)
 def main() :
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "hi:", ["help", "infile="])
+        opts, args = getopt.getopt(sys.argv[1:], "hi:c:", [
+            "help", "infile=", "height=", "distance=", "prominence=", "nperseg=", "nfft=", "bins=", "chunk-size=", "no-cache", "rebuild-cache", "profile=", "cprofile="
+        ])
     except getopt.GetoptError as err:
         print(err)
         usage()
         sys.exit(1)
-    # opt_walk function returns with the path of the input file
-    infile = opt_walk(opts)
+    # opt_walk function returns with the path of the input file and the chunk size
+    args = opt_walk(opts)
+    # the report files are written at the exit of the program
+    start_profiling(args['profile'], args['cprofile'])
+    infile = args['infile']
     # if the infile variable is incorrect then close this program
     if (infile == None) or (not exists(infile)) :
         print('there is no existing input file\r\nhint: -i, --infile filename')
-        sys.exit(1)    
-    # reading the csv file
-    data_set = ps.read_csv(infile, sep=',', squeeze=True, names=['time_stamp', 'acceleration'])
-    # converting the DataFrame object to numpy array
-    arr = data_set.to_numpy()
-    # the first column of array contains the dates of sampling and the second one contains the values
-    dates = 0
-    values = 1
-    # converting the date timestamps to millisecond values
-    ts_list = convert_timestamps_to_ms(arr[:, dates])
+        sys.exit(1)
+    try :
+        peak_filters = {
+            'height' : None if args['height'] == None else float(args['height']),
+            'distance' : None if args['distance'] == None else int(args['distance']),
+            'prominence' : None if args['prominence'] == None else float(args['prominence'])
+        }
+    except ValueError :
+        print('The height and the prominence must be numbers, the distance must be an integer.')
+        sys.exit(1)
+    if peak_filters['distance'] != None and peak_filters['distance'] < 1 :
+        print('The distance of the peaks must be at least 1.')
+        sys.exit(1)
+    try :
+        spectral = {'nperseg' : int(args['nperseg']), 'nfft' : None if args['nfft'] == None else int(args['nfft'])}
+    except ValueError :
+        print('The segment length and the FFT length must be integers.')
+        sys.exit(1)
+    if spectral['nperseg'] < 2 or (spectral['nfft'] != None and spectral['nfft'] < spectral['nperseg']) :
+        print('The segment length must be at least 2 and the FFT length must not be less than the segment length.')
+        sys.exit(1)
+    try :
+        bins = int(args['bins'])
+    except ValueError :
+        bins = 0
+    if bins < 1 :
+        print('The number of the bins of the histogram must be a positive integer.')
+        sys.exit(1)
+    if args['chunk_size'] != None :
+        try :
+            chunk_size = int(args['chunk_size'])
+        except ValueError :
+            chunk_size = 0
+        if chunk_size < 2 :
+            print('The chunk size must be an integer greater than 1.')
+            sys.exit(1)
+        if any(value != None for value in peak_filters.values()) :
+            print('The peak filters (height, distance, prominence) are not available in streaming mode.')
+            sys.exit(1)
+        run_streaming(infile, chunk_size, args['use_cache'], spectral, bins)
+        return
+    # reading the csv file (or its cache file), the time stamps are converted to millisecond values during the reading
+    ts_list, value_list = read_csv_cached(infile, args['use_cache'], args['rebuild_cache'])
     # calculating sampling period and sampling frequency
-    sampling_time_sec = calculate_sample_time(ts_list)
-    sampling_frequency_hz = (1 / sampling_time_sec)
+    try :
+        sampling = estimate_sample_rate(ts_list)
+    except ValueError as err :
+        print('the sampling period cannot be estimated: ' + str(err))
+        sys.exit(1)
+    sampling_time_sec = sampling['sample_time']
+    sampling_frequency_hz = sampling['sampling_frequency']
     # length of the data set is the n paramater
     n = len(ts_list)
     # calculating the time axis for plotting the date set
-    time_line = np.arange(0, n * sampling_time_sec, sampling_time_sec)
+    time_line = np.arange(n) * sampling_time_sec
     # menu showing
     menu()
+    # the peak index is rebuilt only once in case of --rebuild-cache
+    peak_index_ready = False
+    # the histogram is computed at the first use, then it is only drawn again
+    histogram = None
     # using a flag for closing the program
     quit = False
     while not quit :
         option = input()
-        # options (0 - 7 + x to exit)
+        # options (0 - 9 + x to exit)
         if option == '0' :
             menu()
         elif option == '1' :
-            show_time_diagram(time_line, arr[:, values])
+            show_time_diagram(time_line, value_list)
         elif option == '2' :
-            print('Sampling frequency: ' + str(sampling_frequency_hz) + ' Hz\r\nSampling time period: ' + str(sampling_time_sec) + ' s')
+            print_sampling(sampling)
         elif option == '3' :
             print('This program uses a simple peak finding algorithm. The more times the algorithm runs, the wider ranges it covers.\r\n'
             'How many times should the algorithm runs (1-10)?')
             res = get_user_input() 
-            peak_values, positions = find_peak_values_with_postitions(arr)
-            for i in range(0, int(res) - 1) :
-                peak_values, positions = reduce_peak_values(peak_values, positions)
+            # the peaks of all levels are computed at the first time, then the selected level is only looked up
+            peak_index = get_peak_index(infile, value_list, args['use_cache'], args['rebuild_cache'] and not peak_index_ready)
+            peak_index_ready = True
+            positions = select_peaks(value_list, peak_index.level(res), **peak_filters)
             time_points = get_time_points(sampling_time_sec, positions)
-            show_peak_values(time_line, arr[:, values], time_points, peak_values[1])
+            show_peak_values(time_line, value_list, time_points, value_list[positions])
         elif option == '4' :
-            freq_line, fft_data_set = calculate_fft_with_freq_line(arr[:, values], sampling_frequency_hz)
+            # the FFT length is given for the segments, the whole signal is only padded to it if it is longer
+            nfft = spectral['nfft'] if spectral['nfft'] != None and spectral['nfft'] >= n else None
+            freq_line, fft_data_set = calculate_fft_with_freq_line(value_list, sampling_frequency_hz, nfft)
             show_fft_figure(freq_line, fft_data_set)
         elif option == '5' :
-            show_histogram(arr[:, values], sampling_time_sec)
+            if histogram is None :
+                histogram = histogram_of_array(value_list, bins)
+            show_histogram(histogram, sampling_time_sec)
         elif option == '6' :
-            show_scatter(arr[:, values])
+            show_scatter(value_list)
         elif option == '7' :
-            show_statistics(arr[:, values])
+            show_statistics(value_list)
+        elif option in ('8', '9') :
+            # the segments cannot be longer than the data set
+            nperseg = min(spectral['nperseg'], n)
+            nfft = max(spectral['nfft'], nperseg) if spectral['nfft'] != None else None
+            if option == '8' :
+                freq_line, psd = welch_psd([value_list], sampling_frequency_hz, nperseg, nfft=nfft)
+                print_dominant_frequencies(freq_line, psd)
+                show_psd_figure(freq_line, psd)
+            else :
+                # the segments are averaged in groups, so the figure has at most SPECTROGRAM_COLUMNS time columns
+                group = -(-segment_count(n, nperseg) // SPECTROGRAM_COLUMNS)
+                freq_line, spectrogram_time, powers = spectrogram([value_list], sampling_frequency_hz, nperseg, nfft=nfft, group=group)
+                show_spectrogram_figure(freq_line, spectrogram_time, powers)
         elif option == 'x' :
             quit = True
         else :
@@ -0,0 +1,128 @@
+#!/bin/python3
+
+# cache of the filter designs
+# the coefficients of the designed filters are stored in the memory (least recently used designs are dropped over
+# MAX_MEMORY_DESIGNS) and in the designs directory of the cache directory of data_cache.py (one .npz file per design),
+# so repeated menu selections, repeated runs and the processes of the batch jobs design every filter only once
+# the key of a design is made from its kind, order, edge frequencies, pass band ripple and stop band attenuation (dB),
+# sampling frequency (None if the edges are normalized to Fs/2) and output form (ba or sos)
+# the hits and misses of the cache are counted (see design_cache_info)
+
+from collections import OrderedDict
+import hashlib
+import os
+import scipy.signal as sig
+import numpy as np
+
+from data_cache import cache_dir
+
+MAX_MEMORY_DESIGNS = 128
+DESIGN_DIR = 'designs'
+DESIGN_SUFFIX = '.npz'
+# kinds of the FIR designs and the pass_zero parameter of firwin which belongs to them
+FIR_KINDS = {'lowpass' : True, 'highpass' : False, 'bandpass' : False, 'bandstop' : True}
+
+memory_designs = OrderedDict()
+counters = {'memory_hits' : 0, 'disk_hits' : 0, 'misses' : 0}
+settings = {'use_disk' : True}
+
+# the key of a design (a string, the float values are written with repr, so they are exact)
+def design_key(kind, order, edges, gpass, gstop, fs, output) :
+    return '|'.join([kind, repr(order), repr(tuple(float(edge) for edge in np.atleast_1d(edges))), repr(gpass), repr(gstop), repr(fs), output])
+
+# path of the cache file of a design
+def design_path(key) :
+    return os.path.join(cache_dir(), DESIGN_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest() + DESIGN_SUFFIX)
+
+# switching on or off the disk layer of the cache (ex.: --no-cache), the memory layer is always used
+def set_disk_cache(enabled) :
+    settings['use_disk'] = enabled
+
+# the counters of the cache and the number of designs in the memory
+def design_cache_info() :
+    info = dict(counters)
+    info['memory_designs'] = len(memory_designs)
+    return info
+
+# clearing the memory layer (and the disk layer if disk is true) and the counters
+def clear_design_cache(disk=False) :
+    memory_designs.clear()
+    for name in counters :
+        counters[name] = 0
+    directory = os.path.join(cache_dir(), DESIGN_DIR)
+    if disk and os.path.isdir(directory) :
+        for name in os.listdir(directory) :
+            if name.endswith(DESIGN_SUFFIX) :
+                os.remove(os.path.join(directory, name))
+
+# copy of a design, the callers get copies, so they cannot change the cached designs
+# (the arrays cannot be read-only, because sosfilt needs writable coefficients)
+def copy_design(design) :
+    if isinstance(design, tuple) :
+        return tuple(np.array(array) for array in design)
+    return np.array(design)
+
+# reading a design from its cache file, it returns with None if there is no valid cache file
+def load_design(key) :
+    path = design_path(key)
+    if not os.path.exists(path) :
+        return None
+    try :
+        with np.load(path) as data :
+            if str(data['key']) != key :
+                return None
+            if 'sos' in data :
+                return data['sos']
+            return data['b'], data['a']
+    except (OSError, ValueError, KeyError) :
+        return None
+
+# writing a design to its cache file
+# the file is written under a temporary name and renamed at the end, so other processes never see a partial file
+def store_design(key, design) :
+    path = design_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + '.' + str(os.getpid()) + '.tmp.npz'
+    if isinstance(design, tuple) :
+        np.savez(temporary, key=key, b=design[0], a=design[1])
+    else :
+        np.savez(temporary, key=key, sos=design)
+    os.replace(temporary, path)
+
+# the design of the key from the cache or from the design function (without parameters) if it is not in the cache
+def cached_design(key, design_function) :
+    design = memory_designs.get(key)
+    if design is not None :
+        memory_designs.move_to_end(key)
+        counters['memory_hits'] += 1
+        return copy_design(design)
+    design = load_design(key) if settings['use_disk'] else None
+    if design is not None :
+        counters['disk_hits'] += 1
+    else :
+        counters['misses'] += 1
+        design = design_function()
+        if settings['use_disk'] :
+            try :
+                store_design(key, design)
+            except OSError as err :
+                print('the filter design cannot be written to the cache: ' + str(err))
+    memory_designs[key] = design
+    if len(memory_designs) > MAX_MEMORY_DESIGNS :
+        memory_designs.popitem(last=False)
+    return copy_design(design)
+
+# FIR filter design with firwin (order + 1 coefficients), kind is one of FIR_KINDS
+# edges are the cutoff frequencies (normalized to Fs/2 if fs is None)
+def fir_design(kind, order, edges, fs=None) :
+    if kind not in FIR_KINDS :
+        raise ValueError('unknown FIR filter kind: ' + str(kind))
+    key = design_key(kind, order, edges, None, None, fs, 'ba')
+    return cached_design(key, lambda : sig.firwin(order + 1, edges, pass_zero=FIR_KINDS[kind], fs=fs))
+
+# IIR filter design with iirdesign (the order is estimated by iirdesign)
+# wp and ws are the pass and stop frequencies (normalized to Fs/2 if fs is None), gpass is the maximal ripple
+# in the pass band and gstop is the minimal attenuation in the stop band (dB), output is ba or sos
+def iir_design(wp, ws, gpass, gstop, fs=None, output='ba') :
+    key = design_key('iir', None, np.concatenate((np.atleast_1d(wp), np.atleast_1d(ws))), gpass, gstop, fs, output)
+    return cached_design(key, lambda : sig.iirdesign(wp, ws, gpass, gstop, analog=False, output=output, fs=fs))
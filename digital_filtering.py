@@ -1,19 +1,42 @@
 #!/bin/python3
 
 from genericpath import exists
-from datetime import datetime as dt
 import scipy.signal as sig
-import pandas as ps
 import matplotlib.pyplot as mplot
 import numpy as np
 import getopt
 import sys
 
+from sample_rate import estimate_sample_rate
+from data_cache import read_csv_cached, read_csv_chunks_cached, read_value_chunks_cached
+from streaming_filter import StreamingFilter, is_sos
+from fir_engine import METHODS, fast_fir_filtering
+from moving_average import KINDS, StreamingMovingAverage, moving_average
+from plot_decimation import plot_decimated, show_figure
+from filter_bank import FilterBank
+from design_cache import fir_design, iir_design, set_disk_cache
+from multirate import decimation_factor, fir_decimation_factor, fir_stop_edge, multirate_filtering, reduced_fir_order
+from profiling import profiled, stage, start_profiling
+
 # this function gives that how to use this program
 def usage() :
     print(
         '-h --help for help\r\n-i --infile filename\r\n'
-        '-t --type [fir irr]'
+        '-t --type [fir irr]\r\n'
+        '-f --form [ba sos] (form of the IIR filters: b, a polynomials or second-order sections)\r\n'
+        '--order number (order of the FIR filters, default: 50)\r\n'
+        '--fir-method [auto direct overlap-add overlap-save] (execution of the FIR filters, default: auto)\r\n'
+        '-w --window number (window of the moving average, default: 50)\r\n'
+        '--ma-kind [simple weighted exponential centered] (kind of the moving average, default: simple)\r\n'
+        '--zero-phase (forward-backward filtering with the second-order sections)\r\n'
+        '--multirate (low pass and band pass filtering at a decimated rate)\r\n'
+        '--float32 (single precision filtering with the second-order sections)\r\n'
+        '-c --chunk-size rows (streaming mode: the input file is read in chunks of the given size)\r\n'
+        '-o --outfile filename (streaming mode: the filtered signal is written to this csv file)\r\n'
+        '--no-cache (the parsed input file and the filter designs are not cached on the disk)\r\n'
+        '--rebuild-cache (the cache of the input file is rebuilt)\r\n'
+        '--profile filename (the run times of the stages are written to this JSON file)\r\n'
+        '--cprofile filename (the cProfile statistics of the run are written to this file)\r\n'
     )
 
 # handling of input arguments
@@ -21,6 +44,20 @@ def usage() :
 def opt_walk(opts) :
     infile = None
     type = 'fir'
+    form = 'ba'
+    order = '50'
+    fir_method = 'auto'
+    window = '50'
+    ma_kind = 'simple'
+    zero_phase = False
+    multirate = False
+    dtype = np.float64
+    chunk_size = None
+    outfile = None
+    use_cache = True
+    rebuild_cache = False
+    profile = None
+    cprofile = None
     for o, a in opts :
         if o in ("-h", "--help") :
             usage()
@@ -28,45 +65,51 @@ def opt_walk(opts) :
             infile = a
         elif o in ("-t", "--type") :
             type = a
+        elif o in ("-f", "--form") :
+            form = a
+        elif o == "--order" :
+            order = a
+        elif o == "--fir-method" :
+            fir_method = a
+        elif o in ("-w", "--window") :
+            window = a
+        elif o == "--ma-kind" :
+            ma_kind = a
+        elif o == "--multirate" :
+            multirate = True
+        elif o == "--zero-phase" :
+            zero_phase = True
+        elif o == "--float32" :
+            dtype = np.float32
+        elif o in ("-c", "--chunk-size") :
+            chunk_size = a
+        elif o in ("-o", "--outfile") :
+            outfile = a
+        elif o == "--no-cache" :
+            use_cache = False
+        elif o == "--rebuild-cache" :
+            rebuild_cache = True
+        elif o == "--profile" :
+            profile = a
+        elif o == "--cprofile" :
+            cprofile = a
         else :
             print("unhandled option")
             usage()
-    return {'infile' : infile, 'type' : type}
-
-# estimating of the sampling period time
-# description of this function and comments can be found in data_visualizations.py 
-def calculate_sample_time(ts_list) :
-    step = 1
-    finished = False
-    sample_time = 0
-    n = len(ts_list)
-    ctr = 1
-    while not finished :
-        pre_dif = ts_list[step] - ts_list[0]
-        dif = ts_list[2 * step] - ts_list[step]
-        ctr += 1
-        if pre_dif != dif :
-            step += 1
-        elif ctr > n :
-            finished = True
-        else :
-            stopped = False
-            for i in range(3 * step, int(n * 0.01), step) :
-                dif = ts_list[i] - ts_list[i - step]
-                if dif != pre_dif:
-                    stopped = True
-                    break
-            if stopped :
-                step += 1
-            else :
-                sample_time = (ts_list[step] - ts_list[0]) / step
-                finished = True
-    return sample_time / 1000
+    return {
+        'infile' : infile, 'type' : type, 'form' : form, 'order' : order, 'fir_method' : fir_method,
+        'window' : window, 'ma_kind' : ma_kind,
+        'zero_phase' : zero_phase, 'dtype' : dtype, 'multirate' : multirate,
+        'chunk_size' : chunk_size, 'outfile' : outfile,
+        'use_cache' : use_cache, 'rebuild_cache' : rebuild_cache, 'profile' : profile, 'cprofile' : cprofile
+    }
 
 # FIR filtering
 # y[n] = sum([b[i] * input[n - i - 1] for i in range(0, order)])
-def fir_filtering(b, input) :
-    return sig.lfilter(b, 1, input)
+# long filters are computed with FFT based block convolution (see fir_engine.py),
+# the method can be auto, direct, overlap-add or overlap-save
+def fir_filtering(b, input, method='auto') :
+    return fast_fir_filtering(b, input, method)
 
 # IIR filtering
 # y[n] = sum([b[i] * input[n - i - 1] for i in range(0, order)])
@@ -74,6 +117,18 @@ def fir_filtering(b, input) :
 def iir_filtering(b, a, input) :
     return sig.lfilter(b, a, input)
 
+# IIR filtering with cascaded second-order sections
+# every section is a second order IIR filter, the output of a section is the input of the next one
+# it is numerically much more robust than the b, a form at low cutoff frequencies,
+# so the filtering can be done in single precision (dtype=np.float32) too
+# if zero_phase is true, then the signal is filtered forward and backward (sosfiltfilt), so there is no phase shift
+def sos_filtering(sos, input, zero_phase=False, dtype=np.float64) :
+    sos = np.asarray(sos, dtype=dtype)
+    input = np.asarray(input, dtype=dtype)
+    if zero_phase :
+        return sig.sosfiltfilt(sos, input)
+    return sig.sosfilt(sos, input)
+
 # this function is showing the menu
 def menu() :
     print(
@@ -83,65 +138,199 @@ def menu() :
         '2) - show the signal before and after high pass filtering\r\n'
         '3) - show the signal before and after band pass filtering\r\n'
         '4) - show the original signal and its moving avarage\r\n'
+        '5) - show the signal after all of the filters of options 1 - 3 (filter bank)\r\n'
         'x) - exit from this program'
     )
 
-# convert datetime strings to milliseconds
-# timestamps parameter must be iterable and the elements must be %Y-%m-%d %H:%M:%S.%f in format
-def convert_timestamps_to_ms(timestamps) :
-    ts_list = []
-    for ts in timestamps:
-        ts_list.append(dt.strptime(ts, '%Y-%m-%d %H:%M:%S.%f').timestamp() * 1000)
-    return ts_list
+# the filter designs are cached (see design_cache.py), so every filter is designed only once
+# the pass band ripple and the stop band attenuation of the IIR filters in dB
+PASS_RIPPLE = 1
+STOP_ATTENUATION = 40
 
 # low pass FIR filter design with firwin function where order gives order of the B polinom of filter
 # and cutoff_freq is the frequency from which the attenuation begins
 def low_pass_fir(order, cutoff_freq) :
-    return sig.firwin(order + 1, cutoff_freq)
+    return fir_design('lowpass', order, cutoff_freq)
 
 # low/high pass filter design with iirdesign function
 # wp is the pass frequency and ws is the stop frequency
 # wp and ws are normalized to Fs/2
 def lowhigh_pass_iir(wp, ws) :
-    return sig.iirdesign(wp, ws, 1, 40, analog=False)
+    return iir_design(wp, ws, PASS_RIPPLE, STOP_ATTENUATION)
+
+# the same low/high pass filter design in second-order sections form
+def lowhigh_pass_iir_sos(wp, ws) :
+    return iir_design(wp, ws, PASS_RIPPLE, STOP_ATTENUATION, output='sos')
 
 # high pass FIR filter design with firwin function where order gives order of the B polinom of filter
 # and pass_freq is the frequency from which the amplification begins
 def high_pass_fir(order, pass_freq) :
-    return sig.firwin(order + 1, pass_freq, pass_zero=False)
+    return fir_design('highpass', order, pass_freq)
 
 # low/high pass filter design with iirdesign function
 # wp1 and wp2 are the pass frequencies
 # ws1 and ws2 are the stop frequencies
 # wp and ws are normalized to Fs/2
 def band_pass_iir(wp1, wp2, ws1, ws2) :
-    return sig.iirdesign([wp1, wp2], [ws1, ws2], 1, 40)
+    return iir_design([wp1, wp2], [ws1, ws2], PASS_RIPPLE, STOP_ATTENUATION)
+
+# the same band pass filter design in second-order sections form
+def band_pass_iir_sos(wp1, wp2, ws1, ws2) :
+    return iir_design([wp1, wp2], [ws1, ws2], PASS_RIPPLE, STOP_ATTENUATION, output='sos')
 
 # band pass FIR filter design with firwin function where order gives order of the B polinom of filter
 # and pass_f is the frequency from which the amplification begins
 # and stop_f is the frequency from which the attenuation begins
 def band_pass_fir(order, pass_f, stop_f) :
-    return sig.firwin(order + 1, [pass_f, stop_f], pass_zero=False)
+    return fir_design('bandpass', order, [pass_f, stop_f])
 
 # showing the original and the filtered signals in one figure window
-def show_filtered_figure(t, y, y_filtered):
-    mplot.plot(t, y, label='Original signal')
-    mplot.plot(t, y_filtered, label='Filtered signal')
+# the signals are decimated on long data sets (see plot_decimation.py)
+def show_filtered_figure(t, y, y_filtered, outfile=None):
+    plot_decimated(mplot.gca(), t, y, label='Original signal')
+    plot_decimated(mplot.gca(), t, y_filtered, label='Filtered signal')
+    mplot.xlabel('Time [s]')
+    mplot.ylabel('Amplitude')
+    mplot.legend()
+    mplot.grid()
+    show_figure(outfile)
+
+# showing the original signal and the outputs of a filter bank in one figure window
+# outputs has one row per filter, labels are the names of the filters
+def show_filter_bank_figure(t, y, outputs, labels, outfile=None) :
+    plot_decimated(mplot.gca(), t, y, label='Original signal')
+    for filtered, label in zip(outputs, labels) :
+        plot_decimated(mplot.gca(), t, filtered, label=label)
     mplot.xlabel('Time [s]')
     mplot.ylabel('Amplitude')
     mplot.legend()
     mplot.grid()
-    mplot.show()
+    show_figure(outfile)
+
+# edge frequencies of the filters of the menu options (normalized to Fs/2)
+LOW_PASS_FIR_CUTOFF = 0.001
+HIGH_PASS_FIR_PASS = 0.0005
+BAND_PASS_FIR_EDGES = (0.005, 0.01)
+# pass and stop frequencies
+LOW_PASS_IIR_EDGES = (0.0005, 0.005)
+HIGH_PASS_IIR_EDGES = (0.01, 0.005)
+BAND_PASS_IIR_EDGES = (0.001, 0.02, 0.0005, 0.05)
+
+# filter design of the menu options (1 - 3)
+# it returns with the b and a coefficients of the selected filter (a = 1 in case of FIR filters)
+# or with the second-order sections of the IIR filters if form is sos
+# the edge frequencies are multiplied by scale (ex.: the design at a rate decimated by scale, see select_multirate_filter)
+def select_filter(option, type, order, form='ba', scale=1) :
+    sos = (form == 'sos')
+    if option == '1' :
+        if type == 'iir' :
+            edges = [edge * scale for edge in LOW_PASS_IIR_EDGES]
+            return lowhigh_pass_iir_sos(*edges) if sos else lowhigh_pass_iir(*edges)
+        return low_pass_fir(order, LOW_PASS_FIR_CUTOFF * scale), 1
+    elif option == '2' :
+        if type == 'iir' :
+            edges = [edge * scale for edge in HIGH_PASS_IIR_EDGES]
+            return lowhigh_pass_iir_sos(*edges) if sos else lowhigh_pass_iir(*edges)
+        return high_pass_fir(order, HIGH_PASS_FIR_PASS * scale), 1
+    elif option == '3' :
+        if type == 'iir' :
+            edges = [edge * scale for edge in BAND_PASS_IIR_EDGES]
+            return band_pass_iir_sos(*edges) if sos else band_pass_iir(*edges)
+        return band_pass_fir(order, *[edge * scale for edge in BAND_PASS_FIR_EDGES]), 1
+    raise ValueError('there is no filter design for option ' + str(option))
+
+# filter design of the menu options (1 - 3) for multirate filtering (see multirate.py)
+# the decimation factor is computed from the highest stop band edge of the filter and the filter is redesigned
+# at the reduced rate (the FIR filters with less coefficients, so they have the same transition width in Hz and delay)
+# the high pass filter cannot be decimated, so its factor is 1
+# it returns with the decimation factor and the design at the reduced rate
+def select_multirate_filter(option, type, order, form='ba') :
+    if option == '1' :
+        if type == 'iir' :
+            factor = decimation_factor(LOW_PASS_IIR_EDGES[1])
+        else :
+            factor = fir_decimation_factor(order, fir_stop_edge(order, LOW_PASS_FIR_CUTOFF))
+    elif option == '3' :
+        if type == 'iir' :
+            factor = decimation_factor(max(BAND_PASS_IIR_EDGES))
+        else :
+            factor = fir_decimation_factor(order, fir_stop_edge(order, BAND_PASS_FIR_EDGES[1]))
+    else :
+        factor = 1
+    return factor, select_filter(option, type, reduced_fir_order(order, factor), form, factor)
+
+# filtering of the input signal with the filter given by select_filter
+# zero_phase and dtype are used only by the second-order sections (see sos_filtering), fir_method only by the FIR filters
+@profiled('filter', 1)
+def apply_filter(design, input, zero_phase=False, dtype=np.float64, fir_method='auto') :
+    if is_sos(design) :
+        return sos_filtering(design, input, zero_phase, dtype)
+    b, a = design
+    if np.isscalar(a) and a == 1 :
+        return fir_filtering(b, input, fir_method)
+    return iir_filtering(b, a, input)
+
+# the streaming mode of the program
+# the input file is filtered chunk by chunk and the result is written to the output file,
+# so the used memory depends on the chunk size and not on the size of the input file
+# the columns of the output file: time [s], original signal, filtered signal
+# args is the dictionary of the input arguments (see opt_walk)
+# streaming_filter must have a process method which filters the next chunk (ex.: StreamingFilter, StreamingMovingAverage)
+def filter_to_file(args, chunk_size, sampling_time_sec, streaming_filter) :
+    outfile = args['outfile']
+    position = 0
+    with open(outfile, 'w') as out :
+        for chunk in read_value_chunks_cached(args['infile'], chunk_size, args['use_cache']) :
+            with stage('stream_filter', len(chunk)) :
+                filtered = streaming_filter.process(chunk)
+            time_line = (np.arange(len(chunk)) + position) * sampling_time_sec
+            with stage('write_csv', len(chunk)) :
+                np.savetxt(out, np.column_stack((time_line, chunk, filtered)), fmt='%.10g', delimiter=',')
+            position += len(chunk)
+    print('The filtered signal (' + str(position) + ' samples) is written to ' + outfile)
+
+def run_streaming(args, chunk_size, type, order, form) :
+    # the sampling period is estimated from the first chunk
+    ts_ms, first_values = next(read_csv_chunks_cached(args['infile'], chunk_size, args['use_cache']), (None, None))
+    if ts_ms is None :
+        print('there is no data in the input file')
+        sys.exit(1)
+    try :
+        sampling_time_sec = estimate_sample_rate(ts_ms)['sample_time']
+    except ValueError as err :
+        print('the sampling period cannot be estimated: ' + str(err))
+        sys.exit(1)
+    menu()
+    quit = False
+    while not quit :
+        option = input()
+        if option == '0' :
+            menu()
+        elif option in ('1', '2', '3') :
+            design = select_filter(option, type, order, form)
+            filter_to_file(args, chunk_size, sampling_time_sec, StreamingFilter.from_design(design, args['dtype'], args['fir_method']))
+        elif option == '4' :
+            filter_to_file(args, chunk_size, sampling_time_sec, StreamingMovingAverage(args['window'], args['ma_kind']))
+        elif option == '5' :
+            print('The filter bank is not available in streaming mode.')
+        elif option == 'x' :
+            quit = True
+        else :
+            print('Invalid input parameter. Try again!\r\n')
 
 def main() :
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "hi:t:", ["help", "infile=", "type="])
+        opts, args = getopt.getopt(sys.argv[1:], "hi:t:f:w:c:o:", [
+            "help", "infile=", "type=", "form=", "order=", "fir-method=", "window=", "ma-kind=", "zero-phase", "multirate", "float32", "chunk-size=", "outfile=", "no-cache", "rebuild-cache", "profile=", "cprofile="
+        ])
     except getopt.GetoptError as err:
         print(err)
         usage()
         sys.exit(1)
     # opt_walk function returns with the path of the input file
     args = opt_walk(opts)
+    # the report files are written at the exit of the program
+    start_profiling(args['profile'], args['cprofile'])
     infile = args['infile']
     type = args['type']
 
@@ -151,64 +340,93 @@ def main() :
     if (type != 'fir') and (type != 'iir') :
         print('There is no valid filtering type. User can only enter fir or iir type.\r\nTherefore this program uses default (fir) type filtering.')
         type = 'fir'
-    # reading the csv file
-    data_set = ps.read_csv(infile, sep=',', squeeze=True, names=['time_stamp', 'acceleration'])
-    # converting the DataFrame object to numpy array
-    arr = data_set.to_numpy()
-    # the first column of array contains the dates of sampling and the second one contains the values
-    dates = 0
-    values = 1
-    # converting the date timestamps to millisecond values
-    ts_list = convert_timestamps_to_ms(arr[:, dates])
+    form = args['form']
+    if (form != 'ba') and (form != 'sos') :
+        print('There is no valid filter form. User can only enter ba or sos form.\r\nTherefore this program uses default (ba) form.')
+        form = 'ba'
+    if (args['zero_phase'] or args['dtype'] != np.float64) and (type != 'iir' or form != 'sos') :
+        print('The --zero-phase and --float32 options are used only by IIR filters in sos form (-t iir -f sos).')
+    try :
+        order = int(args['order'])
+    except ValueError :
+        order = 0
+    if order < 1 :
+        print('The order of the FIR filters must be a positive integer.')
+        sys.exit(1)
+    # the filter designs are cached on the disk too, except if the cache is switched off
+    set_disk_cache(args['use_cache'])
+    if args['fir_method'] not in METHODS :
+        print('There is no valid FIR filtering method. User can only enter ' + ', '.join(METHODS) + ' method.\r\nTherefore this program uses default (auto) method.')
+        args['fir_method'] = 'auto'
+    try :
+        args['window'] = int(args['window'])
+    except ValueError :
+        args['window'] = 0
+    if args['window'] < 1 :
+        print('The window of the moving average must be a positive integer.')
+        sys.exit(1)
+    if args['ma_kind'] not in KINDS :
+        print('There is no valid moving average kind. User can only enter ' + ', '.join(KINDS) + ' kind.\r\nTherefore this program uses default (simple) kind.')
+        args['ma_kind'] = 'simple'
+    if args['chunk_size'] != None :
+        try :
+            chunk_size = int(args['chunk_size'])
+        except ValueError :
+            chunk_size = 0
+        if chunk_size < 2 :
+            print('The chunk size must be an integer greater than 1.')
+            sys.exit(1)
+        if args['zero_phase'] or args['multirate'] or args['ma_kind'] == 'centered' :
+            print('Zero-phase filtering, multirate filtering and centered moving average are not possible in streaming mode, because they need the whole signal.')
+            sys.exit(1)
+        if args['outfile'] == None :
+            print('there is no output file for the streaming mode\r\nhint: -o, --outfile filename')
+            sys.exit(1)
+        run_streaming(args, chunk_size, type, order, form)
+        return
+    # reading the csv file (or its cache file), the time stamps are converted to millisecond values during the reading
+    ts_list, value_list = read_csv_cached(infile, args['use_cache'], args['rebuild_cache'])
     n = len(ts_list)
-    sampling_time_sec = calculate_sample_time(ts_list)
-    sampling_frequency_hz = (1 / sampling_time_sec)
-    order = 50
+    try :
+        sampling = estimate_sample_rate(ts_list)
+    except ValueError as err :
+        print('the sampling period cannot be estimated: ' + str(err))
+        sys.exit(1)
+    sampling_time_sec = sampling['sample_time']
+    sampling_frequency_hz = sampling['sampling_frequency']
     # calculating the time axis for plotting the date set
-    time_line = np.arange(0, n * sampling_time_sec, sampling_time_sec)
+    time_line = np.arange(n) * sampling_time_sec
     nyquist_f = sampling_frequency_hz / 2
 
     menu()
-    
+    # the filter bank of the menu options 1 - 3 is built at the first use
+    bank = None
     quit = False
     while not quit :
         option = input()
-        # options (0 - 7 + x to exit)
+        # options (0 - 5 + x to exit)
         if option == '0' :
             menu()
-        elif option == '1' :
-            lp_filtered = None
-            if type == 'iir':
-                b , a = lowhigh_pass_iir(0.0005, 0.005)
-                lp_filtered = iir_filtering(b, a, arr[:, values])
-            else :
-                lowpass_fir_filter = low_pass_fir(order, 0.001)
-                lp_filtered = fir_filtering(lowpass_fir_filter, arr[:, values])
-            show_filtered_figure(time_line, arr[:, values], lp_filtered)
-        elif option == '2' :
-            if type == 'iir' :
-                b , a = lowhigh_pass_iir(0.01, 0.005)
-                hp_filtered = iir_filtering(b, a, arr[:, values])
-            else :
-                highpass_fir_filter = high_pass_fir(order, 0.0005)
-                hp_filtered = fir_filtering(highpass_fir_filter, arr[:, values])
-            show_filtered_figure(time_line, arr[:, 1], hp_filtered)
-        elif option == '3' :
-            if type == 'iir' :
-                b, a = band_pass_iir(0.001, 0.02, 0.0005, 0.05)
-                bp_filtered = iir_filtering(b, a, arr[:, values])
-            else :
-                bandpass_fir_filter = band_pass_fir(order, 0.005, 0.01)
-                bp_filtered = fir_filtering(bandpass_fir_filter, arr[:, values])
-            show_filtered_figure(time_line, arr[:, values], bp_filtered)
+        elif option in ('1', '2', '3') and args['multirate'] :
+            factor, design = select_multirate_filter(option, type, order, form)
+            print('The signal is filtered at 1/' + str(factor) + ' of the sampling rate.')
+            filtered = multirate_filtering(
+                value_list, factor, lambda decimated : apply_filter(design, decimated, args['zero_phase'], args['dtype'], args['fir_method'])
+            )
+            show_filtered_figure(time_line, value_list, filtered)
+        elif option in ('1', '2', '3') :
+            design = select_filter(option, type, order, form)
+            filtered = apply_filter(design, value_list, args['zero_phase'], args['dtype'], args['fir_method'])
+            show_filtered_figure(time_line, value_list, filtered)
         elif option == '4' :
-            print('Moving avarage of 50 element')
-            coef = 1 / order
-            b = []
-            for i in range(0, order) :
-                b.append(coef)
-            filtered = fir_filtering(b, arr[:, values])
-            show_filtered_figure(time_line, arr[:, values], filtered)
+            print('Moving avarage of ' + str(args['window']) + ' element (' + args['ma_kind'] + ')')
+            filtered = moving_average(value_list, args['window'], args['ma_kind'])
+            show_filtered_figure(time_line, value_list, filtered)
+        elif option == '5' :
+            # the signal is filtered by the three filters in one pass (the zero-phase and float32 options are not used)
+            if bank is None :
+                bank = FilterBank([select_filter(option, type, order, form) for option in ('1', '2', '3')])
+            show_filter_bank_figure(time_line, value_list, bank.filter(value_list), ['Low pass', 'High pass', 'Band pass'])
         elif option == 'x' :
             quit = True
         else :
@@ -0,0 +1,85 @@
+#!/bin/python3
+
+# filter bank: more filters applied to the same signal in one pass
+# the designs are the results of the filter design functions of digital_filtering.py or user-supplied ones:
+# (b, 1) pairs of FIR filters, (b, a) pairs of IIR filters or arrays of second-order sections
+#  - the FIR filters are stacked into a matrix (the shorter ones are padded with zeros), if the longest one is long enough
+#    for the FFT based filtering, then every block of the signal is transformed only once for all of the FIR filters
+#  - the other filters are computed one by one in threads (lfilter and sosfilt release the GIL, so the threads run in parallel)
+# the outputs are given back in one (number of filters, length of the signal) array in the order of the designs
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import scipy.signal as sig
+import scipy.fft as fft
+import numpy as np
+
+from streaming_filter import is_sos
+from fir_engine import block_fft_size, choose_fir_method, overlap_save_valid
+from profiling import profiled
+
+class FilterBank :
+    # threads is the number of threads of the filters which are computed one by one
+    # (default: the number of these filters, but at most the number of CPUs, 1 means no threads)
+    def __init__(self, designs, threads=None) :
+        self.designs = list(designs)
+        if len(self.designs) == 0 :
+            raise ValueError('there is no filter in the filter bank')
+        self.threads = threads
+        # positions of the FIR filters in the bank and their coefficients in a matrix (one row per filter)
+        self.fir = []
+        rows = []
+        for i, design in enumerate(self.designs) :
+            if not is_sos(design) :
+                b, a = design
+                if np.isscalar(a) or len(np.atleast_1d(a)) == 1 :
+                    self.fir.append(i)
+                    rows.append(np.atleast_1d(np.asarray(b, dtype=np.float64)) / np.atleast_1d(a)[0])
+        self.taps = max((len(row) for row in rows), default=0)
+        self.coefficients = np.zeros((len(rows), self.taps))
+        for row, b in enumerate(rows) :
+            self.coefficients[row, :len(b)] = b
+        # the spectra of the FIR filters are computed only once
+        self.fft_size = block_fft_size(self.taps) if self.taps > 0 else 0
+        self.spectra = fft.rfft(self.coefficients, self.fft_size, axis=1) if self.taps > 0 else None
+
+    # the number of filters in the bank
+    def __len__(self) :
+        return len(self.designs)
+
+    # filtering of the signal with one filter of the bank (the FIR filters are used from the coefficient matrix)
+    def filter_one(self, i, x) :
+        design = self.designs[i]
+        if is_sos(design) :
+            return sig.sosfilt(design, x)
+        if i in self.fir :
+            return sig.lfilter(self.coefficients[self.fir.index(i)], 1, x)
+        b, a = design
+        return sig.lfilter(b, a, x)
+
+    # filtering of the signal with all of the filters
+    # it returns with a (number of filters, length of the signal) array
+    @profiled('filter_bank', 1)
+    def filter(self, x) :
+        x = np.asarray(x, dtype=np.float64)
+        result = np.empty((len(self.designs), len(x)))
+        single = [i for i in range(0, len(self.designs)) if i not in self.fir]
+        if len(self.fir) > 0 :
+            if choose_fir_method(self.taps, len(x)) == 'overlap-save' :
+                data = np.concatenate((np.zeros(self.taps - 1), x))
+                result[self.fir] = overlap_save_valid(self.spectra, self.taps, self.fft_size, data)
+            else :
+                single += self.fir
+        threads = self.threads if self.threads is not None else min(len(single), os.cpu_count() or 1)
+        if threads > 1 and len(single) > 1 :
+            with ThreadPoolExecutor(max_workers=threads) as executor :
+                for i, filtered in zip(single, executor.map(lambda i : self.filter_one(i, x), single)) :
+                    result[i] = filtered
+        else :
+            for i in single :
+                result[i] = self.filter_one(i, x)
+        return result
+
+# filtering of the signal with all of the designs (see FilterBank)
+def filter_bank(designs, x, threads=None) :
+    return FilterBank(designs, threads).filter(x)
@@ -0,0 +1,120 @@
+#!/bin/python3
+
+# execution engine of the FIR filters
+# the direct form (lfilter) needs len(b) multiplications per output sample, so it is slow for long filters
+# (sharp transition bands at low cutoff frequencies need thousands of coefficients)
+# the FFT based block convolution (overlap-add or overlap-save) needs about log2(fft size) operations per output sample,
+# independently of the length of the filter
+# the engine chooses between them by a simple cost model (see benchmarks/bench_fir_engine.py for the crossover)
+
+import scipy.signal as sig
+import scipy.fft as fft
+import numpy as np
+
+# cost of an FFT based output sample relative to a multiplication of the direct form per log2(fft size)
+# (measured with benchmarks/bench_fir_engine.py)
+FFT_COST_FACTOR = 8
+# the fft size of the overlap-save blocks is about this many times greater than the length of the filter
+FFT_SIZE_FACTOR = 8
+# the overlap-save blocks are transformed in groups of this many blocks to limit the used memory
+BLOCKS_PER_BATCH = 64
+
+METHODS = ('auto', 'direct', 'overlap-add', 'overlap-save')
+
+# fft size of the overlap-save blocks for a filter with taps coefficients
+def block_fft_size(taps) :
+    return fft.next_fast_len(max(FFT_SIZE_FACTOR * taps, 64), real=True)
+
+# choosing of the faster FIR filtering method for a filter with taps coefficients and a signal with n samples
+# (n is None if the length of the signal is unknown, ex.: in case of streaming)
+def choose_fir_method(taps, n=None) :
+    if n is not None and n < 2 * taps :
+        return 'direct'
+    size = block_fft_size(taps)
+    fft_cost = FFT_COST_FACTOR * np.log2(size) * size / (size - taps + 1)
+    return 'overlap-save' if fft_cost < taps else 'direct'
+
+# the valid part of the convolution of the signal and the filter (len(data) - taps + 1 samples)
+# computed with overlap-save blocks, b_fft is the real FFT of the filter coefficients with fft_size points
+# b_fft can contain the spectra of more filters (one row per filter, taps is the length of the longest one),
+# in this case the blocks of the signal are transformed only once and the result has one row per filter
+def overlap_save_valid(b_fft, taps, fft_size, data) :
+    step = fft_size - taps + 1
+    n = len(data) - taps + 1
+    bank = np.ndim(b_fft) == 2
+    if n <= 0 :
+        return np.empty((len(b_fft), 0)) if bank else np.empty(0)
+    blocks = -(-n // step)
+    # the signal is padded with zeros, so every block is full
+    padded = np.zeros((blocks - 1) * step + fft_size)
+    padded[:len(data)] = data
+    segments = np.lib.stride_tricks.sliding_window_view(padded, fft_size)[::step]
+    result = np.empty((len(b_fft), blocks * step)) if bank else np.empty(blocks * step)
+    for first in range(0, blocks, BLOCKS_PER_BATCH) :
+        last = min(first + BLOCKS_PER_BATCH, blocks)
+        spectra = fft.rfft(segments[first:last], axis=1)
+        # the first taps - 1 samples of every block are distorted by the circular convolution
+        if bank :
+            filtered = fft.irfft(spectra[np.newaxis] * b_fft[:, np.newaxis], fft_size, axis=2)[:, :, taps - 1:]
+            result[:, first * step:last * step] = filtered.reshape(len(b_fft), -1)
+        else :
+            result[first * step:last * step] = fft.irfft(spectra * b_fft, fft_size, axis=1)[:, taps - 1:].ravel()
+    return result[..., :n]
+
+# FIR filtering with overlap-save blocks (the same result as lfilter(b, 1, x) apart from the rounding errors)
+def overlap_save(b, x, fft_size=None) :
+    b = np.asarray(b, dtype=np.float64)
+    taps = len(b)
+    if fft_size is None :
+        fft_size = block_fft_size(taps)
+    data = np.concatenate((np.zeros(taps - 1), np.asarray(x, dtype=np.float64)))
+    return overlap_save_valid(fft.rfft(b, fft_size), taps, fft_size, data)
+
+# FIR filtering with overlap-add blocks (the same result as lfilter(b, 1, x) apart from the rounding errors)
+def overlap_add(b, x) :
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) == 0 :
+        return np.empty(0)
+    return sig.oaconvolve(x, np.asarray(b, dtype=np.float64))[:len(x)]
+
+# FIR filtering with the given method (auto, direct, overlap-add or overlap-save)
+# y[n] = sum([b[i] * input[n - i] for i in range(0, len(b))])
+def fast_fir_filtering(b, x, method='auto') :
+    if method == 'auto' :
+        method = choose_fir_method(len(b), len(x))
+    if method == 'direct' :
+        return sig.lfilter(b, 1, x)
+    elif method == 'overlap-add' :
+        return overlap_add(b, x)
+    elif method == 'overlap-save' :
+        return overlap_save(b, x)
+    raise ValueError('unknown FIR filtering method: ' + str(method))
+
+# streaming version of the overlap-save FIR filtering
+# the last len(b) - 1 samples of a block are carried over to the next block,
+# so the result is the same as the filtering of the whole signal (apart from the rounding errors)
+class StreamingFFTFilter :
+    def __init__(self, b, fft_size=None) :
+        self.b = np.atleast_1d(np.asarray(b, dtype=np.float64))
+        self.taps = len(self.b)
+        self.fft_size = fft_size if fft_size is not None else block_fft_size(self.taps)
+        # the spectrum of the filter is computed only once
+        self.b_fft = fft.rfft(self.b, self.fft_size)
+        self.reset()
+
+    # clearing the state of the filter (the next block is the beginning of a new signal)
+    def reset(self) :
+        self.history = np.zeros(self.taps - 1)
+
+    # filtering of the next block of the signal
+    # it returns with the filtered block
+    def process(self, block) :
+        block = np.asarray(block, dtype=np.float64)
+        if len(block) == 0 :
+            return np.empty(0)
+        data = np.concatenate((self.history, block))
+        self.history = data[len(data) - (self.taps - 1):]
+        # short blocks are computed in direct form, because a whole FFT block would be more expensive
+        if len(block) * self.taps < FFT_COST_FACTOR * self.fft_size * np.log2(self.fft_size) :
+            return np.convolve(data, self.b, mode='valid')
+        return overlap_save_valid(self.b_fft, self.taps, self.fft_size, data)
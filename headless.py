@@ -0,0 +1,14 @@
+#!/bin/python3
+
+# the common parts of the headless modes (batch.py, analysis_server.py): the names of the filters of the filter operation
+# and the conversion of the numeric results to JSON
+# it does not import the plotting modules, so the modes can use it without matplotlib
+
+# the filters of the filter operation and the menu options of digital_filtering.py which belong to them
+FILTERS = {'lowpass' : '1', 'highpass' : '2', 'bandpass' : '3', 'movingaverage' : '4'}
+
+# converting the numpy values of the results to python values for json
+def json_value(value) :
+    if hasattr(value, 'tolist') :
+        return value.tolist()
+    return str(value)
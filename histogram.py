@@ -0,0 +1,114 @@
+#!/bin/python3
+
+# histogram of the data sets with equal width bins between two limits
+# the values are binned on typed (float64) arrays with the uniform bin path of np.histogram (the bin of a value is
+# computed and counted with bincount, nothing is sorted), so the result is the same as the histogram of
+# matplotlib's hist on the whole data set (its default is 10 bins between the minimum and the maximum)
+# the data set can be added chunk by chunk and the histograms of the parts (ex.: computed by parallel workers)
+# can be merged if they have the same bins, the limits of the bins of a chunked data set are found in a first pass
+# (see value_range)
+# the counts are kept, so the histogram can be drawn again or in another scale (ex.: in seconds with durations)
+# without binning the data set again
+
+import numpy as np
+
+from profiling import profiled, stage
+
+# the default number of bins (the same as the default of matplotlib's hist)
+DEFAULT_BINS = 10
+
+class Histogram :
+    # the bins are between low and high (high is in the last bin), the values out of this range are counted in outside
+    def __init__(self, low, high, bins=DEFAULT_BINS) :
+        if bins < 1 :
+            raise ValueError('the number of bins must be positive')
+        if not low < high :
+            raise ValueError('the lower limit of the histogram must be less than the upper limit')
+        self.low = float(low)
+        self.high = float(high)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.outside = 0
+
+    # the number of bins
+    def __len__(self) :
+        return len(self.counts)
+
+    # the edges of the bins (number of bins + 1 values)
+    def edges(self) :
+        return np.linspace(self.low, self.high, len(self.counts) + 1)
+
+    # the number of the values in the bins
+    def total(self) :
+        return int(self.counts.sum())
+
+    # adding the next chunk of the data set
+    def add(self, chunk) :
+        chunk = np.asarray(chunk, dtype=np.float64)
+        counts, edges = np.histogram(chunk, len(self.counts), (self.low, self.high))
+        self.counts += counts
+        self.outside += len(chunk) - int(counts.sum())
+
+    # true if the other histogram has the same bins
+    def compatible(self, other) :
+        return self.low == other.low and self.high == other.high and len(self.counts) == len(other.counts)
+
+    # adding the counts of the other histogram (it must have the same bins)
+    def merge(self, other) :
+        if not self.compatible(other) :
+            raise ValueError('the histograms have different bins')
+        self.counts += other.counts
+        self.outside += other.outside
+
+    # the time spent in the bins if the values are samples of a signal with the given sampling period
+    def durations(self, sampling_time) :
+        return self.counts * sampling_time
+
+# the limits of the histogram of a data set from its minimum and maximum
+# if every value is the same, then the limits are value -+ 0.5 (like in np.histogram)
+def histogram_limits(minimum, maximum) :
+    if not np.isfinite(minimum) or not np.isfinite(maximum) :
+        raise ValueError('the range of the data set is not finite')
+    if minimum == maximum :
+        return minimum - 0.5, maximum + 0.5
+    return minimum, maximum
+
+# the limits of the histogram of a chunked data set (the first pass over the chunks)
+def value_range(chunks) :
+    minimum = np.inf
+    maximum = -np.inf
+    for chunk in chunks :
+        if len(chunk) > 0 :
+            minimum = min(minimum, float(np.min(chunk)))
+            maximum = max(maximum, float(np.max(chunk)))
+    if minimum > maximum :
+        raise ValueError('there is no data in the data set')
+    return histogram_limits(minimum, maximum)
+
+# histogram of a whole array
+@profiled('histogram')
+def histogram_of_array(values, bins=DEFAULT_BINS) :
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0 :
+        raise ValueError('there is no data in the data set')
+    histogram = Histogram(*histogram_limits(float(np.min(values)), float(np.max(values))), bins)
+    histogram.add(values)
+    return histogram
+
+# histogram of the chunks of a data set between the given limits (see value_range)
+def histogram_of_chunks(chunks, low, high, bins=DEFAULT_BINS) :
+    histogram = Histogram(low, high, bins)
+    with stage('histogram') as measured :
+        for chunk in chunks :
+            measured['samples'] += len(chunk)
+            histogram.add(chunk)
+    return histogram
+
+# merging the histograms of the parts of a data set (they must have the same bins)
+def merge_histograms(histograms) :
+    histograms = list(histograms)
+    if len(histograms) == 0 :
+        raise ValueError('there is no histogram to merge')
+    merged = Histogram(histograms[0].low, histograms[0].high, len(histograms[0]))
+    for histogram in histograms :
+        merged.merge(histogram)
+    return merged
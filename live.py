@@ -0,0 +1,426 @@
+#!/bin/python3
+
+# live mode: the samples of a sensor are read continuously from stdin, from a FIFO or from a local TCP socket
+# the lines have the same format as the lines of the input files (time stamp,acceleration)
+#  - the lines are read with asyncio and collected into batches (at most BATCH_DELAY seconds or BATCH_BYTES bytes),
+#    a batch is parsed at once with the vectorized time stamp parsing of timestamps.py
+#  - the selected filter runs on every batch with its state carried over (StreamingFilter, the result is the same as
+#    the filtering of the whole signal), the time stamps, the values and the filtered values are stored in a
+#    preallocated ring buffer which keeps the newest samples
+#  - the statistics of the whole stream are updated with every batch (data_statistics.RunningStatistics), the sampling
+#    rate, the peaks and the statistics of the newest samples are reported in every report interval
+# the latency is the time from the arrival of the first line of a batch to the end of its processing
+# the replay server sends the lines of an input file to the TCP clients paced by the time stamps (it can stand in for the sensor)
+# usage: python live.py -s [- fifo tcp:host:port] [--filter name] [-o outfile] [--duration sec]
+#        python live.py --replay filename [--port number] [--speed factor] [--split]
+
+import asyncio
+import stat
+import time
+import os
+import numpy as np
+import getopt
+import sys
+
+from timestamps import convert_timestamps_to_ms
+from sample_rate import estimate_sample_rate
+from peaks import find_peak_positions
+from data_statistics import RunningStatistics, statistics_of_array
+from streaming_filter import StreamingFilter
+from moving_average import KINDS, StreamingMovingAverage
+from fir_engine import METHODS
+from digital_filtering import select_filter
+
+# the filters of the live mode and the menu options of digital_filtering.py which belong to them
+FILTERS = {'lowpass' : '1', 'highpass' : '2', 'bandpass' : '3', 'movingaverage' : '4', 'none' : None}
+DEFAULT_CAPACITY = 1 << 20
+DEFAULT_RECENT = 1 << 14
+READ_SIZE = 1 << 16
+# the lines are collected into a batch for at most this long (sec) or up to this size (bytes)
+BATCH_DELAY = 0.02
+BATCH_BYTES = 1 << 18
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 9750
+# the replay server sends the due lines in this period (sec)
+REPLAY_TICK = 0.005
+
+def usage() :
+    print(
+        '-h --help for help\r\n'
+        '-s --source [- fifo tcp:host:port] (- is stdin, fifo is the path of a named pipe)\r\n'
+        '--filter [lowpass highpass bandpass movingaverage none] (default: lowpass)\r\n'
+        '-t --type [fir iir] -f --form [ba sos] --order number --fir-method method (see digital_filtering.py)\r\n'
+        '-w --window number --ma-kind [simple weighted exponential] (moving average, see digital_filtering.py)\r\n'
+        '--capacity samples (size of the ring buffer, default: 1048576)\r\n'
+        '--recent samples (the peaks and the statistics are reported on the newest samples, default: 16384)\r\n'
+        '--peak-level number (level of the reported peaks, see data_visualizations.py, default: 3)\r\n'
+        '--interval sec (report interval, default: 1)\r\n'
+        '-o --outfile filename (the time, the original and the filtered signal are written to this csv file)\r\n'
+        '--duration sec (the live mode stops after this time, default: at the end of the input)\r\n'
+        '--replay filename (replay server: the lines of the file are sent to the TCP clients)\r\n'
+        '--host address --port number (address of the replay server, default: 127.0.0.1:9750)\r\n'
+        '--speed factor (replay speed compared with the time stamps, default: 1)\r\n'
+        '--split (the replay server splits the lines between the writes like TCP segments)\r\n'
+    )
+
+# handling of input arguments, it returns with a dictionary of the settings
+def opt_walk(opts) :
+    args = {
+        'source' : None, 'filter' : 'lowpass', 'type' : 'fir', 'form' : 'ba', 'order' : '50', 'fir_method' : 'auto',
+        'window' : '50', 'ma_kind' : 'simple', 'capacity' : str(DEFAULT_CAPACITY), 'recent' : str(DEFAULT_RECENT),
+        'peak_level' : '3', 'interval' : '1', 'outfile' : None, 'duration' : None,
+        'replay' : None, 'host' : DEFAULT_HOST, 'port' : str(DEFAULT_PORT), 'speed' : '1', 'split' : False
+    }
+    names = {
+        "-s" : 'source', "--source" : 'source', "--filter" : 'filter', "-t" : 'type', "--type" : 'type', "-f" : 'form', "--form" : 'form',
+        "--order" : 'order', "--fir-method" : 'fir_method', "-w" : 'window', "--window" : 'window', "--ma-kind" : 'ma_kind',
+        "--capacity" : 'capacity', "--recent" : 'recent', "--peak-level" : 'peak_level', "--interval" : 'interval',
+        "-o" : 'outfile', "--outfile" : 'outfile', "--duration" : 'duration', "--replay" : 'replay',
+        "--host" : 'host', "--port" : 'port', "--speed" : 'speed'
+    }
+    for o, a in opts :
+        if o in ("-h", "--help") :
+            usage()
+        elif o == "--split" :
+            args['split'] = True
+        elif o in names :
+            args[names[o]] = a
+        else :
+            print("unhandled option")
+            usage()
+    return args
+
+class RingBuffer :
+    # columns is the number of the stored arrays (ex.: time stamps, values and filtered values)
+    def __init__(self, capacity, columns) :
+        if capacity < 1 :
+            raise ValueError('the capacity of the ring buffer must be positive')
+        self.data = np.zeros((columns, capacity))
+        # the number of the samples which have been written to the buffer
+        self.count = 0
+
+    # the number of the stored samples
+    def __len__(self) :
+        return min(self.count, self.data.shape[1])
+
+    # writing the next samples (one array per column), only the newest capacity samples are kept
+    def append(self, *columns) :
+        capacity = self.data.shape[1]
+        n = len(columns[0])
+        skip = max(n - capacity, 0)
+        start = (self.count + skip) % capacity
+        first = min(n - skip, capacity - start)
+        for row, column in enumerate(columns) :
+            self.data[row, start:start + first] = column[skip:skip + first]
+            self.data[row, :n - skip - first] = column[skip + first:]
+        self.count += n
+
+    # the newest n samples in time order (a (columns, n) array)
+    def latest(self, n) :
+        capacity = self.data.shape[1]
+        n = min(n, len(self))
+        end = self.count % capacity
+        if n <= end :
+            return self.data[:, end - n:end].copy()
+        return np.concatenate((self.data[:, capacity - (n - end):], self.data[:, :end]), axis=1)
+
+# parsing of the complete lines of a batch (bytes)
+# it returns with the time stamps in ms, the values and the number of the invalid lines
+# the lines are parsed together, only the batches with invalid lines are parsed again line by line
+def parse_lines(data) :
+    fields = [line.split(',') for line in data.decode('utf-8', errors='replace').splitlines() if line.strip() != '']
+    try :
+        if any(len(field) != 2 for field in fields) :
+            raise ValueError('invalid line')
+        ts_ms = convert_timestamps_to_ms(np.array([field[0] for field in fields], dtype=object))
+        values = np.array([field[1] for field in fields]).astype(np.float64)
+        return ts_ms, values, 0
+    except ValueError :
+        ts_list = []
+        value_list = []
+        for field in fields :
+            try :
+                if len(field) != 2 :
+                    raise ValueError('invalid line')
+                ts = convert_timestamps_to_ms(np.array([field[0]], dtype=object))[0]
+                value = float(field[1])
+            except ValueError :
+                continue
+            ts_list.append(ts)
+            value_list.append(value)
+        return np.array(ts_list, dtype=np.float64), np.array(value_list, dtype=np.float64), len(fields) - len(ts_list)
+
+class LiveAnalysis :
+    # streaming_filter has a process method which filters the next block (None: the signal is not filtered)
+    # recent is the number of the newest samples of the reports, outfile is an open file for the filtered signal (or None)
+    def __init__(self, streaming_filter=None, capacity=DEFAULT_CAPACITY, recent=DEFAULT_RECENT, peak_level=3, outfile=None) :
+        self.streaming_filter = streaming_filter
+        self.buffer = RingBuffer(capacity, 3)
+        self.recent = recent
+        self.peak_level = peak_level
+        self.outfile = outfile
+        self.statistics = RunningStatistics()
+        self.first_ts = None
+        self.invalid = 0
+        self.latencies = []
+        self.max_latency = 0.0
+
+    # processing of a batch of complete lines which started to arrive at the given time (time.perf_counter)
+    def process(self, data, arrived) :
+        ts_ms, values, invalid = parse_lines(data)
+        self.invalid += invalid
+        if len(values) > 0 :
+            filtered = self.streaming_filter.process(values) if self.streaming_filter is not None else values
+            self.buffer.append(ts_ms, values, filtered)
+            self.statistics.update(values)
+            if self.first_ts is None :
+                self.first_ts = ts_ms[0]
+            if self.outfile is not None :
+                np.savetxt(self.outfile, np.column_stack(((ts_ms - self.first_ts) / 1000, values, filtered)), fmt='%.10g', delimiter=',')
+        latency = time.perf_counter() - arrived
+        self.latencies.append(latency)
+        self.max_latency = max(self.max_latency, latency)
+
+    # the report of the newest samples (a dictionary), the latencies of the batches since the previous report are reset
+    def report(self) :
+        report = {'samples' : self.buffer.count, 'invalid_lines' : self.invalid, 'batches' : len(self.latencies)}
+        if len(self.latencies) > 0 :
+            report['latency'] = float(np.mean(self.latencies))
+            report['max_latency'] = float(np.max(self.latencies))
+        self.latencies = []
+        ts_ms, values, filtered = self.buffer.latest(self.recent)
+        if len(values) >= 2 :
+            try :
+                report['sampling_frequency'] = estimate_sample_rate(ts_ms)['sampling_frequency']
+            except ValueError :
+                pass
+            statistics = statistics_of_array(values)
+            report['mean'] = statistics['mean']
+            report['deviation'] = statistics['deviation']
+            positions = find_peak_positions(values, self.peak_level)
+            report['peaks'] = len(positions)
+            if len(positions) > 0 :
+                highest = positions[np.argmax(values[positions])]
+                report['highest_peak'] = values[highest]
+                report['highest_peak_time'] = (ts_ms[highest] - self.first_ts) / 1000
+            report['filtered'] = filtered[-1]
+        return report
+
+# printing a report of LiveAnalysis
+def print_report(report, elapsed) :
+    text = '[{:7.1f} s] {} samples'.format(elapsed, report['samples'])
+    if 'sampling_frequency' in report :
+        text += ' ({:.1f} Hz)'.format(report['sampling_frequency'])
+    if 'latency' in report :
+        text += ', {} batches, latency {:.1f} ms (max {:.1f} ms)'.format(report['batches'], report['latency'] * 1000, report['max_latency'] * 1000)
+    if 'mean' in report :
+        text += ', mean {:.4g}, deviation {:.4g}, {} peaks'.format(report['mean'], report['deviation'], report['peaks'])
+    if 'highest_peak' in report :
+        text += ' (highest {:.4g} at {:.3f} s)'.format(report['highest_peak'], report['highest_peak_time'])
+    if 'filtered' in report :
+        text += ', filtered {:.4g}'.format(report['filtered'])
+    if report['invalid_lines'] > 0 :
+        text += ', ' + str(report['invalid_lines']) + ' invalid lines'
+    print(text, flush=True)
+
+# opening the source, it returns with an asyncio stream reader (and the writer of the TCP connection or None)
+# stdin and the FIFOs must be pipes (or sockets), regular files can be replayed with the replay server
+async def open_source(source) :
+    loop = asyncio.get_running_loop()
+    if source.startswith('tcp:') :
+        host, port = source[4:].rsplit(':', 1)
+        return await asyncio.open_connection(host, int(port))
+    if source == '-' :
+        pipe = sys.stdin.buffer
+    else :
+        # opening a FIFO waits for the writer
+        pipe = await asyncio.to_thread(open, source, 'rb', 0)
+    mode = os.fstat(pipe.fileno()).st_mode
+    if not (stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or stat.S_ISCHR(mode)) :
+        raise ValueError('the source must be a pipe, a FIFO or a TCP socket (regular files can be sent by the replay server)')
+    reader = asyncio.StreamReader(limit=BATCH_BYTES)
+    await loop.connect_read_pipe(lambda : asyncio.StreamReaderProtocol(reader), pipe)
+    return reader, None
+
+# reading batches of complete lines from the stream reader
+# a batch is given back when BATCH_DELAY seconds elapsed since its first data arrived or it is at least BATCH_BYTES long
+# the read is not cancelled when the batch delay elapses, the same read waits for the next data, and a partial line
+# without a complete line before it is waited for until its end
+# it yields (complete lines in bytes, arrival time of the first data of the batch) pairs
+async def read_batches(reader) :
+    pending = b''
+    arrived = None
+    read = None
+    try :
+        while True :
+            timeout = None if arrived is None or b'\n' not in pending else max(arrived + BATCH_DELAY - time.perf_counter(), 0)
+            if read is None :
+                read = asyncio.ensure_future(reader.read(READ_SIZE))
+            done, waiting = await asyncio.wait({read}, timeout=timeout)
+            data = None
+            if read in done :
+                data = read.result()
+                read = None
+            if data == b'' :
+                if pending.strip() != b'' :
+                    yield pending, arrived
+                return
+            if data is not None :
+                if arrived is None :
+                    arrived = time.perf_counter()
+                pending += data
+            if data is None or len(pending) >= BATCH_BYTES or time.perf_counter() - arrived >= BATCH_DELAY :
+                cut = pending.rfind(b'\n') + 1
+                if cut > 0 :
+                    yield pending[:cut], arrived
+                    pending = pending[cut:]
+                    # the rest of the batch (a partial line) arrived now
+                    arrived = time.perf_counter() if len(pending) > 0 else None
+    finally :
+        if read is not None :
+            read.cancel()
+
+# the live mode: reading the source until its end (or until duration sec) and printing the reports in every interval
+async def run_live(source, analysis, interval, duration=None) :
+    reader, writer = await open_source(source)
+    start = time.perf_counter()
+    next_report = start + interval
+
+    async def consume() :
+        nonlocal next_report
+        async for data, arrived in read_batches(reader) :
+            analysis.process(data, arrived)
+            if time.perf_counter() >= next_report :
+                print_report(analysis.report(), time.perf_counter() - start)
+                next_report += interval * max(1, np.ceil((time.perf_counter() - next_report) / interval))
+
+    try :
+        await asyncio.wait_for(consume(), duration)
+    except asyncio.TimeoutError :
+        pass
+    finally :
+        if writer is not None :
+            writer.close()
+    print_report(analysis.report(), time.perf_counter() - start)
+    if analysis.statistics.count > 0 :
+        statistics = analysis.statistics.result()
+        print('Statistics of the whole stream: mean {:.6g}, median {:.6g}, deviation {:.6g}, max. latency {:.1f} ms'.format(
+            statistics['mean'], statistics['median'], statistics['deviation'], analysis.max_latency * 1000
+        ))
+
+# the replay server: the lines of the input file are sent to every TCP client paced by their time stamps
+# (speed is the speed compared with the time stamps, ex.: 10 sends ten times faster), the connection is closed at the end of the file
+# if split is true, then the end of the last sent line is held back until the next lines (the lines are split between
+# the writes like between TCP segments)
+# it returns with the started asyncio server and the number of the lines
+async def start_replay(infile, host, port, speed, split=False) :
+    with open(infile, 'rb') as data :
+        lines = data.read().splitlines(keepends=True)
+    lines = [line if line.endswith(b'\n') else line + b'\n' for line in lines if line.strip() != b'']
+    if len(lines) == 0 :
+        raise ValueError('there is no data in the input file')
+    ts_ms, values, invalid = parse_lines(b''.join(lines))
+    if invalid > 0 :
+        raise ValueError(str(invalid) + ' invalid lines in the input file')
+    loop = asyncio.get_running_loop()
+
+    async def send(client_reader, client_writer) :
+        start = loop.time()
+        position = 0
+        held = b''
+        try :
+            while position < len(lines) :
+                due = int(np.searchsorted(ts_ms, ts_ms[0] + (loop.time() - start) * 1000 * speed, side='right'))
+                if due > position :
+                    data = held + b''.join(lines[position:due])
+                    held = b''
+                    if split and due < len(lines) :
+                        cut = len(data) - len(lines[due - 1]) // 2
+                        data, held = data[:cut], data[cut:]
+                    client_writer.write(data)
+                    await client_writer.drain()
+                    position = due
+                else :
+                    await asyncio.sleep(REPLAY_TICK)
+        except ConnectionError :
+            pass
+        finally :
+            client_writer.close()
+
+    return await asyncio.start_server(send, host, port), len(lines)
+
+async def run_replay(infile, host, port, speed, split=False) :
+    server, count = await start_replay(infile, host, port, speed, split)
+    print('Replaying ' + infile + ' (' + str(count) + ' lines) on tcp:' + host + ':' + str(port), flush=True)
+    async with server :
+        await server.serve_forever()
+
+# the filter of the live mode from the settings (None if the signal is not filtered)
+def make_filter(args) :
+    option = FILTERS[args['filter']]
+    if option is None :
+        return None
+    if option == '4' :
+        return StreamingMovingAverage(int(args['window']), args['ma_kind'])
+    return StreamingFilter.from_design(select_filter(option, args['type'], int(args['order']), args['form']), fir_method=args['fir_method'])
+
+def main() :
+    try :
+        opts, args = getopt.getopt(sys.argv[1:], "hs:t:f:w:o:", [
+            "help", "source=", "filter=", "type=", "form=", "order=", "fir-method=", "window=", "ma-kind=", "capacity=", "recent=",
+            "peak-level=", "interval=", "outfile=", "duration=", "replay=", "host=", "port=", "speed=", "split"
+        ])
+    except getopt.GetoptError as err :
+        print(err)
+        usage()
+        sys.exit(1)
+    args = opt_walk(opts)
+    if args['replay'] != None :
+        if not os.path.exists(args['replay']) :
+            print('there is no existing input file for the replay server')
+            sys.exit(1)
+        try :
+            asyncio.run(run_replay(args['replay'], args['host'], int(args['port']), float(args['speed']), args['split']))
+        except KeyboardInterrupt :
+            pass
+        except (ValueError, OSError) as err :
+            print(err)
+            sys.exit(1)
+        return
+    if args['source'] == None :
+        print('there is no source\r\nhint: -s, --source [- fifo tcp:host:port]')
+        sys.exit(1)
+    if args['filter'] not in FILTERS or args['type'] not in ('fir', 'iir') or args['form'] not in ('ba', 'sos') :
+        print('The filter must be one of ' + ', '.join(FILTERS) + ', the type must be fir or iir and the form must be ba or sos.')
+        sys.exit(1)
+    if args['fir_method'] not in METHODS or args['ma_kind'] not in KINDS or args['ma_kind'] == 'centered' :
+        print('The FIR method must be one of ' + ', '.join(METHODS) + ', the moving average must be simple, weighted or exponential.')
+        sys.exit(1)
+    try :
+        capacity = int(args['capacity'])
+        recent = int(args['recent'])
+        peak_level = int(args['peak_level'])
+        interval = float(args['interval'])
+        duration = None if args['duration'] == None else float(args['duration'])
+        streaming_filter = make_filter(args)
+    except ValueError as err :
+        print('invalid setting: ' + str(err))
+        sys.exit(1)
+    if capacity < 2 or recent < 2 or recent > capacity or peak_level < 1 or not interval > 0 :
+        print('The capacity and the recent samples must be at least 2 (recent <= capacity), the peak level and the interval must be positive.')
+        sys.exit(1)
+    outfile = open(args['outfile'], 'w') if args['outfile'] != None else None
+    try :
+        analysis = LiveAnalysis(streaming_filter, capacity, recent, peak_level, outfile)
+        asyncio.run(run_live(args['source'], analysis, interval, duration))
+    except KeyboardInterrupt :
+        pass
+    except (ValueError, OSError) as err :
+        print(err)
+        sys.exit(1)
+    finally :
+        if outfile is not None :
+            outfile.close()
+
+if __name__ == '__main__' :
+    main()
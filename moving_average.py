@@ -0,0 +1,96 @@
+#!/bin/python3
+
+# moving average filters with O(N) cost independently of the length of the window
+# the window sums are computed from cumulative sums (instead of a FIR filter with window coefficients),
+# the cumulative sums are restarted in every block and the mean of the block is subtracted before the summation,
+# so their rounding errors do not grow with the length or the offset (ex.: gravity) of the signal
+# kinds of the moving average:
+#  - simple: mean of the last window samples (the same as the FIR filter with window coefficients of 1 / window)
+#  - weighted: linearly weighted mean of the last window samples (the newest sample has the greatest weight)
+#  - exponential: y[n] = alpha * x[n] + (1 - alpha) * y[n - 1], where alpha = 2 / (window + 1)
+#  - centered: mean of the window samples around the given sample (it needs the future samples too)
+# at the beginning of the signal the missing samples are treated as zeros (like lfilter does it)
+
+import scipy.signal as sig
+import numpy as np
+
+from profiling import profiled
+
+KINDS = ('simple', 'weighted', 'exponential', 'centered')
+# the cumulative sums are restarted after this many samples (or after 4 windows if it is greater)
+BLOCK_SIZE = 1 << 14
+
+class StreamingMovingAverage :
+    # window is the length of the moving window (in samples)
+    # kind can be simple, weighted or exponential (the centered moving average is not causal, so it cannot be streamed)
+    def __init__(self, window, kind='simple') :
+        if window < 1 :
+            raise ValueError('the window of the moving average must be at least 1')
+        if kind not in KINDS or kind == 'centered' :
+            raise ValueError('unknown streaming moving average: ' + str(kind))
+        self.window = int(window)
+        self.kind = kind
+        self.alpha = 2 / (self.window + 1)
+        self.reset()
+
+    # clearing the state of the moving average (the next block is the beginning of a new signal)
+    def reset(self) :
+        self.history = np.zeros(self.window - 1)
+        self.zi = np.zeros(1)
+
+    # moving average of the next block of the signal
+    # it returns with the averaged block
+    def process(self, block) :
+        block = np.asarray(block, dtype=np.float64)
+        if self.kind == 'exponential' :
+            averaged, self.zi = sig.lfilter([self.alpha], [1, self.alpha - 1], block, zi=self.zi)
+            return averaged
+        averaged = np.empty(len(block))
+        block_size = max(BLOCK_SIZE, 4 * self.window)
+        for start in range(0, len(block), block_size) :
+            chunk = block[start:start + block_size]
+            data = np.concatenate((self.history, chunk))
+            self.history = data[len(data) - (self.window - 1):]
+            offset = data.mean()
+            centered = data - offset
+            if self.kind == 'simple' :
+                averaged[start:start + len(chunk)] = window_sums(centered, self.window) / self.window + offset
+            else :
+                weights = self.window * (self.window + 1) / 2
+                averaged[start:start + len(chunk)] = weighted_window_sums(centered, self.window) / weights + offset
+        return averaged
+
+# sums of the windows of the data (len(data) - window + 1 sums)
+# sum[i] = data[i] + data[i + 1] + ... + data[i + window - 1]
+def window_sums(data, window) :
+    cumulative = np.concatenate(([0.0], np.cumsum(data)))
+    return cumulative[window:] - cumulative[:len(cumulative) - window]
+
+# linearly weighted sums of the windows of the data (len(data) - window + 1 sums)
+# sum[i] = 1 * data[i] + 2 * data[i + 1] + ... + window * data[i + window - 1]
+# it is computed from the cumulative sums of data[j] and j * data[j]:
+# sum[i] = (D[i + window] - D[i]) - (i - 1) * (C[i + window] - C[i])
+def weighted_window_sums(data, window) :
+    cumulative = np.concatenate(([0.0], np.cumsum(data)))
+    indexed = np.concatenate(([0.0], np.cumsum(data * np.arange(len(data)))))
+    shift = np.arange(len(data) - window + 1) - 1
+    return (indexed[window:] - indexed[:len(indexed) - window]) - shift * (cumulative[window:] - cumulative[:len(cumulative) - window])
+
+# causal moving average of the whole signal (simple, weighted or exponential)
+def causal_moving_average(x, window, kind='simple') :
+    return StreamingMovingAverage(window, kind).process(x)
+
+# centered moving average: the causal simple moving average shifted back by (window - 1) // 2 samples
+# at the end of the signal the missing samples are treated as zeros
+def centered_moving_average(x, window) :
+    x = np.asarray(x, dtype=np.float64)
+    shift = (window - 1) // 2
+    padded = np.concatenate((x, np.zeros(shift)))
+    return causal_moving_average(padded, window)[shift:]
+
+# moving average of the whole signal with the given window and kind (see KINDS)
+@profiled('moving_average')
+def moving_average(x, window, kind='simple') :
+    if kind == 'centered' :
+        return centered_moving_average(x, window)
+    return causal_moving_average(x, window, kind)
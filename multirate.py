@@ -0,0 +1,71 @@
+#!/bin/python3
+
+# multirate filtering of narrow-band signals
+# the low pass and band pass filters of digital_filtering.py keep only a small fraction of the band (the edges are
+# 0.0005 - 0.05 of Fs/2), so the signal can be decimated before the filtering without losing the frequencies of interest:
+#  1. polyphase anti-alias decimation by factor (scipy.signal.resample_poly)
+#  2. the filter is redesigned at the reduced rate (its edges are multiplied by factor) and run on the decimated signal
+#  3. optional polyphase interpolation back to the original rate
+# the filtering costs 1 / factor of the full rate filtering, the decimation and the interpolation cost
+# a few tens of multiplications per sample (independently of the factor)
+# high pass filters keep the high frequencies, so they cannot be decimated
+
+import scipy.signal as sig
+import numpy as np
+
+from profiling import profiled
+
+# the highest stop band edge (normalized to the reduced Fs/2) which is allowed after the decimation
+# (the anti-alias filter of resample_poly attenuates above it)
+ALIAS_MARGIN = 0.8
+MAX_FACTOR = 1000
+# transition width of the FIR filters of firwin (hamming window) normalized to Fs/2: about 6.6 / number of coefficients
+FIR_TRANSITION = 6.6
+
+# the decimation factor for a filter whose highest stop band edge (normalized to Fs/2) is stop_edge
+# it is 1 if the signal cannot be decimated
+def decimation_factor(stop_edge, max_factor=MAX_FACTOR) :
+    if stop_edge <= 0 :
+        return 1
+    return int(max(1, min(max_factor, np.floor(ALIAS_MARGIN / stop_edge))))
+
+# the highest stop band edge of a firwin FIR filter with order + 1 coefficients and the highest cutoff frequency edge
+def fir_stop_edge(order, edge) :
+    return edge + FIR_TRANSITION / (order + 1)
+
+# the decimation factor of a FIR filter of the given order whose highest stop band edge is stop_edge
+# the factor is the greatest divisor of the order which is not greater than decimation_factor(stop_edge), because the
+# delay of the filter (order / 2 samples) is kept only if the reduced order is order / factor
+def fir_decimation_factor(order, stop_edge, max_factor=MAX_FACTOR) :
+    factor = decimation_factor(stop_edge, max_factor)
+    while factor > 1 and order % factor != 0 :
+        factor -= 1
+    return factor
+
+# the order of the FIR filter at the reduced rate which has (nearly) the same transition width (in Hz)
+# and the same delay as the full rate filter (factor is given by fir_decimation_factor)
+def reduced_fir_order(order, factor) :
+    return max(order // factor, 1)
+
+# polyphase anti-alias decimation of the signal by factor (the result has ceil(len(x) / factor) samples)
+def decimate(x, factor) :
+    if factor == 1 :
+        return np.asarray(x, dtype=np.float64)
+    return sig.resample_poly(x, 1, factor)
+
+# polyphase interpolation of the decimated signal by factor back to n samples
+def interpolate(y, factor, n) :
+    if factor == 1 :
+        return y[:n]
+    return sig.resample_poly(y, factor, 1)[:n]
+
+# multirate filtering of the signal: decimation by factor, filtering with filter_function (a function of the decimated
+# signal which returns the filtered signal) and interpolation back to the original rate (if interpolation is true)
+# it returns with the filtered signal (at the original rate if interpolation is true, otherwise at the reduced rate)
+@profiled('multirate_filter')
+def multirate_filtering(x, factor, filter_function, interpolation=True) :
+    x = np.asarray(x, dtype=np.float64)
+    filtered = filter_function(decimate(x, factor))
+    if not interpolation :
+        return filtered
+    return interpolate(filtered, factor, len(x))
@@ -0,0 +1,104 @@
+#!/bin/python3
+
+# precomputed index of the peak levels of a data set
+# the peaks of every level (see peaks.peak_levels) are computed once and stored in one compressed sparse row structure:
+# the positions of all levels are concatenated into one int array and level k is positions[offsets[k - 1]:offsets[k]]
+# so the peaks of any level can be given back without searching the data set again
+# the index is cached in the memory (per input file) and it can be persisted next to the input file
+# (<input file>.peaks.npz), the persisted index becomes invalid if the input file is changed
+
+import os
+import numpy as np
+
+from peaks import peak_levels
+from data_cache import cache_key
+from profiling import profiled
+
+# the number of levels in the index (the user can select 1 - 9 reductions in the menu)
+MAX_LEVELS = 9
+INDEX_SUFFIX = '.peaks.npz'
+
+# the indexes of the input files which were already used in this process (the key is data_cache.cache_key)
+memory_indexes = {}
+
+class PeakIndex :
+    # positions are the concatenated positions of the levels, offsets are the boundaries of the levels
+    # samples is the length of the data set
+    def __init__(self, positions, offsets, samples) :
+        self.positions = positions
+        self.offsets = offsets
+        self.samples = samples
+
+    # building the index of the values with the given number of levels
+    # the positions are stored in int32 if it is possible, because the level 1 peaks are about third of the data set
+    @classmethod
+    def build(cls, values, levels=MAX_LEVELS) :
+        result = peak_levels(values, levels)
+        dtype = np.int32 if len(values) <= np.iinfo(np.int32).max else np.int64
+        offsets = np.concatenate(([0], np.cumsum([len(positions) for positions in result]))).astype(np.int64)
+        return cls(np.concatenate(result).astype(dtype), offsets, len(values))
+
+    # the number of levels in the index
+    def levels(self) :
+        return len(self.offsets) - 1
+
+    # the positions of the peaks of the given level (1 is the peaks of the data set)
+    def level(self, level) :
+        if level < 1 or level > self.levels() :
+            raise ValueError('there is no peak level ' + str(level) + ' in the index (1 - ' + str(self.levels()) + ')')
+        return self.positions[self.offsets[level - 1]:self.offsets[level]]
+
+    # the number of peaks of every level
+    def counts(self) :
+        return np.diff(self.offsets)
+
+    # writing the index to a .npz file, key identifies the data set (see data_cache.cache_key)
+    # the file is written under a temporary name and renamed at the end, so other processes never see a partial file
+    def save(self, path, key) :
+        temporary = path + '.' + str(os.getpid()) + '.tmp.npz'
+        np.savez(temporary, positions=self.positions, offsets=self.offsets, samples=self.samples, key=key)
+        os.replace(temporary, path)
+
+    # reading an index from a .npz file
+    # it returns with None if the file does not exist, it is damaged or it belongs to another data set
+    @classmethod
+    def load(cls, path, key, samples) :
+        if not os.path.exists(path) :
+            return None
+        try :
+            with np.load(path) as data :
+                if str(data['key']) != key or int(data['samples']) != samples :
+                    return None
+                return cls(data['positions'], data['offsets'], samples)
+        except (OSError, ValueError, KeyError) :
+            return None
+
+# path of the persisted index of the input file
+def index_path(infile) :
+    return infile + INDEX_SUFFIX
+
+# the peak index of the values of the input file
+# the index is searched in the memory, then in the persisted file (if use_file is true), otherwise it is built
+# and stored in the memory and in the file (if use_file is true)
+# if rebuild is true, then the index is built again in any case
+# key is the cache key of the values (see data_cache.cache_key), it is computed from the input file if it is None
+# (the values can be older than the input file, ex.: the resident data sets of analysis_server.py)
+@profiled('peak_index', 1)
+def get_peak_index(infile, values, use_file=True, rebuild=False, key=None) :
+    if key is None :
+        key = cache_key(infile)
+    if not rebuild :
+        index = memory_indexes.get(key)
+        if index is None and use_file :
+            index = PeakIndex.load(index_path(infile), key, len(values))
+        if index is not None and index.samples == len(values) :
+            memory_indexes[key] = index
+            return index
+    index = PeakIndex.build(values)
+    memory_indexes[key] = index
+    if use_file :
+        try :
+            index.save(index_path(infile), key)
+        except OSError as err :
+            print('the peak index cannot be written: ' + str(err))
+    return index
@@ -0,0 +1,94 @@
+#!/bin/python3
+
+# vectorized peak finding
+# the rules of the peak finding are the same as the rules of the original algorithm of data_visualizations.py:
+#  - the first value is a peak if it is greater than the second one
+#  - a value is a peak if it is greater than both of its neighbors
+#  - the last value is a peak if it is greater than the penultimate one
+# the peak finding can run on the peak values again (and again), so the targeted local ranges become wider and wider,
+# these are the levels of the peaks (level 1 is the peaks of the signal, level 2 is the peaks of the level 1 peaks, ...)
+# the peaks are given by their positions (int64 index arrays into the signal), not by lists of values
+# the peaks can be filtered by height, distance and prominence like scipy.signal.find_peaks
+
+import warnings
+import scipy.signal as sig
+import numpy as np
+
+from profiling import profiled
+
+# the positions of the peaks of the values (see the rules above)
+# there are no peaks in less than two values
+def local_maxima(values) :
+    values = np.asarray(values)
+    if len(values) < 2 :
+        return np.empty(0, dtype=np.int64)
+    inner = np.flatnonzero((values[1:-1] > values[:-2]) & (values[1:-1] > values[2:])) + 1
+    first = [0] if values[0] > values[1] else []
+    last = [len(values) - 1] if values[-1] > values[-2] else []
+    return np.concatenate((first, inner, last)).astype(np.int64)
+
+# one reduction of the peaks: the peaks of the values at the given positions
+# it returns with the positions of the remaining peaks
+def reduce_peaks(values, positions) :
+    return positions[local_maxima(values[positions])]
+
+# the positions of the peaks at every level from 1 to levels
+# it returns with a list of position arrays, the first one belongs to level 1
+def peak_levels(values, levels) :
+    values = np.asarray(values)
+    result = [local_maxima(values)]
+    for i in range(1, levels) :
+        result.append(reduce_peaks(values, result[-1]))
+    return result
+
+# filtering of the peaks at the given positions (the same conditions as the parameters of scipy.signal.find_peaks):
+#  - height: the minimal value of the peaks (or a (min, max) pair)
+#  - distance: the minimal distance of the peaks in samples, the smaller peaks are removed until the condition is met
+#  - prominence: the minimal prominence of the peaks (or a (min, max) pair), computed in the whole signal
+# None means no condition
+# it returns with the positions of the remaining peaks
+@profiled('select_peaks')
+def select_peaks(values, positions, height=None, distance=None, prominence=None) :
+    values = np.asarray(values)
+    positions = np.asarray(positions, dtype=np.int64)
+    if height is not None :
+        low, high = height if np.ndim(height) == 1 else (height, None)
+        keep = np.ones(len(positions), dtype=bool)
+        if low is not None :
+            keep &= values[positions] >= low
+        if high is not None :
+            keep &= values[positions] <= high
+        positions = positions[keep]
+    if distance is not None and len(positions) > 1 :
+        positions = select_by_distance(values, positions, distance)
+    if prominence is not None and len(positions) > 0 :
+        low, high = prominence if np.ndim(prominence) == 1 else (prominence, None)
+        # the peaks at the first and the last value have no prominence (0) by the definition of scipy
+        with warnings.catch_warnings() :
+            warnings.filterwarnings('ignore', message='some peaks have a prominence of 0')
+            prominences = sig.peak_prominences(values, positions)[0]
+        keep = np.ones(len(positions), dtype=bool)
+        if low is not None :
+            keep &= prominences >= low
+        if high is not None :
+            keep &= prominences <= high
+        positions = positions[keep]
+    return positions
+
+# removing the smaller peaks until the distance of the remaining peaks is at least distance samples
+# the peaks are placed in an otherwise empty (-inf) signal and scipy.signal.find_peaks selects them by distance,
+# so the greedy selection runs in compiled code (the peaks are never adjacent, so all of them are local maxima there)
+def select_by_distance(values, positions, distance) :
+    # the signal is padded at both ends, because find_peaks never finds a peak at the first or the last sample
+    sparse = np.full(positions[-1] - positions[0] + 3, -np.inf)
+    sparse[positions - positions[0] + 1] = values[positions]
+    selected, properties = sig.find_peaks(sparse, distance=distance)
+    return selected.astype(np.int64) + positions[0] - 1
+
+# finding the peaks of the values with times reductions (times = 1 is the peaks of the signal)
+# and filtering them (see select_peaks)
+# it returns with the positions of the peaks
+def find_peak_positions(values, times=1, height=None, distance=None, prominence=None) :
+    values = np.asarray(values)
+    positions = peak_levels(values, times)[-1]
+    return select_peaks(values, positions, height, distance, prominence)
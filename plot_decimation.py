@@ -0,0 +1,120 @@
+#!/bin/python3
+
+# level-of-detail decimation of the signals for plotting
+# a figure cannot show more than two points (a minimum and a maximum) per horizontal pixel,
+# so only the minimum and the maximum of the samples of every pixel column are drawn (M4-style decimation),
+# the figure looks the same as with all the samples, but matplotlib draws only about 2 * width points
+# the minima and the maxima (with their positions) are precomputed in a pyramid: level k contains them for the buckets
+# of FACTOR ** k samples, so the points of any range can be selected without touching the raw samples
+# when the user zooms or pans, the visible range is queried again from the pyramid (xlim_changed callback)
+# the figures are shown in a window or saved to a file (see show_figure)
+
+import matplotlib.pyplot as mplot
+import numpy as np
+
+from profiling import profiled, profiling_enabled, stage
+
+# the number of buckets of a level which are merged into one bucket of the next level
+FACTOR = 4
+# the signals which are not longer than this are plotted without decimation
+RAW_LIMIT = 1 << 16
+# the pyramid is not built further if a level has less buckets than this
+MIN_BUCKETS = 1024
+
+# merging every group of factor buckets into one bucket
+# it returns with the minima, the maxima and their positions of the merged buckets
+def merge_buckets(mins, min_positions, maxs, max_positions, factor) :
+    groups = -(-len(mins) // factor)
+    padding = groups * factor - len(mins)
+    # the padding values are never selected, because every group contains at least one real bucket
+    mins = np.concatenate((mins, np.full(padding, np.inf))).reshape(groups, factor)
+    maxs = np.concatenate((maxs, np.full(padding, -np.inf))).reshape(groups, factor)
+    min_positions = np.concatenate((min_positions, np.zeros(padding, dtype=np.int64))).reshape(groups, factor)
+    max_positions = np.concatenate((max_positions, np.zeros(padding, dtype=np.int64))).reshape(groups, factor)
+    rows = np.arange(groups)
+    min_index = np.argmin(mins, axis=1)
+    max_index = np.argmax(maxs, axis=1)
+    return mins[rows, min_index], min_positions[rows, min_index], maxs[rows, max_index], max_positions[rows, max_index]
+
+# a signal (y values at the increasing x values) with its min/max pyramid
+class DecimatedSeries :
+    def __init__(self, x, y) :
+        self.x = np.asarray(x)
+        self.y = np.asarray(y, dtype=np.float64)
+        positions = np.arange(len(self.y))
+        # levels[k - 1] belongs to the buckets of FACTOR ** k samples: (minima, positions of the minima, maxima, positions of the maxima)
+        self.levels = []
+        level = (self.y, positions, self.y, positions)
+        while len(level[0]) > MIN_BUCKETS :
+            level = merge_buckets(*level, FACTOR)
+            self.levels.append(level)
+
+    # the positions of the points which must be drawn for the samples between start and stop (stop is exclusive)
+    # on a figure with the given width in pixels
+    def query_positions(self, start, stop, pixels) :
+        start = max(start, 0)
+        stop = min(stop, len(self.y))
+        if stop - start <= 2 * pixels :
+            # the neighbors of the range are drawn too, so the line continues to the edges of the figure
+            return np.arange(max(start - 1, 0), min(stop + 1, len(self.y)))
+        # the coarsest level which still has at least one bucket per pixel
+        level = 0
+        while level < len(self.levels) and (stop - start) // FACTOR ** (level + 1) >= pixels :
+            level += 1
+        if level == 0 :
+            positions = np.arange(start, stop)
+            bucket_min = bucket_max = self.y[start:stop]
+            min_positions = max_positions = positions
+        else :
+            size = FACTOR ** level
+            first = start // size
+            last = -(-stop // size)
+            mins, min_positions, maxs, max_positions = (part[first:last] for part in self.levels[level - 1])
+            bucket_min, bucket_max = mins, maxs
+        # the buckets are merged into at most pixels groups
+        group = -(-len(bucket_min) // pixels)
+        bucket_min, min_positions, bucket_max, max_positions = merge_buckets(bucket_min, min_positions, bucket_max, max_positions, group)
+        # the minimum and the maximum of a group are drawn in the order of their positions
+        return np.sort(np.column_stack((min_positions, max_positions)), axis=1).ravel()
+
+    # the points which must be drawn between the x limits (xmin, xmax) on a figure with the given width in pixels
+    # it returns with the x and y values of the points
+    def visible(self, xmin, xmax, pixels) :
+        start = np.searchsorted(self.x, xmin, side='left')
+        stop = np.searchsorted(self.x, xmax, side='right')
+        positions = self.query_positions(start, stop, pixels)
+        return self.x[positions], self.y[positions]
+
+# plotting a signal on the axes with decimation (the parameters after x and y are passed to the plot function)
+# the points are selected again from the pyramid when the x limits of the axes are changed (zoom, pan)
+# short signals (up to RAW_LIMIT samples) are plotted without decimation
+# it returns with the line of the signal
+@profiled('plot_decimation', 2)
+def plot_decimated(axes, x, y, *args, **kwargs) :
+    if len(y) <= RAW_LIMIT :
+        return axes.plot(x, y, *args, **kwargs)[0]
+    series = DecimatedSeries(x, y)
+    pixels = max(int(axes.bbox.width), 1)
+    line = axes.plot(*series.visible(series.x[0], series.x[-1], pixels), *args, **kwargs)[0]
+
+    def update(changed_axes) :
+        xmin, xmax = changed_axes.get_xlim()
+        line.set_data(*series.visible(xmin, xmax, max(int(changed_axes.bbox.width), 1)))
+        changed_axes.figure.canvas.draw_idle()
+
+    axes.callbacks.connect('xlim_changed', update)
+    return line
+
+# showing the current figure in a window or saving it to outfile (ex.: a PNG file in batch mode)
+def show_figure(outfile=None) :
+    if outfile is None :
+        # the figure is drawn before showing it if the stages are measured,
+        # so the rendering is measured without the time while the window is open
+        if profiling_enabled() :
+            with stage('render') :
+                mplot.gcf().canvas.draw()
+        mplot.show()
+    else :
+        with stage('render') :
+            mplot.savefig(outfile)
+        mplot.close()
@@ -0,0 +1,153 @@
+#!/bin/python3
+
+# profiling of the stages of the programs (reading of the input file, time stamp conversion, sample rate estimation,
+# filtering, peak finding, spectral analysis, rendering of the figures)
+# the stages are measured by the stage context manager or by the functions decorated with profiled:
+# number of calls, wall time, CPU time of the process (all threads) and number of processed samples
+# the stages can be nested (ex.: the time stamp conversion is a part of the reading), so their times contain
+# the times of the inner stages
+# the profiling is switched off by default, then a stage costs only a dictionary lookup
+# the report is a dictionary (written to a JSON file) with the stages, the total wall and CPU time and the peak
+# resident memory of the process, the total wall time contains the waiting for the user in the menus too
+# optionally the whole run is profiled by cProfile and its statistics are dumped to a file (see the pstats module)
+
+from contextlib import contextmanager
+import functools
+import atexit
+import cProfile
+import json
+import time
+import sys
+import os
+import numpy as np
+import scipy
+
+try :
+    import resource
+except ImportError :
+    # there is no resource module on Windows, the peak resident memory is not measured there
+    resource = None
+
+settings = {'enabled' : False}
+stages = {}
+totals = {'wall' : time.perf_counter(), 'cpu' : time.process_time()}
+
+# switching on or off the measurement of the stages
+def enable_profiling(enabled=True) :
+    settings['enabled'] = enabled
+
+def profiling_enabled() :
+    return settings['enabled']
+
+# dropping the measured stages and restarting the total times (ex.: before the next input file of a batch process)
+def reset_profiling() :
+    stages.clear()
+    totals['wall'] = time.perf_counter()
+    totals['cpu'] = time.process_time()
+
+# adding a measurement to a stage
+def record_stage(name, wall, cpu, samples=0) :
+    measured = stages.get(name)
+    if measured is None :
+        measured = stages[name] = {'calls' : 0, 'wall_time' : 0.0, 'cpu_time' : 0.0, 'samples' : 0}
+    measured['calls'] += 1
+    measured['wall_time'] += wall
+    measured['cpu_time'] += cpu
+    measured['samples'] += int(samples)
+
+# measurement of the code in the with block as a stage, samples is the number of the processed samples
+# it gives a dictionary whose samples item can be set in the block if the number of samples is known only there
+# ex.: with stage('read_csv') as measured : ... measured['samples'] = len(values)
+@contextmanager
+def stage(name, samples=0) :
+    measured = {'samples' : samples}
+    if not settings['enabled'] :
+        yield measured
+        return
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try :
+        yield measured
+    finally :
+        record_stage(name, time.perf_counter() - wall, time.process_time() - cpu, measured['samples'])
+
+# the chunks of a data set which are counted into the samples of a stage (measured is the dictionary of the stage)
+# ex.: with stage('chunk_statistics') as measured : statistics_of_chunks(counted_chunks(chunks, measured))
+def counted_chunks(chunks, measured) :
+    for chunk in chunks :
+        measured['samples'] += len(chunk)
+        yield chunk
+
+# decorator which measures every call of the function as a stage
+# the number of samples is the length of the positional argument at samples_arg (if it has a length and samples_arg
+# is not None)
+def profiled(name, samples_arg=0) :
+    def decorator(function) :
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs) :
+            if not settings['enabled'] :
+                return function(*args, **kwargs)
+            samples = 0
+            if samples_arg is not None and len(args) > samples_arg and hasattr(args[samples_arg], '__len__') :
+                samples = len(args[samples_arg])
+            with stage(name, samples) :
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# peak resident memory of the process in bytes (None if it cannot be measured)
+def peak_rss_bytes() :
+    if resource is None :
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # it is given in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+# the report of the measured stages
+# samples_per_sec is the throughput of the stages which count the processed samples
+def profile_report() :
+    report = {
+        'program' : os.path.basename(sys.argv[0]),
+        'arguments' : sys.argv[1:],
+        'versions' : {'python' : sys.version.split()[0], 'numpy' : np.__version__, 'scipy' : scipy.__version__},
+        'wall_time' : time.perf_counter() - totals['wall'],
+        'cpu_time' : time.process_time() - totals['cpu'],
+        'peak_rss_bytes' : peak_rss_bytes(),
+        'stages' : {}
+    }
+    for name, measured in stages.items() :
+        report['stages'][name] = dict(measured)
+        if measured['samples'] > 0 and measured['wall_time'] > 0 :
+            report['stages'][name]['samples_per_sec'] = measured['samples'] / measured['wall_time']
+    return report
+
+# writing the report to a JSON file
+def write_profile_report(outfile) :
+    with open(outfile, 'w') as out :
+        json.dump(profile_report(), out, indent=2)
+
+# switching on the profiling of the command line programs (--profile and --cprofile options)
+# report is the JSON file of the stages and cprofile is the file of the cProfile statistics (None if not used)
+# the files are written when the program exits (after sys.exit too)
+def start_profiling(report=None, cprofile=None) :
+    if report is not None :
+        enable_profiling()
+        reset_profiling()
+        atexit.register(finish_report, report)
+    if cprofile is not None :
+        profiler = cProfile.Profile()
+        atexit.register(finish_cprofile, profiler, cprofile)
+        profiler.enable()
+
+def finish_report(outfile) :
+    try :
+        write_profile_report(outfile)
+    except OSError as err :
+        print('the profile report cannot be written: ' + str(err))
+
+def finish_cprofile(profiler, outfile) :
+    profiler.disable()
+    try :
+        profiler.dump_stats(outfile)
+    except OSError as err :
+        print('the cProfile statistics cannot be written: ' + str(err))
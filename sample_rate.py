@@ -0,0 +1,106 @@
+#!/bin/python3
+
+# estimating of the sampling period time from the time stamps of the input files
+# the time stamps in the input files are not accurate enough (they can be quantized to the resolution of the clock,
+# they can have jitter and some samples can be missing), so the whole time stamp array is examined in one vectorized pass:
+#  - a robust (median based) first estimation of the period
+#  - detection of the gaps (dropped samples) with this first estimation
+#  - least squares fit of a line to the time stamps where the missing samples are taken into account
+# the slope of the fitted line is the sampling period, the deviation of the residuals is the jitter
+
+import numpy as np
+
+from profiling import profiled
+
+# the statistics (first estimation, jitter, line fitting) are computed from this many samples at most
+# (evenly spaced in the data set), only the gap detection examines every time stamp
+MAX_STATISTICS_SAMPLES = 1 << 20
+# the time differences are computed between samples that are so far from each other
+# that the resolution of the clock is at most this fraction of the difference
+QUANTIZATION_LIMIT = 0.25
+# a time difference is a gap if it is greater than the period by more than half a period
+# and by more than this multiple of the median absolute deviation of the time differences
+JITTER_TOLERANCE = 3
+# the gaps are searched in blocks of this size, so the time differences stay in the cache of the processor
+GAP_SEARCH_BLOCK = 1 << 16
+
+# positions of the time differences which are greater than the threshold
+# it returns with the positions and the time differences at these positions
+def find_gaps(ts, threshold) :
+    n = len(ts)
+    buffer = np.empty(min(GAP_SEARCH_BLOCK, n - 1), dtype=np.float64)
+    gaps = []
+    for start in range(0, n - 1, GAP_SEARCH_BLOCK) :
+        stop = min(start + GAP_SEARCH_BLOCK, n - 1)
+        dif = buffer[:stop - start]
+        np.subtract(ts[start + 1:stop + 1], ts[start:stop], out=dif)
+        found = np.flatnonzero(dif > threshold)
+        if len(found) > 0 :
+            gaps.append(found + start)
+    gaps = np.concatenate(gaps) if len(gaps) > 0 else np.empty(0, dtype=np.int64)
+    return gaps, ts[gaps + 1] - ts[gaps]
+
+# estimating of the sampling period time and the quality of the sampling
+# ts_ms must be the time stamps in milliseconds in increasing order
+# it returns with a dictionary:
+#  - sample_time: sampling period time in sec
+#  - sampling_frequency: sampling frequency in Hz
+#  - jitter: deviation of the time stamps from the ideal sampling points in sec
+#  - gaps: positions of the samples which follow a gap (missing samples) in the data set
+#  - dropped_samples: estimated number of the missing samples
+#  - confidence: value between 0 and 1, it is 1 if the sampling is perfectly periodic without missing samples
+# ValueError is raised if the sampling period cannot be estimated
+@profiled('estimate_sample_rate')
+def estimate_sample_rate(ts_ms) :
+    ts = np.asarray(ts_ms, dtype=np.float64)
+    n = len(ts)
+    if n < 2 :
+        raise ValueError('at least two time stamps are needed to estimate the sampling period')
+    span = ts[-1] - ts[0]
+    if not span > 0 :
+        raise ValueError('the time stamps are not increasing')
+    mean_period = span / (n - 1)
+    # evenly spaced positions for the statistics (slicing is used instead of indexing, because it is much faster)
+    step = (n - 1) // MAX_STATISTICS_SAMPLES + 1
+    dif = ts[1::step] - ts[:-1:step]
+    positive = dif[dif > 0]
+    # resolution of the clock which created the time stamps
+    resolution = positive.min() if len(positive) > 0 else mean_period
+    # if the clock is not accurate enough, then the time differences are computed between farther samples
+    lag = int(np.ceil(resolution / (QUANTIZATION_LIMIT * mean_period)))
+    lag = min(max(lag, 1), max((n - 1) // 2, 1))
+    period = np.median(ts[lag::step] - ts[:-lag:step]) / lag
+    if not period > 0 :
+        period = mean_period
+    # gap detection (the tolerance depends on the jitter and the quantization of the time stamps)
+    deviation = np.median(np.abs(dif - period))
+    threshold = period + max(0.5 * period, JITTER_TOLERANCE * deviation)
+    gaps, gap_dif = find_gaps(ts, threshold)
+    missing = np.maximum(np.rint(gap_dif / period) - 1, 1).astype(np.int64)
+    # the ideal position of the samples on the time line (the missing samples are taken into account)
+    positions = np.append(np.arange(0, n - 1, step), n - 1)
+    missing_before = np.concatenate(([0], np.cumsum(missing)))[np.searchsorted(gaps + 1, positions, side='right')]
+    k = (positions + missing_before).astype(np.float64)
+    sampled = np.append(ts[:-1:step], ts[-1])
+    # least squares fit of the ts = t0 + period * k line
+    k -= k.mean()
+    centered = sampled - sampled.mean()
+    period = np.dot(k, centered) / np.dot(k, k)
+    residuals = centered - period * k
+    jitter = np.sqrt(np.dot(residuals, residuals) / len(residuals))
+    dropped = int(missing.sum())
+    confidence = (1 - dropped / (n + dropped)) / (1 + jitter / period)
+    # get the values in sec (ts is in ms)
+    return {
+        'sample_time' : period / 1000,
+        'sampling_frequency' : 1000 / period,
+        'jitter' : jitter / 1000,
+        'gaps' : gaps + 1,
+        'dropped_samples' : dropped,
+        'confidence' : confidence
+    }
+
+# estimating of the sampling period time in sec
+# ts_list must be the time stamps in milliseconds
+def calculate_sample_time(ts_list) :
+    return estimate_sample_rate(ts_list)['sample_time']
@@ -0,0 +1,162 @@
+#!/bin/python3
+
+# spectral analysis of real signals
+#  - amplitude spectrum of the whole signal with a real FFT (only the non-negative frequencies are computed)
+#  - Welch averaged power spectral density and STFT spectrogram, computed segment by segment
+# the segments are taken from the chunks of the signal (ex.: csv_stream.read_value_chunks), the end of a chunk
+# is carried over to the next chunk, so the result is the same as in case of the whole signal
+# (the same as scipy.signal.welch and scipy.signal.spectrogram with the same window, overlap and FFT length)
+# every segment is transformed with the same FFT length, so the FFT plan of scipy.fft is computed only once and
+# reused for every segment, and the windows are cached too
+# the FFT length is padded to a fast size (scipy.fft.next_fast_len) if it is not given
+
+import functools
+import scipy.signal as sig
+import scipy.fft as fft
+import numpy as np
+
+from profiling import profiled, stage
+
+# default length of the segments (in samples)
+DEFAULT_SEGMENT = 4096
+DEFAULT_WINDOW = 'hann'
+# the segments are transformed in groups of this many segments to limit the used memory
+SEGMENTS_PER_BATCH = 256
+# the maximal number of time columns of the spectrogram figure (the segments are averaged in groups above it)
+SPECTROGRAM_COLUMNS = 1024
+
+# the window of the given kind and length (read-only, it is shared by the callers)
+@functools.lru_cache(maxsize=16)
+def cached_window(window, length) :
+    values = sig.get_window(window, length)
+    values.flags.writeable = False
+    return values
+
+# fast FFT length for a signal or segment of n samples
+def fast_length(n) :
+    return fft.next_fast_len(n, real=True)
+
+# amplitude spectrum of the whole signal: the real FFT divided by the number of samples
+# the signal is padded with zeros to nfft samples (to a fast length if nfft is None)
+# it returns with the frequency axis (Hz) and the complex spectrum (nfft // 2 + 1 points)
+@profiled('fft')
+def amplitude_spectrum(x, sampling_frequency, nfft=None) :
+    x = np.asarray(x, dtype=np.float64)
+    if nfft is None :
+        nfft = fast_length(len(x))
+    spectrum = fft.rfft(x, nfft) / len(x)
+    return fft.rfftfreq(nfft, 1 / sampling_frequency), spectrum
+
+# positions of the count highest local maxima of a spectrum (in decreasing order of their value)
+def strongest_peaks(spectrum, count=5) :
+    peaks = np.flatnonzero((spectrum[1:-1] > spectrum[:-2]) & (spectrum[1:-1] > spectrum[2:])) + 1
+    return peaks[np.argsort(spectrum[peaks])[::-1][:count]]
+
+# power spectra of the overlapping segments of a signal which is given in chunks
+# the segments are detrended (their mean is subtracted), windowed and scaled to power spectral density (one-sided)
+class SegmentSpectra :
+    # nperseg is the length of the segments, noverlap is the overlap of them (default: half of the segment)
+    # nfft is the FFT length (default: the fast length of the segment)
+    def __init__(self, sampling_frequency, nperseg=DEFAULT_SEGMENT, noverlap=None, nfft=None, window=DEFAULT_WINDOW) :
+        if noverlap is None :
+            noverlap = nperseg // 2
+        if nfft is None :
+            nfft = fast_length(nperseg)
+        if nperseg < 1 or noverlap < 0 or noverlap >= nperseg or nfft < nperseg :
+            raise ValueError('invalid segment parameters: nperseg=' + str(nperseg) + ', noverlap=' + str(noverlap) + ', nfft=' + str(nfft))
+        self.sampling_frequency = sampling_frequency
+        self.nperseg = nperseg
+        self.step = nperseg - noverlap
+        self.nfft = nfft
+        self.window = cached_window(window, nperseg)
+        self.frequencies = fft.rfftfreq(nfft, 1 / sampling_frequency)
+        # density scaling, the one-sided spectrum contains the power of the negative frequencies too
+        self.scale = np.full(len(self.frequencies), 2 / (sampling_frequency * np.dot(self.window, self.window)))
+        self.scale[0] /= 2
+        if nfft % 2 == 0 :
+            self.scale[-1] /= 2
+        self.reset()
+
+    # clearing the state (the next chunk is the beginning of a new signal)
+    def reset(self) :
+        self.pending = np.empty(0, dtype=np.float64)
+        # the position of the first pending sample in the signal
+        self.position = 0
+
+    # the power spectra of the segments which are completed by the next chunk
+    # it returns with the start positions of the segments (in samples) and their spectra (one row per segment)
+    def process(self, chunk) :
+        data = np.concatenate((self.pending, np.asarray(chunk, dtype=np.float64)))
+        if len(data) < self.nperseg :
+            self.pending = data
+            return np.empty(0, dtype=np.int64), np.empty((0, len(self.frequencies)))
+        segments = np.lib.stride_tricks.sliding_window_view(data, self.nperseg)[::self.step]
+        spectra = np.empty((len(segments), len(self.frequencies)))
+        for first in range(0, len(segments), SEGMENTS_PER_BATCH) :
+            batch = segments[first:first + SEGMENTS_PER_BATCH]
+            windowed = (batch - batch.mean(axis=1, keepdims=True)) * self.window
+            transformed = fft.rfft(windowed, self.nfft, axis=1)
+            spectra[first:first + len(batch)] = (transformed.real ** 2 + transformed.imag ** 2) * self.scale
+        starts = self.position + np.arange(len(segments)) * self.step
+        consumed = len(segments) * self.step
+        self.pending = data[consumed:]
+        self.position += consumed
+        return starts, spectra
+
+# Welch averaged power spectral density of a signal which is given in chunks (a whole signal can be given as [x])
+# the parameters are the same as the parameters of SegmentSpectra
+# it returns with the frequency axis (Hz) and the power spectral density (unit^2 / Hz)
+def welch_psd(chunks, sampling_frequency, nperseg=DEFAULT_SEGMENT, noverlap=None, nfft=None, window=DEFAULT_WINDOW) :
+    spectra = SegmentSpectra(sampling_frequency, nperseg, noverlap, nfft, window)
+    total = np.zeros(len(spectra.frequencies))
+    count = 0
+    with stage('welch') as measured :
+        for chunk in chunks :
+            measured['samples'] += len(chunk)
+            starts, powers = spectra.process(chunk)
+            total += powers.sum(axis=0)
+            count += len(starts)
+    if count == 0 :
+        raise ValueError('the signal is shorter than a segment (' + str(nperseg) + ' samples)')
+    return spectra.frequencies, total / count
+
+# STFT spectrogram of a signal which is given in chunks (a whole signal can be given as [x])
+# group consecutive segments are averaged into one time column (1 means no averaging), so the size of the result
+# can be limited in case of long signals (the last column can be averaged from less segments)
+# the other parameters are the same as the parameters of SegmentSpectra
+# it returns with the frequency axis (Hz), the time axis (s, the centers of the columns) and the power spectral
+# density (one row per frequency, one column per time point like scipy.signal.spectrogram)
+def spectrogram(chunks, sampling_frequency, nperseg=DEFAULT_SEGMENT, noverlap=None, nfft=None, window=DEFAULT_WINDOW, group=1) :
+    spectra = SegmentSpectra(sampling_frequency, nperseg, noverlap, nfft, window)
+    columns = []
+    times = []
+    # the segments which are not averaged yet (less than group)
+    pending_starts = np.empty(0, dtype=np.int64)
+    pending_powers = np.empty((0, len(spectra.frequencies)))
+    with stage('spectrogram') as measured :
+        for chunk in chunks :
+            measured['samples'] += len(chunk)
+            starts, powers = spectra.process(chunk)
+            pending_starts = np.concatenate((pending_starts, starts))
+            pending_powers = np.concatenate((pending_powers, powers))
+            complete = len(pending_starts) // group * group
+            if complete > 0 :
+                columns.append(pending_powers[:complete].reshape(-1, group, len(spectra.frequencies)).mean(axis=1))
+                times.append(pending_starts[:complete].reshape(-1, group).mean(axis=1))
+                pending_starts = pending_starts[complete:]
+                pending_powers = pending_powers[complete:]
+    if len(pending_starts) > 0 :
+        columns.append(pending_powers.mean(axis=0, keepdims=True))
+        times.append(pending_starts.mean(keepdims=True))
+    if len(columns) == 0 :
+        raise ValueError('the signal is shorter than a segment (' + str(nperseg) + ' samples)')
+    times = (np.concatenate(times) + nperseg / 2) / sampling_frequency
+    return spectra.frequencies, times, np.concatenate(columns).T
+
+# the number of segments of a signal with n samples (see SegmentSpectra)
+def segment_count(n, nperseg=DEFAULT_SEGMENT, noverlap=None) :
+    if noverlap is None :
+        noverlap = nperseg // 2
+    if n < nperseg :
+        return 0
+    return (n - nperseg) // (nperseg - noverlap) + 1
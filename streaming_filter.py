@@ -0,0 +1,94 @@
+#!/bin/python3
+
+# stateful digital filtering of a signal which is given in blocks (ex.: chunks of a huge file or a live sensor stream)
+# the state of the filter is carried over from block to block, so there are no transients at the block boundaries
+# and the result is bit-identical to the filtering of the whole signal with lfilter (fir_filtering and iir_filtering)
+# or with sosfilt (sos_filtering) in case of second-order sections
+
+import scipy.signal as sig
+import numpy as np
+
+from fir_engine import StreamingFFTFilter, choose_fir_method
+
+# it is true if the design is an array of second-order sections (every row contains the b0, b1, b2, a0, a1, a2 coefficients)
+def is_sos(design) :
+    return isinstance(design, np.ndarray) and design.ndim == 2 and design.shape[1] == 6
+
+class StreamingFilter :
+    # b and a are the coefficients of the filter (a = 1 in case of FIR filters)
+    def __init__(self, b, a=1) :
+        self.b = np.atleast_1d(np.asarray(b, dtype=np.float64))
+        self.a = np.atleast_1d(np.asarray(a, dtype=np.float64))
+        # lfilter computes FIR filters (a has only one coefficient) as a convolution of b / a[0] and the signal,
+        # so the FIR filters carry over the last len(b) - 1 samples of the signal instead of the zi state of lfilter
+        # (the zi state would give the same result, but the rounding errors would be different)
+        self.fir = len(self.a) == 1
+        if self.fir :
+            self.b = self.b / self.a[0]
+        self.reset()
+
+    # making a filter from the result of a filter design function of digital_filtering.py
+    # the IIR designers give back (b, a) pairs or second-order sections, the FIR designers give back only the b coefficients
+    # dtype is used only by the second-order sections (see StreamingSosFilter)
+    # long FIR filters are computed with FFT based block convolution (StreamingFFTFilter) if fir_method is auto or overlap-save
+    # (overlap-add needs the whole signal, so it is replaced by overlap-save in streaming mode)
+    @classmethod
+    def from_design(cls, design, dtype=np.float64, fir_method='auto') :
+        if is_sos(design) :
+            return StreamingSosFilter(design, dtype)
+        b, a = design if isinstance(design, tuple) else (design, 1)
+        a = np.atleast_1d(np.asarray(a, dtype=np.float64))
+        if len(a) == 1 :
+            if fir_method == 'auto' :
+                fir_method = choose_fir_method(len(np.atleast_1d(b)))
+            if fir_method in ('overlap-add', 'overlap-save') :
+                return StreamingFFTFilter(np.asarray(b, dtype=np.float64) / a[0])
+        return cls(b, a)
+
+    # clearing the state of the filter (the next block is the beginning of a new signal)
+    def reset(self) :
+        if self.fir :
+            self.history = np.zeros(len(self.b) - 1)
+            self.seen = 0
+        else :
+            self.zi = np.zeros(max(len(self.a), len(self.b)) - 1)
+
+    # filtering of the next block of the signal
+    # it returns with the filtered block
+    def process(self, block) :
+        if not self.fir :
+            filtered, self.zi = sig.lfilter(self.b, self.a, block, zi=self.zi)
+            return filtered
+        block = np.asarray(block)
+        if len(block) == 0 :
+            return np.empty(0)
+        taps = len(self.b)
+        extended = np.concatenate((self.history, block))
+        filtered = np.convolve(extended, self.b, mode='valid')
+        # the first len(b) - 1 samples of the signal are computed as lfilter does it (with shorter sums at the beginning)
+        if self.seen < taps - 1 :
+            start = taps - 1 - self.seen
+            beginning = np.concatenate((extended[start:], np.zeros(taps)))
+            head = min(start, len(block))
+            filtered[:head] = np.convolve(beginning, self.b)[self.seen:self.seen + head]
+        self.history = extended[len(extended) - (taps - 1):]
+        self.seen += len(block)
+        return filtered
+
+# the streaming version of the filtering with second-order sections (sos_filtering of digital_filtering.py)
+# the filtering can be done in single precision (dtype=np.float32), the state of the sections has the same type
+class StreamingSosFilter :
+    def __init__(self, sos, dtype=np.float64) :
+        self.dtype = dtype
+        self.sos = np.asarray(sos, dtype=dtype)
+        self.reset()
+
+    # clearing the state of the filter (the next block is the beginning of a new signal)
+    def reset(self) :
+        self.zi = np.zeros((len(self.sos), 2), dtype=self.dtype)
+
+    # filtering of the next block of the signal
+    # it returns with the filtered block
+    def process(self, block) :
+        filtered, self.zi = sig.sosfilt(self.sos, np.asarray(block, dtype=self.dtype), zi=self.zi)
+        return filtered
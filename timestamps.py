@@ -0,0 +1,135 @@
+#!/bin/python3
+
+# vectorized parsing of the time stamp column of the input files
+# the time stamps must be %Y-%m-%d %H:%M:%S.%f in format (ex.: 2021-03-04 10:11:12.123456)
+# the result is the same as datetime.strptime(ts, TIMESTAMP_FORMAT).timestamp() * 1000 for every element,
+# but the whole column is parsed at once with numpy instead of a python loop
+
+from datetime import datetime, timedelta, timezone
+import pandas as ps
+import numpy as np
+
+from profiling import profiled
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# positions of the separator characters in a fixed width time stamp
+# 'YYYY-MM-DD HH:MM:SS.' is 20 characters long, the fraction of seconds follows it
+SEPARATORS = {4 : b'-', 7 : b'-', 10 : b' ', 13 : b':', 16 : b':', 19 : b'.'}
+FRACTION_START = 20
+# strptime accepts 1-6 digits after the dot
+MIN_WIDTH = FRACTION_START + 1
+MAX_WIDTH = FRACTION_START + 6
+
+US_PER_SEC = 1000000
+US_PER_HOUR = 3600 * US_PER_SEC
+US_PER_DAY = 24 * US_PER_HOUR
+
+# number of days since 1970-01-01 of the given (proleptic gregorian) dates
+# vectorized version of the well-known days_from_civil algorithm
+# more information: https://howardhinnant.github.io/date_algorithms.html#days_from_civil
+def days_from_civil(year, month, day) :
+    year = year - (month <= 2)
+    era = np.floor_divide(year, 400)
+    yoe = year - era * 400
+    mp = (month + 9) % 12
+    doy = (153 * mp + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+# fast path for fixed width time stamps
+# every row must have the same length and the separators must be at the same places
+# it returns None if the column does not satisfy these requirements, so the caller has to use the slow path
+def parse_fixed_width(timestamps) :
+    try :
+        raw = np.asarray(timestamps).astype(np.bytes_)
+    except (UnicodeEncodeError, ValueError, TypeError) :
+        return None
+    width = raw.dtype.itemsize
+    n = len(raw)
+    if n == 0 or width < MIN_WIDTH or width > MAX_WIDTH :
+        return None
+    # every character of the column as a (n, width) byte matrix
+    chars = raw.view(np.uint8).reshape(n, width)
+    # shorter rows are padded with zero bytes, in this case the column is not fixed width
+    if not chars[:, -1].all() :
+        return None
+    for position, separator in SEPARATORS.items() :
+        if not (chars[:, position] == ord(separator)).all() :
+            return None
+    # the characters which are not digits wrap around to values greater than 9
+    digits = chars - np.uint8(ord('0'))
+    digit_columns = [i for i in range(width) if i not in SEPARATORS]
+    if (digits[:, digit_columns] > 9).any() :
+        return None
+
+    def field(start, stop) :
+        value = np.zeros(n, dtype=np.int64)
+        for i in range(start, stop) :
+            value = value * 10 + digits[:, i]
+        return value
+
+    year = field(0, 4)
+    month = field(5, 7)
+    day = field(8, 10)
+    hour = field(11, 13)
+    minute = field(14, 16)
+    second = field(17, 19)
+    # the fraction is scaled to microseconds (ex.: .5 -> 500000 us)
+    fraction = field(FRACTION_START, width) * 10**(MAX_WIDTH - width)
+    # strptime rejects invalid dates and times, so in this case the slow path will raise the error
+    if ((month < 1) | (month > 12) | (day < 1) | (day > 31) | (hour > 23) | (minute > 59) | (second > 59)).any() :
+        return None
+    if (day > days_in_month(year, month)).any() :
+        return None
+    days = days_from_civil(year, month, day)
+    return days * US_PER_DAY + ((hour * 60 + minute) * 60 + second) * US_PER_SEC + fraction
+
+# number of days of the given months
+def days_in_month(year, month) :
+    next_year = year + (month == 12)
+    next_month = month % 12 + 1
+    return days_from_civil(next_year, next_month, np.ones_like(month)) - days_from_civil(year, month, np.ones_like(month))
+
+# slow path for irregular time stamps (ex.: different number of digits in the fraction of seconds)
+# pandas parses the column in C code, so this is still much faster than the strptime loop
+def parse_irregular(timestamps) :
+    parsed = ps.to_datetime(ps.Series(np.asarray(timestamps, dtype=object)), format=TIMESTAMP_FORMAT)
+    return parsed.to_numpy(dtype='datetime64[us]').astype(np.int64)
+
+# the time stamps of the input files are local times (as datetime.timestamp() treats naive datetime objects)
+# this function gives the UTC offset in microseconds of the given local (wall clock) times
+# the offset changes only at daylight saving time transitions, so it is enough to examine the distinct hours
+def local_utc_offsets(wall_us) :
+    hours = np.floor_divide(wall_us, US_PER_HOUR)
+    def offset_of_hour(hour) :
+        wall = datetime(1970, 1, 1) + timedelta(hours=int(hour))
+        utc = wall.replace(tzinfo=timezone.utc).timestamp()
+        return int(round((utc - wall.timestamp()) * US_PER_SEC))
+    first_hour = hours.min()
+    last_hour = hours.max()
+    first = offset_of_hour(first_hour)
+    # the usual case: the whole measurement was taken within one day with the same UTC offset
+    # (there cannot be two daylight saving time transitions within 24 hours)
+    if (last_hour - first_hour) < 24 and first == offset_of_hour(last_hour) :
+        return first
+    distinct, inverse = np.unique(hours, return_inverse=True)
+    offsets = np.array([offset_of_hour(h) for h in distinct], dtype=np.int64)
+    return offsets[inverse]
+
+# converting the time stamps to microseconds since the epoch (int64 values)
+# timestamps parameter must be iterable and the elements must be %Y-%m-%d %H:%M:%S.%f in format
+def parse_timestamps_us(timestamps) :
+    if len(timestamps) == 0 :
+        return np.empty(0, dtype=np.int64)
+    wall_us = parse_fixed_width(timestamps)
+    if wall_us is None :
+        wall_us = parse_irregular(timestamps)
+    return wall_us - local_utc_offsets(wall_us)
+
+# convert datetime strings to milliseconds
+# timestamps parameter must be iterable and the elements must be %Y-%m-%d %H:%M:%S.%f in format
+# it returns with a float64 numpy array
+@profiled('convert_timestamps')
+def convert_timestamps_to_ms(timestamps) :
+    return parse_timestamps_us(timestamps) / 1000